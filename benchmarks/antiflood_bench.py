@@ -0,0 +1,129 @@
+"""Антифлуд: сколько работы хэндлеров и БД отсекают повторные нажатия.
+
+Каждый пользователь делает то, что обычно делают с медленным ботом:
+двойное нажатие на "выполнено", тройное на карточку привычки и серия
+нажатий "вперед"/"назад" без ожидания ответа. Апдейты идут через
+настоящий диспетчер, Bot API подменен middleware сессии с задержкой
+--rtt секунд. Прогон без антифлуда — тот же диспетчер, в котором
+проверки антифлуда всегда пропускают апдейт.
+
+    python benchmarks/antiflood_bench.py --users 20 --spam 30 --rtt 0.05
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_database = tempfile.NamedTemporaryFile(suffix=".db", delete=False).name
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_database}"
+os.environ.setdefault("BOT_TOKEN", "123456:fake")
+
+from aiogram import Bot  # noqa: E402
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware  # noqa: E402
+from aiogram.methods import SendMessage  # noqa: E402
+from aiogram.types import Chat, Message, Update  # noqa: E402
+
+import bot as bot_module  # noqa: E402
+from database.database import db  # noqa: E402
+from benchmarks.webhook_client import fake_callback_update  # noqa: E402
+from keyboards import CompleteHabit, HabitCard, HabitsPage  # noqa: E402
+from services.antiflood import antiflood  # noqa: E402
+from services.metrics import metrics  # noqa: E402
+
+
+class FakeApi(BaseRequestMiddleware):
+    """Bot API без сети: только задержка и счетчик вызовов"""
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.calls: Dict[str, int] = {}
+
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__name__
+        self.calls[name] = self.calls.get(name, 0) + 1
+        await asyncio.sleep(self.rtt)
+        if isinstance(method, SendMessage):
+            return Message(message_id=1, date=datetime.now(), text=method.text,
+                           chat=Chat(id=method.chat_id, type="private"))
+        return True
+
+
+async def seed(users: int, habits: int):
+    ids = {}
+    for user in range(users):
+        ids[user] = [await bot_module.repo.add_habit(user + 1, f"Привычка {number}") for number in range(habits)]
+    return ids
+
+
+async def run(dp, args, habit_ids) -> dict:
+    bot = Bot("123456:fake")
+    api = FakeApi(args.rtt)
+    bot.session.middleware(api)
+    queries_before = sum(metrics.db_queries.values())
+    dropped_before = sum(antiflood.dropped.values())
+
+    async def press(user: int, data: str):
+        await dp.feed_update(bot, Update.model_validate(fake_callback_update(user + 1, data)))
+
+    async def taps(user: int, data: str, count: int):
+        await asyncio.gather(*(press(user, data) for _ in range(count)))
+
+    async def session(user: int):
+        habit_id = habit_ids[user]
+        await taps(user, CompleteHabit(habit_id=habit_id).pack(), 2)
+        await taps(user, HabitCard(habit_id=habit_id).pack(), 3)
+        # Серия без ожидания ответа: нажатия "вперед" и "назад" вперемешку
+        await asyncio.gather(*(press(user, HabitsPage(page=number % 2).pack()) for number in range(args.spam)))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(session(user) for user in range(args.users)))
+    elapsed = time.perf_counter() - started
+    await bot.session.close()
+    return {
+        "updates": args.users * (5 + args.spam),
+        "dropped": sum(antiflood.dropped.values()) - dropped_before,
+        "queries": sum(metrics.db_queries.values()) - queries_before,
+        "calls": sum(api.calls.values()),
+        "seconds": elapsed,
+    }
+
+
+async def main(args):
+    logging.disable(logging.ERROR)
+    await db.init_models()
+    habit_ids = await seed(args.users, 2)
+    dp = bot_module.create_dispatcher()
+    print(f"{'':<12} {'updates':>8} {'dropped':>8} {'DB queries':>11} {'API calls':>10} {'seconds':>8}")
+    for run_number, name in enumerate(("no antiflood", "antiflood")):
+        if run_number == 0:
+            antiflood.begin = lambda message, data: None
+            antiflood.allow = lambda user_id: True
+        else:
+            del antiflood.begin, antiflood.allow
+        ids = {user: habits[run_number] for user, habits in habit_ids.items()}
+        report = await run(dp, args, ids)
+        print(f"{name:<12} {report['updates']:>8} {report['dropped']:>8} {report['queries']:>11} "
+              f"{report['calls']:>10} {report['seconds']:>8.2f}", flush=True)
+    print(f"\nantiflood: {antiflood.stats()}")
+    await dp.emit_shutdown()
+    await db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--spam", type=int, default=30, help="нажатий в серии без ожидания ответа")
+    parser.add_argument("--rtt", type=float, default=0.05, help="время ответа Bot API, с")
+    try:
+        asyncio.run(main(parser.parse_args()))
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(_database + suffix):
+                os.remove(_database + suffix)
@@ -0,0 +1,244 @@
+"""Нагрузочный тест бота целиком на поддельном Bot API.
+
+Каждый виртуальный пользователь проходит сценарий через настоящие
+роутеры: /start, добавление привычек через FSM, список с пагинацией,
+карточка привычки, отметка выполнения, статистика привычки и за
+период. Следующий шаг отправляется, когда бот ответил на предыдущий
+и замолчал на --think секунд. Задержка — время от появления апдейта
+до первого ответа бота в этот чат.
+
+    python benchmarks/bot_load.py --users 200 --modes polling webhook sharded --workers 2
+    python benchmarks/bot_load.py --users 100 --rate-limit 0.02
+
+Каждый режим запускается в отдельном процессе со своей временной БД.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_telegram import FakeTelegram, start_fake_telegram  # noqa: E402
+from benchmarks.webhook_client import fake_callback_update, fake_message_update  # noqa: E402
+
+BUTTON_TIMEOUT = 2.0
+
+
+def build_dispatcher():
+    """Диспетчер бота (и для воркеров режима sharded)"""
+    from bot import create_dispatcher
+
+    dp = create_dispatcher()
+    # bot.py включает INFO, а строка лога на каждый апдейт заметно искажает замер
+    logging.getLogger().setLevel(logging.WARNING)
+    return dp
+
+
+class Driver:
+    """Доставка апдейтов боту и ожидание ответа"""
+
+    def __init__(self, fake: FakeTelegram, deliver, think: float, step_timeout: float):
+        self.fake = fake
+        self.deliver = deliver
+        self.think = think
+        self.step_timeout = step_timeout
+        self.sent = 0
+        self.timeouts = 0
+        self.missing_buttons = 0
+
+    async def _send(self, chat_id: int, update: Dict[str, Any]):
+        response = self.fake.wait_response(chat_id)
+        self.sent += 1
+        await self.deliver(update)
+        try:
+            await asyncio.wait_for(response, timeout=self.step_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return
+        # Пользователь читает ответ, пока бот дописывает сообщения (answer + edit)
+        await self.fake.wait_quiet(chat_id, self.think)
+
+    async def say(self, user_id: int, text: str):
+        await self._send(user_id, fake_message_update(user_id, text))
+
+    async def press(self, user_id: int, prefix: str) -> bool:
+        """Нажать первую кнопку последней инлайн-клавиатуры с callback_data на prefix"""
+        deadline = time.perf_counter() + BUTTON_TIMEOUT
+        while True:
+            data = next((item for item in self.fake.keyboards.get(user_id, []) if item.startswith(prefix)), None)
+            if data is not None:
+                break
+            if time.perf_counter() > deadline:
+                self.missing_buttons += 1
+                return False
+            # Ответ на callback мог прийти раньше, чем отредактированное сообщение
+            await asyncio.sleep(0.005)
+
+        update = fake_callback_update(user_id, data)
+        update["callback_query"]["message"]["message_id"] = self.fake.messages.get(user_id, 1)
+        await self._send(user_id, update)
+        return True
+
+
+async def user_session(driver: Driver, user_id: int, habits: int):
+    # keyboards читает config, поэтому импортируется после настройки окружения
+    from keyboards import CompleteHabit, HabitCard, HabitsPage, HabitStats, StatsPeriod
+
+    await driver.say(user_id, "/start")
+    for number in range(habits):
+        for text in ("➕ Добавить привычку", f"Привычка {number}", "Описание", "09:00",
+                     "📅 Ежедневно", "✅ Подтвердить"):
+            await driver.say(user_id, text)
+
+    await driver.say(user_id, "📝 Мои привычки")
+    await driver.press(user_id, HabitsPage.prefix)
+    if await driver.press(user_id, HabitCard.prefix):
+        await driver.press(user_id, CompleteHabit.prefix)
+        await driver.press(user_id, HabitStats.prefix)
+    await driver.say(user_id, "📊 Статистика")
+    await driver.press(user_id, StatsPeriod.prefix)
+
+
+async def run_mode(args) -> Dict[str, Any]:
+    from aiohttp import ClientSession
+    from aiohttp import web
+
+    from database.database import db
+    from services.telegram import create_bot
+
+    fake = FakeTelegram(rate_limit_ratio=args.rate_limit)
+    fake_runner = await start_fake_telegram(fake, port=args.api_port)
+    await db.init_models()
+    bot = create_bot("123456:fake")
+
+    background: List[asyncio.Task] = []
+    polling_dp = None
+    web_runner = None
+    client = None
+
+    if args.mode == "webhook":
+        from services.webhook import build_webhook_app
+
+        web_runner = web.AppRunner(build_webhook_app(build_dispatcher(), bot, path="/webhook"))
+        await web_runner.setup()
+        await web.TCPSite(web_runner, host="127.0.0.1", port=args.webhook_port).start()
+        client = ClientSession()
+        url = f"http://127.0.0.1:{args.webhook_port}/webhook"
+
+        async def deliver(update: Dict[str, Any]):
+            fake.track(update)
+            async with client.post(url, json=update) as response:
+                await response.read()
+    else:
+        async def deliver(update: Dict[str, Any]):
+            fake.push(update)
+
+        if args.mode == "sharded":
+            from services.sharding import run_sharded
+            background.append(asyncio.create_task(run_sharded(bot, build_dispatcher, args.workers, None)))
+        else:
+            polling_dp = build_dispatcher()
+            background.append(asyncio.create_task(
+                polling_dp.start_polling(bot, handle_signals=False, close_bot_session=False)
+            ))
+
+    # Прогрев: по одному апдейту на каждый воркер, пока поднимаются процессы
+    driver = Driver(fake, deliver, args.think, args.step_timeout)
+    await asyncio.gather(*(driver.say(user, "/help") for user in range(max(args.workers, 1))))
+    driver = Driver(fake, deliver, args.think, args.step_timeout)
+    fake.latencies.clear()
+    fake.rate_limited = 0
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        user_session(driver, 100000 + user, args.habits) for user in range(args.users)
+    ))
+    duration = time.perf_counter() - started
+
+    if polling_dp is not None:
+        await polling_dp.stop_polling()
+    else:
+        for task in background:
+            task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    if client is not None:
+        await client.close()
+    if web_runner is not None:
+        await web_runner.cleanup()
+    await bot.session.close()
+    await fake_runner.cleanup()
+    await db.close()
+
+    latencies = sorted(fake.latencies) or [0.0]
+    return {
+        "updates": driver.sent,
+        "duration": duration,
+        "throughput": driver.sent / duration if duration else 0.0,
+        "p50": statistics.median(latencies),
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "rate_limited": fake.rate_limited,
+        "timeouts": driver.timeouts,
+        "missing_buttons": driver.missing_buttons,
+    }
+
+
+def print_row(mode: str, report: Dict[str, Any]):
+    print(
+        f"{mode:<12} {report['updates']:>8} {report['throughput']:>10.0f} "
+        f"{report['p50'] * 1000:>8.1f} {report['p99'] * 1000:>8.1f} "
+        f"{report['rate_limited']:>6} {report['timeouts']:>8} {report['missing_buttons']:>8}",
+        flush=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["polling", "webhook", "sharded"],
+                        choices=["polling", "webhook", "sharded"])
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--habits", type=int, default=6, help="привычек на пользователя (больше 5 — есть пагинация)")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--think", type=float, default=0.05, help="пауза тишины от бота перед следующим шагом, с")
+    parser.add_argument("--step-timeout", type=float, default=5.0,
+                        help="сколько ждать ответа бота (после 429 ответа может не быть)")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="доля ответов 429 на отправку сообщений")
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument("--webhook-port", type=int, default=8082)
+    args = parser.parse_args()
+
+    if args.mode is None:
+        print(f"{'mode':<12} {'updates':>8} {'updates/s':>10} {'p50 ms':>8} {'p99 ms':>8} "
+              f"{'429':>6} {'timeouts':>8} {'no button':>8}", flush=True)
+        for mode in args.modes:
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--mode", mode, *sys.argv[1:]], check=True)
+        return
+
+    # Окружение задается до импорта config, его же унаследуют процессы-воркеры
+    database = tempfile.NamedTemporaryFile(suffix=".db", delete=False).name
+    os.environ.update({
+        "DATABASE_URL": f"sqlite+aiosqlite:///{database}",
+        "TELEGRAM_API_URL": f"http://127.0.0.1:{args.api_port}",
+        "BOT_TOKEN": "123456:fake",
+        # Сценарий пользователя быстрее человека: лимит антифлуда мерил бы сам себя
+        "ANTIFLOOD_RATE": "1000",
+        "ANTIFLOOD_BURST": "1000",
+    })
+    try:
+        label = f"{args.mode}x{args.workers}" if args.mode == "sharded" else args.mode
+        print_row(label, asyncio.run(run_mode(args)))
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(database + suffix):
+                os.remove(database + suffix)
+
+
+if __name__ == "__main__":
+    main()
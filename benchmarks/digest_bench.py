@@ -0,0 +1,132 @@
+"""Ежедневная сводка: запрос на каждого пользователя против чтения порциями пользователей.
+
+Наивный вариант собирает сводку каждого пользователя через
+get_user_habits, а сообщения складывает в список перед рассылкой.
+Потоковый — stream_daily_digests и рассылка из асинхронного генератора.
+Отправка идет в поддельный бот без сети и без ограничения скорости,
+так что меряется только чтение, сборка сообщений и память.
+
+    python benchmarks/digest_bench.py --users 1000 5000 20000 --habits 5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_database = tempfile.NamedTemporaryFile(suffix=".db", delete=False).name
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_database}"
+os.environ["HABIT_CACHE_MAX_USERS"] = "0"
+
+from sqlalchemy import delete, event, insert  # noqa: E402
+
+from database.models import HabitDailyStats, UserHabit  # noqa: E402
+from database.database import db, get_user_habits, stream_daily_digests  # noqa: E402
+from services.fanout import FanoutDispatcher  # noqa: E402
+from services.reminder_service import build_digest_message  # noqa: E402
+
+
+class NullBot:
+    """Бот, который ничего не отправляет"""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, parse_mode=None, reply_markup=None):
+        self.sent += 1
+
+
+async def seed(users: int, habits: int):
+    today = datetime.utcnow().date()
+    created = datetime.utcnow() - timedelta(days=30)
+    async with db.session() as session:
+        await session.execute(delete(UserHabit))
+        await session.execute(delete(HabitDailyStats))
+        rows = [
+            {"user_id": user, "current_habit": f"Привычка {number}", "emoji": "🎯", "frequency": "daily",
+             "current_streak": number, "best_streak": number, "total_days": number,
+             "last_completed": today, "created_at": created, "updated_at": created}
+            for user in range(1, users + 1) for number in range(habits)
+        ]
+        for start in range(0, len(rows), 5000):
+            await session.execute(insert(UserHabit), rows[start:start + 5000])
+        # Половина привычек выполнена сегодня
+        stats = [
+            {"habit_id": habit_id, "day": today, "user_id": (habit_id - 1) // habits + 1, "completions": 1}
+            for habit_id in range(1, users * habits + 1, 2)
+        ]
+        for start in range(0, len(stats), 5000):
+            await session.execute(insert(HabitDailyStats), stats[start:start + 5000])
+        await session.commit()
+
+
+async def naive_digest(dispatcher: FanoutDispatcher, bot: NullBot, users: int):
+    messages = []
+    for user_id in range(1, users + 1):
+        habits = await get_user_habits(user_id)
+        messages.append(build_digest_message({
+            "user_id": user_id,
+            "completed": sum(habit["completed_today"] for habit in habits),
+            "habits": [
+                {"name": habit["name"], "emoji": habit["emoji"], "streak": habit["streak"],
+                 "completed": habit["completed_today"]}
+                for habit in habits
+            ],
+        }))
+    return await dispatcher.dispatch(bot, "naive", messages)
+
+
+async def streamed_digest(dispatcher: FanoutDispatcher, bot: NullBot, users: int):
+    async def messages():
+        async for digest in stream_daily_digests(datetime.utcnow().date()):
+            yield build_digest_message(digest)
+
+    return await dispatcher.dispatch(bot, "streamed", messages())
+
+
+async def measure(run, users: int):
+    queries = 0
+
+    def count(*args):
+        nonlocal queries
+        queries += 1
+
+    event.listen(db.engine.sync_engine, "before_cursor_execute", count)
+    bot = NullBot()
+    dispatcher = FanoutDispatcher(global_rate=1e9, per_chat_rate=1e9, concurrency=4, queue_size=200)
+    tracemalloc.start()
+    started = time.perf_counter()
+    await run(dispatcher, bot, users)
+    duration = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    event.remove(db.engine.sync_engine, "before_cursor_execute", count)
+    return bot.sent, duration, queries, peak
+
+
+async def main(args):
+    await db.init_models()
+    print(f"{'users':>7} {'variant':<9} {'sent':>7} {'time s':>8} {'queries':>8} {'peak MiB':>9}")
+    for users in args.users:
+        await seed(users, args.habits)
+        for name, run in (("naive", naive_digest), ("streamed", streamed_digest)):
+            sent, duration, queries, peak = await measure(run, users)
+            print(f"{users:>7} {name:<9} {sent:>7} {duration:>8.2f} {queries:>8} {peak / 2 ** 20:>9.1f}", flush=True)
+    await db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--habits", type=int, default=5)
+    try:
+        asyncio.run(main(parser.parse_args()))
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(_database + suffix):
+                os.remove(_database + suffix)
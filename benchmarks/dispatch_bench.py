@@ -0,0 +1,83 @@
+"""Стоимость выбора хэндлера в зависимости от их числа.
+
+Роутер с N кнопками и N префиксами callback_data в двух вариантах:
+обычный Router с F.text == "..." / F.data.startswith("...") и
+TableRouter. Апдейты идут через Dispatcher.feed_update, хэндлеры
+ничего не делают, поэтому замер — это проход апдейта через
+aiogram и фильтры. Меряются первая и последняя кнопка, последний
+префикс и апдейт, который никуда не подошел.
+
+    python benchmarks/dispatch_bench.py --handlers 10 50 200 1000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram import Bot, Dispatcher, F, Router  # noqa: E402
+from aiogram.types import Update  # noqa: E402
+
+from benchmarks.webhook_client import fake_callback_update, fake_message_update  # noqa: E402
+from utils.dispatch import TableRouter  # noqa: E402
+
+
+async def noop(event):
+    pass
+
+
+def filter_router(handlers: int) -> Router:
+    router = Router()
+    for number in range(handlers):
+        router.message.register(noop, F.text == f"Кнопка {number}")
+        router.callback_query.register(noop, F.data.startswith(f"action{number}_"))
+    return router
+
+
+def table_router(handlers: int) -> Router:
+    router = TableRouter()
+    for number in range(handlers):
+        router.text(f"Кнопка {number}")(noop)
+        router.data_prefix(f"action{number}_")(noop)
+    return router
+
+
+async def measure(dp: Dispatcher, bot: Bot, update: Update, repeat: int) -> float:
+    for _ in range(50):
+        await dp.feed_update(bot, update)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await dp.feed_update(bot, update)
+    return (time.perf_counter() - started) / repeat
+
+
+async def main(args):
+    bot = Bot("123456:fake")
+    cases = {
+        "first text": lambda n: fake_message_update(1, "Кнопка 0"),
+        "last text": lambda n: fake_message_update(1, f"Кнопка {n - 1}"),
+        "last prefix": lambda n: fake_callback_update(1, f"action{n - 1}_42"),
+        "miss": lambda n: fake_message_update(1, "unmatched text"),
+    }
+    print(f"{'handlers':>8} {'update':<12} {'filters us':>11} {'table us':>9}")
+    for handlers in args.handlers:
+        results = {}
+        for name, build in (("filters", filter_router), ("table", table_router)):
+            dp = Dispatcher()
+            dp.include_router(build(handlers))
+            for case, make in cases.items():
+                update = Update.model_validate(make(handlers))
+                results[name, case] = await measure(dp, bot, update, args.repeat)
+        for case in cases:
+            print(f"{handlers:>8} {case:<12} {results['filters', case] * 1e6:>11.1f} "
+                  f"{results['table', case] * 1e6:>9.1f}", flush=True)
+    await bot.session.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--handlers", type=int, nargs="+", default=[10, 50, 200, 1000])
+    parser.add_argument("--repeat", type=int, default=500)
+    asyncio.run(main(parser.parse_args()))
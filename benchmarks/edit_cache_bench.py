@@ -0,0 +1,139 @@
+"""Правки без изменений: сколько вызовов Bot API экономит кэш сообщений.
+
+Пользователи повторно нажимают кнопки, которые перерисовывают то же
+самое: карточку привычки, ту же страницу списка, тот же период
+статистики, "выполнено" для уже выполненной привычки. Апдейты идут
+через настоящий диспетчер, Bot API подменен middleware сессии: он
+ждет --rtt секунд и, как Telegram, отвечает ошибкой "message is not
+modified", если текст и клавиатура не изменились.
+
+    python benchmarks/edit_cache_bench.py --users 20 --repeats 5 --rtt 0.05
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_database = tempfile.NamedTemporaryFile(suffix=".db", delete=False).name
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_database}"
+os.environ.setdefault("BOT_TOKEN", "123456:fake")
+# Повторные нажатия здесь — нагрузка, а не флуд: антифлуд не должен их склеивать
+os.environ["ANTIFLOOD_WINDOW"] = "0"
+os.environ["ANTIFLOOD_BURST"] = "1000"
+
+from aiogram import Bot  # noqa: E402
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware  # noqa: E402
+from aiogram.exceptions import TelegramBadRequest  # noqa: E402
+from aiogram.methods import EditMessageReplyMarkup, EditMessageText, SendMessage  # noqa: E402
+from aiogram.types import Chat, Message, Update  # noqa: E402
+
+import bot as bot_module  # noqa: E402
+from database.database import db  # noqa: E402
+from benchmarks.webhook_client import fake_callback_update  # noqa: E402
+from keyboards import CompleteHabit, HabitCard, HabitsPage, StatsPeriod  # noqa: E402
+from services.edit_cache import EditCache, EditCacheMiddleware  # noqa: E402
+
+
+class FakeApi(BaseRequestMiddleware):
+    """Bot API без сети: задержка и проверка "message is not modified" по содержимому"""
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.calls: Dict[str, int] = {}
+        self.not_modified = 0
+        self.shown: Dict[Tuple[int, int], Tuple[str, str]] = {}
+
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__name__
+        self.calls[name] = self.calls.get(name, 0) + 1
+        await asyncio.sleep(self.rtt)
+        if isinstance(method, SendMessage):
+            return Message(message_id=1, date=datetime.now(), text=method.text,
+                           chat=Chat(id=method.chat_id, type="private"))
+        if isinstance(method, (EditMessageText, EditMessageReplyMarkup)):
+            key = (method.chat_id, method.message_id)
+            markup = method.reply_markup.model_dump_json() if method.reply_markup else ""
+            text = method.text if isinstance(method, EditMessageText) else self.shown.get(key, ("", ""))[0]
+            if self.shown.get(key) == (text, markup):
+                self.not_modified += 1
+                raise TelegramBadRequest(method, "Bad Request: message is not modified")
+            self.shown[key] = (text, markup)
+        return True
+
+
+async def seed(users: int, habits: int):
+    ids = {}
+    for user in range(users):
+        ids[user] = [await bot_module.repo.add_habit(user + 1, f"Привычка {number}") for number in range(habits)]
+    return ids
+
+
+async def run(dp, cache, args, habit_ids) -> dict:
+    bot = Bot("123456:fake")
+    if cache is not None:
+        bot.session.middleware(EditCacheMiddleware(cache))
+    api = FakeApi(args.rtt)
+    bot.session.middleware(api)
+
+    async def press(user: int, data: str):
+        await dp.feed_update(bot, Update.model_validate(fake_callback_update(user + 1, data)))
+
+    async def session(user: int):
+        habit_id = habit_ids[user]
+        # Каждое нажатие повторяется: первое меняет сообщение, остальные — нет
+        for data in (HabitCard(habit_id=habit_id).pack(), CompleteHabit(habit_id=habit_id).pack(),
+                     HabitsPage(page=1).pack(), StatsPeriod(period="week").pack()):
+            for _ in range(args.repeats):
+                await press(user, data)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(session(user) for user in range(args.users)))
+    elapsed = time.perf_counter() - started
+    await bot.session.close()
+    return {
+        "edits": api.calls.get("EditMessageText", 0) + api.calls.get("EditMessageReplyMarkup", 0),
+        "not_modified": api.not_modified,
+        "calls": sum(api.calls.values()),
+        # Нажатия одного пользователя идут подряд: среднее время ответа на нажатие
+        "ms_per_press": elapsed / (4 * args.repeats) * 1000,
+        "skipped": sum(cache.skipped.values()) if cache is not None else 0,
+    }
+
+
+async def main(args):
+    # Без кэша хэндлеры логируют каждую ошибку "message is not modified"
+    logging.disable(logging.ERROR)
+    await db.init_models()
+    habit_ids = await seed(args.users, args.habits)
+    # Роутеры подключаются к одному диспетчеру, он общий для обоих прогонов
+    dp = bot_module.create_dispatcher()
+    print(f"{'':<10} {'API calls':>10} {'edits':>7} {'not modified':>13} {'skipped':>8} {'ms/press':>9}")
+    for run_number, (name, cache) in enumerate((("no cache", None), ("cache", EditCache()))):
+        # Своя привычка на прогон: "выполнено" в первом не должно влиять на второй
+        ids = {user: habits[run_number] for user, habits in habit_ids.items()}
+        report = await run(dp, cache, args, ids)
+        print(f"{name:<10} {report['calls']:>10} {report['edits']:>7} {report['not_modified']:>13} "
+              f"{report['skipped']:>8} {report['ms_per_press']:>9.1f}", flush=True)
+    await dp.emit_shutdown()
+    await db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--habits", type=int, default=6)
+    parser.add_argument("--repeats", type=int, default=5, help="нажатий одной кнопки подряд")
+    parser.add_argument("--rtt", type=float, default=0.05, help="время ответа Bot API, с")
+    try:
+        asyncio.run(main(parser.parse_args()))
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(_database + suffix):
+                os.remove(_database + suffix)
@@ -0,0 +1,173 @@
+"""Поддельный сервер Bot API для нагрузочных тестов.
+
+Отдает апдейты из очереди через getUpdates (long polling), принимает
+sendMessage, editMessageText, answerCallbackQuery и прочие методы и
+с заданной вероятностью отвечает 429 Too Many Requests. Для каждого
+чата запоминает последнее сообщение бота с инлайн-клавиатурой и время
+первого ответа на каждый апдейт.
+
+Бот подключается к нему через TELEGRAM_API_URL=http://127.0.0.1:<port>.
+"""
+import asyncio
+import itertools
+import json
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}
+
+# Методы, которые могут получить 429 (getUpdates и служебные — никогда)
+THROTTLED_METHODS = {"sendmessage", "editmessagetext", "answercallbackquery", "senddocument"}
+
+
+class FakeTelegram:
+    """Состояние поддельного Bot API"""
+
+    def __init__(self, rate_limit_ratio: float = 0.0, retry_after: int = 1, seed: int = 42):
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._updates: List[Dict[str, Any]] = []
+        self._new_updates = asyncio.Event()
+        self._message_ids = itertools.count(1000)
+        self._callbacks: Dict[str, int] = {}  # callback_query_id -> chat_id
+        self._waiting: Dict[int, List[asyncio.Future]] = {}
+        self._sent_at: Dict[int, float] = {}
+        self._last_response: Dict[int, float] = {}
+        self.keyboards: Dict[int, List[str]] = {}  # chat_id -> callback_data последней инлайн-клавиатуры
+        self.messages: Dict[int, int] = {}  # chat_id -> message_id последнего сообщения бота
+        self.latencies: List[float] = []
+        self.calls: Dict[str, int] = {}
+        self.rate_limited = 0
+
+    # ---------- Сторона пользователя ----------
+    def track(self, update: Dict[str, Any]) -> Optional[int]:
+        """Запомнить момент отправки апдейта, вернуть chat_id"""
+        if "message" in update:
+            chat_id = update["message"]["chat"]["id"]
+        else:
+            callback = update["callback_query"]
+            chat_id = callback["from"]["id"]
+            self._callbacks[callback["id"]] = chat_id
+        self._sent_at[chat_id] = time.perf_counter()
+        return chat_id
+
+    def push(self, update: Dict[str, Any]):
+        """Положить апдейт в очередь getUpdates"""
+        self.track(update)
+        self._updates.append(update)
+        self._new_updates.set()
+
+    def wait_response(self, chat_id: int) -> asyncio.Future:
+        """Future, который завершится на первом ответе бота в чат"""
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(chat_id, []).append(future)
+        return future
+
+    async def wait_quiet(self, chat_id: int, quiet: float, limit: float = 1.0):
+        """Дождаться, пока бот не пишет в чат хотя бы quiet секунд"""
+        deadline = time.perf_counter() + limit
+        while time.perf_counter() < deadline:
+            idle = time.perf_counter() - self._last_response.get(chat_id, 0.0)
+            if idle >= quiet:
+                return
+            await asyncio.sleep(quiet - idle)
+
+    # ---------- Сторона бота ----------
+    def _responded(self, chat_id: Optional[int]):
+        if chat_id is None:
+            return
+        self._last_response[chat_id] = time.perf_counter()
+        sent_at = self._sent_at.pop(chat_id, None)
+        if sent_at is not None:
+            self.latencies.append(time.perf_counter() - sent_at)
+        for future in self._waiting.pop(chat_id, []):
+            if not future.done():
+                future.set_result(None)
+
+    def _remember_message(self, chat_id: int, params: Dict[str, Any], message_id: int):
+        markup = params.get("reply_markup")
+        if isinstance(markup, str):
+            markup = json.loads(markup)
+        if markup and "inline_keyboard" in markup:
+            self.keyboards[chat_id] = [
+                button["callback_data"] for row in markup["inline_keyboard"] for button in row
+                if "callback_data" in button
+            ]
+        self.messages[chat_id] = message_id
+
+    def _message(self, chat_id: int, message_id: int, text: str) -> Dict[str, Any]:
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": text,
+        }
+
+    async def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(params.get("offset") or 0)
+        if offset:
+            self._updates = [update for update in self._updates if update["update_id"] >= offset]
+        if not self._updates:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout=float(params.get("timeout") or 0))
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:int(params.get("limit") or 100)]
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        if request.content_type == "multipart/form-data":
+            params = {key: value for key, value in (await request.post()).items() if isinstance(value, str)}
+        else:
+            params = dict(await request.post())
+        self.calls[method] = self.calls.get(method, 0) + 1
+
+        if method in THROTTLED_METHODS and self._random.random() < self.rate_limit_ratio:
+            self.rate_limited += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            })
+
+        result: Any = True
+        if method == "getme":
+            result = BOT_USER
+        elif method == "getupdates":
+            result = await self._get_updates(params)
+        elif method in ("sendmessage", "senddocument"):
+            chat_id = int(params["chat_id"])
+            message_id = next(self._message_ids)
+            self._remember_message(chat_id, params, message_id)
+            result = self._message(chat_id, message_id, params.get("text", ""))
+            self._responded(chat_id)
+        elif method == "editmessagetext":
+            chat_id = int(params["chat_id"])
+            message_id = int(params["message_id"])
+            self._remember_message(chat_id, params, message_id)
+            result = self._message(chat_id, message_id, params.get("text", ""))
+            self._responded(chat_id)
+        elif method == "answercallbackquery":
+            self._responded(self._callbacks.pop(params.get("callback_query_id"), None))
+
+        return web.json_response({"ok": True, "result": result})
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        return app
+
+
+async def start_fake_telegram(fake: FakeTelegram, host: str = "127.0.0.1", port: int = 8081) -> web.AppRunner:
+    """Запустить сервер, вернуть runner для остановки"""
+    runner = web.AppRunner(fake.build_app())
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    return runner
@@ -0,0 +1,69 @@
+"""Карточка привычки: f-строка на каждый показ против общего рендерера.
+
+- f-string — как раньше строили карточку в хэндлерах (без экранирования);
+- render cold — первая отрисовка версии привычки: шаблон + экранирование;
+- render cached — повторный показ неизмененной привычки.
+
+    python benchmarks/habit_card_bench.py
+"""
+import os
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import habit_card  # noqa: E402
+
+HABIT = {
+    "id": 42,
+    "name": "Читать <перед сном> & не спорить",
+    "description": "20 страниц в день, лучше бумажную книгу",
+    "emoji": "📚",
+    "reminder_time": "21:00",
+    "streak": 12,
+    "completed_today": False,
+    "created_at": datetime(2024, 1, 15, 8, 30),
+    "updated_at": datetime(2024, 3, 2, 19, 45, 12, 123456),
+}
+
+
+def fstring_card(habit: dict) -> str:
+    """Прежний код show_habit_details"""
+    completed_today = habit.get('completed_today', False)
+    streak = habit.get('streak', 0)
+    reminder_time = habit.get('reminder_time', 'нет')
+    created_at = habit.get('created_at', '')
+
+    status = "✅ Выполнено сегодня" if completed_today else "⏳ Ожидает выполнения"
+
+    return f"""
+{habit.get('emoji', '🎯')} <b>{habit['name']}</b>
+
+{habit.get('description', '')}
+
+<b>Статус:</b> {status}
+<b>Цепочка:</b> 🔥 {streak} дней
+<b>Время напоминания:</b> {reminder_time}
+<b>Создана:</b> {str(created_at)[:10] if created_at else 'Неизвестно'}
+        """
+
+
+def latency_us(func, number: int = 200000) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    cases = [
+        ("f-string", lambda: fstring_card(HABIT)),
+        ("render cold", lambda: habit_card._render(HABIT, False, 12, None)),
+        ("render cached", lambda: habit_card.render_habit_card(HABIT)),
+    ]
+    print(f"{'card':<16} {'µs/card':>9}")
+    for name, func in cases:
+        print(f"{name:<16} {latency_us(func):>9.3f}")
+    print(f"\ncache: {habit_card.get_card_cache_stats()}")
+
+
+if __name__ == "__main__":
+    main()
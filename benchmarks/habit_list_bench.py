@@ -0,0 +1,81 @@
+"""Список привычек: весь список и срез против одной страницы из БД.
+
+Для пользователей с разным числом привычек меряется холодный (без
+кэша) показ первой и последней страницы: get_user_habits + срез в
+клавиатуре против get_habits_page + готовая страница.
+
+    python benchmarks/habit_list_bench.py --habits 5 50 500 2000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_database = tempfile.NamedTemporaryFile(suffix=".db", delete=False).name
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_database}"
+
+from sqlalchemy import insert  # noqa: E402
+
+from config import HABITS_PER_PAGE  # noqa: E402
+from database.database import db, get_habits_page, get_user_habits, habit_cache  # noqa: E402
+from database.models import UserHabit  # noqa: E402
+from keyboards import get_habits_keyboard  # noqa: E402
+
+
+async def seed(user_id: int, habits: int):
+    now = datetime.utcnow()
+    async with db.session() as session:
+        await session.execute(insert(UserHabit), [
+            {"user_id": user_id, "current_habit": f"Привычка {number}", "emoji": "🎯",
+             "frequency": "daily", "created_at": now, "updated_at": now}
+            for number in range(habits)
+        ])
+        await session.commit()
+
+
+async def full_list(user_id: int, page: int):
+    habits = await get_user_habits(user_id)
+    return get_habits_keyboard(habits, page)
+
+
+async def one_page(user_id: int, page: int):
+    result = await get_habits_page(user_id, page)
+    return get_habits_keyboard(result["habits"], result["page"], total=result["total"])
+
+
+async def measure(render, user_id: int, page: int, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        habit_cache.clear()
+        await render(user_id, page)
+    return (time.perf_counter() - started) / repeat
+
+
+async def main(args):
+    await db.init_models()
+    print(f"{'habits':>7} {'page':>5} {'full list ms':>13} {'one page ms':>12}")
+    for user_id, habits in enumerate(args.habits, 1):
+        await seed(user_id, habits)
+        last_page = max(habits - 1, 0) // HABITS_PER_PAGE
+        for page in sorted({0, last_page}):
+            full = await measure(full_list, user_id, page, args.repeat)
+            paged = await measure(one_page, user_id, page, args.repeat)
+            print(f"{habits:>7} {page:>5} {full * 1000:>13.2f} {paged * 1000:>12.2f}", flush=True)
+    await db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--habits", type=int, nargs="+", default=[5, 50, 500, 2000])
+    parser.add_argument("--repeat", type=int, default=50)
+    try:
+        asyncio.run(main(parser.parse_args()))
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(_database + suffix):
+                os.remove(_database + suffix)
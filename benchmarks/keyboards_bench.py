@@ -0,0 +1,52 @@
+"""Микробенчмарк клавиатур: сборка на каждый апдейт против готовой разметки.
+
+    python benchmarks/keyboards_bench.py
+"""
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from keyboards import keyboards as kb  # noqa: E402
+
+CASES = [
+    ("main_menu", kb._build_main_menu, kb.get_main_menu),
+    ("time_selection", kb._build_time_selection_keyboard, kb.get_time_selection_keyboard),
+    ("frequency", kb._build_frequency_keyboard, kb.get_frequency_keyboard),
+    ("stats_period", kb._build_stats_period_keyboard, kb.get_stats_period_keyboard),
+    ("confirm", kb._build_confirm_keyboard, kb.get_confirm_keyboard),
+    ("habit_actions(42)", lambda: kb._build_habit_actions_keyboard(42), lambda: kb.get_habit_actions_keyboard(42)),
+    ("edit_habit(42)", lambda: kb._build_edit_habit_keyboard(42), lambda: kb.get_edit_habit_keyboard(42)),
+    ("emoji_selection(42)", lambda: kb._build_emoji_selection_keyboard(42), lambda: kb.get_emoji_selection_keyboard(42)),
+]
+
+
+def latency_us(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def allocated_bytes(func, calls: int = 100) -> float:
+    func()  # прогрев кэшей
+    tracemalloc.start()
+    snapshot_before = tracemalloc.take_snapshot()
+    results = [func() for _ in range(calls)]
+    snapshot_after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    del results
+    diff = sum(stat.size_diff for stat in snapshot_after.compare_to(snapshot_before, "filename"))
+    return max(diff, 0) / calls
+
+
+def main():
+    print(f"{'keyboard':<22} {'build µs':>10} {'cached µs':>10} {'build B':>9} {'cached B':>9}")
+    for name, build, cached in CASES:
+        print(
+            f"{name:<22} {latency_us(build, 2000):>10.2f} {latency_us(cached, 200000):>10.3f} "
+            f"{allocated_bytes(build):>9.0f} {allocated_bytes(cached):>9.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
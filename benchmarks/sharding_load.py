@@ -0,0 +1,79 @@
+"""Нагрузочный тест режима sharded: пропускная способность от числа воркеров.
+
+Каждый апдейт обрабатывается хэндлером, который тратит ~1 мс CPU
+(как рендер клавиатур и текста) и ждет ~2 мс "ответа API". Фронт
+раздает апдейты воркерам по from_user.id.
+
+    python benchmarks/sharding_load.py --updates 20000 --workers 1 2 4
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio  # noqa: E402
+
+from aiogram import Dispatcher  # noqa: E402
+
+from benchmarks.webhook_client import fake_updates  # noqa: E402
+from services.sharding import ShardedRunner  # noqa: E402
+
+CPU_WORK_SECONDS = 0.001
+IO_WAIT_SECONDS = 0.002
+
+
+def build_bench_dispatcher() -> Dispatcher:
+    dp = Dispatcher()
+
+    async def busy(*args, **kwargs):
+        deadline = time.perf_counter() + CPU_WORK_SECONDS
+        while time.perf_counter() < deadline:
+            pass
+        await asyncio.sleep(IO_WAIT_SECONDS)
+
+    dp.message.register(busy)
+    dp.callback_query.register(busy)
+    return dp
+
+
+def run(workers: int, updates: int, users: int) -> float:
+    stats_queue = mp.get_context("spawn").Queue()
+    runner = ShardedRunner(build_bench_dispatcher, workers, token="123456:fake", stats_queue=stats_queue)
+    runner.start()
+    for _ in range(workers):
+        stats_queue.get(timeout=60)  # ("ready", index)
+
+    payload = list(fake_updates(updates, users))
+    started = time.perf_counter()
+    for update in payload:
+        runner.route(update)
+    runner.stop(timeout=600)
+
+    processed = 0
+    for _ in range(workers):
+        processed += stats_queue.get(timeout=60)[2]  # ("done", index, processed)
+    duration = time.perf_counter() - started
+    assert processed == updates, f"processed {processed} of {updates}"
+    return updates / duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    baseline = None
+    print(f"{'workers':>8} {'updates/s':>10} {'speedup':>8}")
+    for workers in args.workers:
+        throughput = run(workers, args.updates, args.users)
+        baseline = baseline or throughput
+        print(f"{workers:>8} {throughput:>10.0f} {throughput / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
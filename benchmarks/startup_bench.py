@@ -0,0 +1,164 @@
+"""Время запуска бота и накладные расходы на апдейт.
+
+1. Холодный импорт модулей, каждый в новом процессе: сколько занимает
+   и подтягивает ли он SQLAlchemy.
+2. Старт до готовности: импорт bot, create_dispatcher() и init_models()
+   на временной БД, по фазам.
+3. Поиск функции БД в хэндлере: import внутри функции на каждый вызов
+   против атрибута repo, найденного при старте.
+4. Полный проход апдейта через диспетчер (feed_update) без сети: Bot API
+   подменен middleware сессии, который сразу возвращает ответ.
+
+    python benchmarks/startup_bench.py --runs 5 --updates 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+print(json.dumps({{"seconds": time.perf_counter() - started, "sqlalchemy": "sqlalchemy" in sys.modules}}))
+"""
+
+STARTUP_PROBE = """
+import asyncio, json, time
+started = time.perf_counter()
+import bot
+imported = time.perf_counter()
+dp = bot.create_dispatcher()
+created = time.perf_counter()
+
+async def init():
+    from database.database import db
+    await db.init_models()
+    await db.close()
+
+asyncio.run(init())
+ready = time.perf_counter()
+print(json.dumps({"import": imported - started, "dispatcher": created - imported, "db": ready - created}))
+"""
+
+
+def probe(code: str, database: str) -> dict:
+    env = dict(os.environ, DATABASE_URL=f"sqlite+aiosqlite:///{database}", BOT_TOKEN="123456:fake")
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def cold_imports(runs: int, database: str):
+    print(f"{'module':<26} {'import ms':>10} {'sqlalchemy':>11}")
+    for module in ("config", "keyboards", "handlers", "database.database", "bot"):
+        results = [probe(IMPORT_PROBE.format(module=module), database) for _ in range(runs)]
+        seconds = statistics.median(result["seconds"] for result in results)
+        print(f"{module:<26} {seconds * 1000:>10.0f} {str(results[0]['sqlalchemy']):>11}")
+
+
+def startup(runs: int, database: str):
+    results = []
+    for _ in range(runs):
+        if os.path.exists(database):
+            os.remove(database)
+        results.append(probe(STARTUP_PROBE, database))
+    print(f"\n{'phase':<26} {'ms':>10}")
+    for phase in ("import", "dispatcher", "db"):
+        print(f"{phase:<26} {statistics.median(result[phase] for result in results) * 1000:>10.0f}")
+    total = statistics.median(sum(result.values()) for result in results)
+    print(f"{'total':<26} {total * 1000:>10.0f}")
+
+
+def lookup_overhead():
+    from database.repository import repo
+
+    def local_import():
+        from database.database import get_user_habits
+        return get_user_habits
+
+    def resolved():
+        return repo.get_user_habits
+
+    repo.resolve()
+    print(f"\n{'lookup per call':<26} {'ns':>10}")
+    for name, func in (("import inside handler", local_import), ("repo attribute", resolved)):
+        seconds = min(timeit.repeat(func, number=200000, repeat=5)) / 200000
+        print(f"{name:<26} {seconds * 1e9:>10.0f}")
+
+
+async def update_overhead(updates: int):
+    from datetime import datetime
+
+    from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+    from aiogram.methods import SendMessage
+    from aiogram.types import Chat, Message, Update
+
+    import bot as bot_module
+    from benchmarks.webhook_client import fake_message_update
+    from database.database import db
+    from services.telegram import create_bot
+
+    class CannedResponses(BaseRequestMiddleware):
+        """Ответ Bot API без сети"""
+
+        async def __call__(self, make_request, bot, method):
+            if isinstance(method, SendMessage):
+                return Message(message_id=1, date=datetime.now(), text=method.text,
+                               chat=Chat(id=method.chat_id, type="private"))
+            return True
+
+    await db.init_models()
+    bot = create_bot("123456:fake")
+    bot.session.middleware(CannedResponses())
+    dp = bot_module.create_dispatcher()
+
+    print(f"\n{'update':<26} {'us/update':>10}")
+    for text in ("/help", "📝 Мои привычки", "unmatched text"):
+        batch = [Update.model_validate(fake_message_update(100 + number % 50, text)) for number in range(updates)]
+        for update in batch[:50]:
+            await dp.feed_update(bot, update)
+        started = time.perf_counter()
+        for update in batch:
+            await dp.feed_update(bot, update)
+        elapsed = time.perf_counter() - started
+        print(f"{text:<26} {elapsed / updates * 1e6:>10.0f}")
+
+    await dp.emit_shutdown(bot=bot)
+    await bot.session.close()
+    await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="запусков процесса на замер")
+    parser.add_argument("--updates", type=int, default=2000)
+    args = parser.parse_args()
+
+    database = tempfile.NamedTemporaryFile(suffix=".db", delete=False).name
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{database}"
+    os.environ.setdefault("BOT_TOKEN", "123456:fake")
+    try:
+        cold_imports(args.runs, database)
+        startup(args.runs, database)
+        lookup_overhead()
+        import logging
+        logging.disable(logging.INFO)
+        asyncio.run(update_overhead(args.updates))
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(database + suffix):
+                os.remove(database + suffix)
+
+
+if __name__ == "__main__":
+    main()
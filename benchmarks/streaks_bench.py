@@ -0,0 +1,64 @@
+"""Бенчмарк расчета цепочек: битовые карты против цикла по дням.
+
+Генерирует случайные истории привычек всех частот, сверяет результаты
+двух реализаций и печатает время пересчета всего набора привычек.
+
+    python benchmarks/streaks_bench.py --habits 2000 --years 1 3 10
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.streaks import (  # noqa: E402
+    DUE_WEEKDAYS, WEEKLY_TARGETS, batch_habit_stats, days_to_bits, naive_habit_stats
+)
+
+FREQUENCIES = list(DUE_WEEKDAYS) + list(WEEKLY_TARGETS)
+
+
+def fake_histories(habits: int, years: int, today: date, seed: int = 42):
+    rng = random.Random(seed)
+    for habit_id in range(habits):
+        length = rng.randint(1, 365 * years)
+        start = today - timedelta(days=length - 1)
+        ratio = rng.choice([0.3, 0.7, 0.95])
+        days = [start + timedelta(days=offset) for offset in range(length) if rng.random() < ratio]
+        yield habit_id, rng.choice(FREQUENCIES), start, days
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--habits", type=int, default=2000)
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 3, 10])
+    args = parser.parse_args()
+
+    today = date.today()
+    print(f"{'years':>6} {'habits':>7} {'naive ms':>10} {'bitmap ms':>10} {'speedup':>8}")
+    for years in args.years:
+        histories = list(fake_histories(args.habits, years, today))
+        packed = [(habit_id, frequency, start, days_to_bits(days, start))
+                  for habit_id, frequency, start, days in histories]
+
+        started = time.perf_counter()
+        naive = {habit_id: naive_habit_stats(days, start, today, frequency)
+                 for habit_id, frequency, start, days in histories}
+        naive_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        batched = batch_habit_stats(packed, today)
+        bitmap_time = time.perf_counter() - started
+
+        assert batched == naive, "bitmap kernel disagrees with the naive loop"
+        print(
+            f"{years:>6} {args.habits:>7} {naive_time * 1000:>10.1f} {bitmap_time * 1000:>10.1f} "
+            f"{naive_time / bitmap_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
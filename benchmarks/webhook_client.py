@@ -0,0 +1,113 @@
+"""Локальная замена Telegram для webhook-режима.
+
+Шлет POST-запросы с поддельными Update на запущенный бот
+(BOT_MODE=webhook, WEBHOOK_URL пустой) и считает время ответа.
+
+    python benchmarks/webhook_client.py --updates 1000 --concurrency 50
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import time
+
+from aiohttp import ClientSession
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEXTS = ["📝 Мои привычки", "📊 Статистика", "⚙️ Настройки", "/start", "/help"]
+
+_update_ids = itertools.count(1)
+
+
+def fake_message_update(user_id: int, text: str) -> dict:
+    update_id = next(_update_ids)
+    user = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private", "first_name": user["first_name"]},
+            "from": user,
+            "text": text,
+        },
+    }
+
+
+def fake_callback_update(user_id: int, data: str) -> dict:
+    update_id = next(_update_ids)
+    user = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": user,
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": 1,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private", "first_name": user["first_name"]},
+                "from": {"id": 1, "is_bot": True, "first_name": "bot"},
+                "text": "📋 Ваши привычки:",
+            },
+        },
+    }
+
+
+def fake_callbacks() -> list:
+    """callback_data кнопок в том виде, в каком их упаковывает бот"""
+    # keyboards читает config, поэтому импортируется при первом использовании
+    from keyboards import BackToHabits, BackToMenu, HabitsPage, StatsPeriod
+
+    return [HabitsPage(page=1).pack(), BackToHabits().pack(), StatsPeriod(period="week").pack(), BackToMenu().pack()]
+
+
+def fake_updates(count: int, users: int):
+    callbacks = fake_callbacks()
+    for i in range(count):
+        user_id = 100000 + i % users
+        if i % 3 == 2:
+            yield fake_callback_update(user_id, callbacks[i % len(callbacks)])
+        else:
+            yield fake_message_update(user_id, TEXTS[i % len(TEXTS)])
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8080/webhook")
+    parser.add_argument("--secret", default="")
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    headers = {"X-Telegram-Bot-Api-Secret-Token": args.secret} if args.secret else {}
+    latencies = []
+    statuses = {}
+    updates = fake_updates(args.updates, args.users)
+
+    async def worker(session: ClientSession):
+        for update in updates:
+            started = time.perf_counter()
+            async with session.post(args.url, json=update, headers=headers) as response:
+                await response.read()
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    async with ClientSession() as session:
+        await asyncio.gather(*(worker(session) for _ in range(args.concurrency)))
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"updates:   {len(latencies)} in {duration:.2f}s ({len(latencies) / duration:.0f} updates/s)")
+    print(f"statuses:  {statuses}")
+    print(f"ack p50:   {latencies[len(latencies) // 2] * 1000:.2f} ms")
+    print(f"ack p99:   {latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
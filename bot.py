@@ -1,69 +1,80 @@
 import asyncio
 import logging
-from aiogram import Bot, Dispatcher, F
-from aiogram.filters import Command
-from aiogram.fsm.storage.memory import MemoryStorage
-
-from config import BOT_TOKEN
-from database.database import db
-from handlers.start_handler import cmd_start, cmd_menu
-from handlers.menu_handlers import (
-    show_current_habit, show_statistics, change_habit_start,
-    confirm_habit_change, cancel_habit_change
-)
-from handlers.habit_handlers import (
-    go_back, process_habit_type, process_negative_habit,
-    process_positive_habit, process_daily_check
-)
-from utils.states import HabitStates
+from aiogram import Dispatcher
+
+from config import BOT_TOKEN, BOT_MODE, BOT_WORKERS
+from database.repository import repo
+from handlers import routers
+from services.antiflood import setup_antiflood
+from services.telegram import create_bot
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Инициализация бота и диспетчера
-bot = Bot(token=BOT_TOKEN)
-storage = MemoryStorage()
-dp = Dispatcher(storage=storage)
-
-# Регистрация обработчиков
-def register_handlers():
-    # Команды
-    dp.message.register(cmd_start, Command("start"))
-    dp.message.register(cmd_menu, Command("menu"))
-    
-    # Главное меню
-    dp.message.register(show_current_habit, F.text == "📋 Текущая привычка")
-    dp.message.register(show_statistics, F.text == "📊 Статистика")
-    dp.message.register(change_habit_start, F.text == "🔄 Сменить привычку")
-    
-    # Смена привычки
-    dp.message.register(confirm_habit_change, HabitStates.confirming_change, F.text == "✅ Да, сменить")
-    dp.message.register(cancel_habit_change, HabitStates.confirming_change, F.text == "❌ Нет, остаться")
-    
-    # Навигация
-    dp.message.register(go_back, F.text == "🔙 Назад")
-    
-    # Выбор привычек
-    dp.message.register(process_habit_type, HabitStates.choosing_habit_type, F.text.in_(["❌ Отказаться от", "✅ Приобрести"]))
-    dp.message.register(process_negative_habit, HabitStates.choosing_negative_habit, F.text.in_(["Курение", "Алкоголь", "Телефон допоздна", "Прокрастинация", "Недостаток сна"]))
-    dp.message.register(process_positive_habit, HabitStates.choosing_positive_habit, F.text.in_(["Зарядка утром", "Медитация", "Пить воду", "Чтение книг", "Режим питания"]))
-    
-    # Ежедневные проверки
-    dp.message.register(process_daily_check, F.text.in_(["✅ Сделал(а)", "❌ Не сделал(а)", "✅ Да, удалось!", "❌ Нет, не удалось"]))
+
+def create_dispatcher() -> Dispatcher:
+    """Диспетчер со всеми роутерами и своим хранилищем FSM (и для процессов-воркеров).
+
+    Роутер подключается только к одному диспетчеру, поэтому в процессе
+    вызывается один раз. Модули с SQLAlchemy импортируются здесь, а не
+    при импорте bot.
+    """
+    from database.database import db
+    from database.fsm_storage import create_fsm_storage
+    from services.metrics import setup_metrics
+
+    dispatcher = Dispatcher(storage=create_fsm_storage())
+    dispatcher.include_routers(*routers)
+
+    # Метрики: время хэндлеров, БД и Bot API
+    setup_metrics(dispatcher, db.engine)
+
+    # Антифлуд: повторные нажатия и лимит апдейтов на пользователя
+    setup_antiflood(dispatcher)
+
+    # Функции БД находятся один раз при старте, а не на каждом апдейте
+    repo.resolve()
+
+    # Дописать отложенные выполнения до остановки воркера
+    dispatcher.shutdown.register(repo.completion_buffer.close)
+    return dispatcher
+
 
 async def main():
+    from database.database import db
+    from services.reminder_service import set_bot, start_reminder_service, stop_reminder_service
+
     logger.info("Starting bot...")
-    
+
+    bot = create_bot(BOT_TOKEN)
+    dp = create_dispatcher()
+
     # Инициализация БД
     await db.init_models()
     logger.info("Database initialized")
-    
-    # Регистрация обработчиков
-    register_handlers()
-    
+
+    # Напоминания из БД
+    set_bot(bot)
+    await start_reminder_service()
+    logger.info("Reminder service started")
+
     # Запуск бота
-    await dp.start_polling(bot)
+    try:
+        if BOT_MODE == "webhook":
+            from services.webhook import run_webhook
+            await run_webhook(dp, bot)
+        elif BOT_MODE == "sharded":
+            from services.sharding import run_sharded
+            await bot.delete_webhook()
+            await run_sharded(bot, "bot:create_dispatcher", BOT_WORKERS, dp.resolve_used_update_types())
+        else:
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
+    finally:
+        stop_reminder_service()
+        await repo.completion_buffer.close()
+        await db.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -1,36 +1,101 @@
-from sqlalchemy import Column, Integer, String, BigInteger, DateTime, Boolean
-from sqlalchemy.ext.declarative import declarative_base
-from datetime import datetime
-
-Base = declarative_base()
-
-class User(Base):
-    __tablename__ = "users"
-    
-    id = Column(Integer, primary_key=True)
-    user_id = Column(BigInteger, unique=True, nullable=False)
-    username = Column(String(100))
-    first_name = Column(String(100))
-    created_at = Column(DateTime, default=datetime.utcnow)
-
-class UserHabit(Base):
-    __tablename__ = "user_habits"
-    
-    id = Column(Integer, primary_key=True)
-    user_id = Column(BigInteger, nullable=False)
-    current_habit = Column(String(100))
-    habit_type = Column(String(20))  # 'positive' or 'negative'
-    current_streak = Column(Integer, default=0)
-    best_streak = Column(Integer, default=0)
-    total_days = Column(Integer, default=0)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-
-class HabitLog(Base):
-    __tablename__ = "habit_logs"
-    
-    id = Column(Integer, primary_key=True)
-    user_id = Column(BigInteger, nullable=False)
-    habit_name = Column(String(100))
-    success = Column(Boolean)
-    log_date = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Настройки бота
+BOT_TOKEN = os.getenv("BOT_TOKEN", "")
+BOT_MODE = os.getenv("BOT_MODE", "polling")  # 'polling', 'webhook' или 'sharded'
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")  # свой сервер Bot API (локальный или тестовый), пустой — api.telegram.org
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", str(os.cpu_count() or 1)))  # воркеры для режима 'sharded'
+SHARD_MAX_RESTARTS = int(os.getenv("SHARD_MAX_RESTARTS", "3"))  # перезапусков упавшего воркера до остановки бота
+
+# Telegram id администраторов через запятую (команда /metrics)
+ADMIN_IDS = {int(user_id) for user_id in os.getenv("ADMIN_IDS", "").split(",") if user_id.strip()}
+
+# Webhook
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # публичный адрес, пустой — не вызывать setWebhook
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_MAX_IN_FLIGHT = int(os.getenv("WEBHOOK_MAX_IN_FLIGHT", "100"))
+METRICS_PATH = os.getenv("METRICS_PATH", "/metrics")  # GET-эндпоинт метрик на сервере webhook, пустой — выключить
+
+# Настройки базы данных
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///habits.db")
+DB_ECHO = os.getenv("DB_ECHO", "0") == "1"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+HABIT_LOG_AUDIT = os.getenv("HABIT_LOG_AUDIT", "1") == "1"  # писать ли построчный журнал habit_logs
+
+# Кэш привычек
+HABIT_CACHE_MAX_USERS = int(os.getenv("HABIT_CACHE_MAX_USERS", "10000"))
+HABIT_CACHE_TTL = float(os.getenv("HABIT_CACHE_TTL", "300"))
+
+# Отложенная запись выполнений: пачка уходит в БД раз в интервал или при накоплении N событий
+COMPLETION_FLUSH_INTERVAL = float(os.getenv("COMPLETION_FLUSH_INTERVAL", "0.05"))
+COMPLETION_FLUSH_BATCH = int(os.getenv("COMPLETION_FLUSH_BATCH", "500"))
+# Неудачная запись повторяется с удвоением паузы до предела; после N неудач подряд пачка отбрасывается
+COMPLETION_FLUSH_MAX_DELAY = float(os.getenv("COMPLETION_FLUSH_MAX_DELAY", "30"))
+COMPLETION_FLUSH_MAX_RETRIES = int(os.getenv("COMPLETION_FLUSH_MAX_RETRIES", "8"))
+
+# Привычек на странице списка
+HABITS_PER_PAGE = int(os.getenv("HABITS_PER_PAGE", "5"))
+
+# Кэш клавиатур, зависящих от habit_id
+KEYBOARD_CACHE_SIZE = int(os.getenv("KEYBOARD_CACHE_SIZE", "4096"))
+
+# Готовые тексты карточек привычек
+CARD_CACHE_SIZE = int(os.getenv("CARD_CACHE_SIZE", "4096"))
+
+# Сколько последних сообщений бота помнить, чтобы не отправлять правки без изменений
+EDIT_CACHE_SIZE = int(os.getenv("EDIT_CACHE_SIZE", "10000"))
+
+# Массовая рассылка (лимиты Telegram: ~30 сообщений/с всего и ~1/с в один чат)
+FANOUT_GLOBAL_RATE = float(os.getenv("FANOUT_GLOBAL_RATE", "30"))
+FANOUT_PER_CHAT_RATE = float(os.getenv("FANOUT_PER_CHAT_RATE", "1"))
+FANOUT_CONCURRENCY = int(os.getenv("FANOUT_CONCURRENCY", "20"))
+FANOUT_QUEUE_SIZE = int(os.getenv("FANOUT_QUEUE_SIZE", "1000"))
+FANOUT_MAX_RETRIES = int(os.getenv("FANOUT_MAX_RETRIES", "3"))
+
+# Антифлуд: одинаковые нажатия на ту же кнопку в течение ANTIFLOOD_WINDOW секунд после
+# обработки склеиваются; на пользователя — ANTIFLOOD_RATE апдейтов в секунду с запасом ANTIFLOOD_BURST
+ANTIFLOOD_WINDOW = float(os.getenv("ANTIFLOOD_WINDOW", "1.0"))
+ANTIFLOOD_RATE = float(os.getenv("ANTIFLOOD_RATE", "3"))
+ANTIFLOOD_BURST = float(os.getenv("ANTIFLOOD_BURST", "10"))
+ANTIFLOOD_MAX_USERS = int(os.getenv("ANTIFLOOD_MAX_USERS", "10000"))
+
+# Ежечасные напоминания по умолчанию приходят с ACTIVE_HOURS_FROM до ACTIVE_HOURS_TO часов включительно
+ACTIVE_HOURS_FROM = int(os.getenv("ACTIVE_HOURS_FROM", "9"))
+ACTIVE_HOURS_TO = int(os.getenv("ACTIVE_HOURS_TO", "21"))
+
+# Ежедневная сводка: время рассылки "HH:MM" по UTC (пустое — выключить) и число пользователей в порции чтения из БД
+DIGEST_TIME = os.getenv("DIGEST_TIME", "21:00")
+DIGEST_FETCH_SIZE = int(os.getenv("DIGEST_FETCH_SIZE", "1000"))
+
+# Хранилище FSM: 'memory', 'sqlite' или 'redis'
+FSM_STORAGE = os.getenv("FSM_STORAGE", "sqlite")
+FSM_REDIS_URL = os.getenv("FSM_REDIS_URL", "redis://localhost:6379/0")
+FSM_STATE_TTL = int(os.getenv("FSM_STATE_TTL", str(24 * 3600)))  # незавершенные диалоги старше суток удаляются
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", "0.5"))
+FSM_FLUSH_BATCH = int(os.getenv("FSM_FLUSH_BATCH", "200"))
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "10000"))
+
+# Модели БД живут в database.models: импорт настроек не тянет за собой SQLAlchemy
+_MODELS = {
+    "Base", "User", "UserHabit", "HabitLog", "HabitYearBits",
+    "UserDailyStats", "HabitDailyStats", "FSMRecord",
+}
+
+
+def __getattr__(name):
+    # Старый путь импорта моделей (from config import UserHabit) продолжает работать
+    if name in _MODELS:
+        from database import models
+        return getattr(models, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,186 @@
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+
+class _UserEntry:
+    """Закэшированные данные одного пользователя"""
+
+    __slots__ = ("day", "expires_at", "habits", "by_id", "pages")
+
+    def __init__(self, day: date, expires_at: float):
+        self.day = day
+        self.expires_at = expires_at
+        self.habits: Optional[List[Dict[str, Any]]] = None
+        self.by_id: Dict[int, Dict[str, Any]] = {}
+        self.pages: Dict[Tuple[int, int], Dict[str, Any]] = {}  # (страница, размер) -> страница списка
+
+
+def _replaced(habits: List[Dict[str, Any]], habit: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [habit if item["id"] == habit["id"] else item for item in habits]
+
+
+class HabitCache:
+    """LRU/TTL кэш привычек по пользователю и id привычки.
+
+    Записи живут не дольше ttl секунд и сбрасываются при смене дня,
+    так как completed_today и цепочка зависят от текущей даты.
+
+    Заполнение после чтения из БД передает поколение пользователя,
+    взятое до запроса: если за время запроса была инвалидация,
+    прочитанные строки устарели и в кэш не кладутся.
+    """
+
+    def __init__(self, max_users: int = 10000, ttl: float = 300.0):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._users: "OrderedDict[int, _UserEntry]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_fills = 0
+        # Поколение пользователя меняется при каждой инвалидации. Для
+        # пользователей без записи (в том числе вытесненных из словаря)
+        # поколение — _generation_floor, поэтому значения не повторяются
+        self._generations: Dict[int, int] = {}
+        self._generation_floor = 0
+        self._last_generation = 0
+
+    def generation(self, user_id: int) -> int:
+        """Поколение данных пользователя; брать до чтения из БД"""
+        return self._generations.get(user_id, self._generation_floor)
+
+    def _next_generation(self, user_id: int):
+        self._last_generation += 1
+        self._generations[user_id] = self._last_generation
+        if len(self._generations) > self.max_users:
+            self._generations.clear()
+            self._generation_floor = self._last_generation
+
+    def _is_stale(self, user_id: int, generation: Optional[int]) -> bool:
+        if generation is None or generation == self.generation(user_id):
+            return False
+        self.stale_fills += 1
+        return True
+
+    def _entry(self, user_id: int) -> Optional[_UserEntry]:
+        entry = self._users.get(user_id)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic() or entry.day != datetime.utcnow().date():
+            del self._users[user_id]
+            self.evictions += 1
+            return None
+        self._users.move_to_end(user_id)
+        return entry
+
+    def _entry_for_write(self, user_id: int) -> _UserEntry:
+        entry = self._entry(user_id)
+        if entry is None:
+            entry = _UserEntry(datetime.utcnow().date(), time.monotonic() + self.ttl)
+            self._users[user_id] = entry
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def get_habits(self, user_id: int) -> Optional[List[Dict[str, Any]]]:
+        entry = self._entry(user_id)
+        if entry is None or entry.habits is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry.habits
+
+    def set_habits(self, user_id: int, habits: List[Dict[str, Any]], generation: Optional[int] = None):
+        if self._is_stale(user_id, generation):
+            return
+        entry = self._entry_for_write(user_id)
+        entry.habits = habits
+        entry.by_id = {habit["id"]: habit for habit in habits}
+
+    def get_page(self, user_id: int, page: int, per_page: int) -> Optional[Dict[str, Any]]:
+        """Страница списка: из полного списка, если он есть, иначе из закэшированных страниц"""
+        entry = self._entry(user_id)
+        result = None
+        if entry is not None and entry.habits is not None:
+            total = len(entry.habits)
+            page = min(page, max(total - 1, 0) // per_page)
+            result = {"habits": entry.habits[page * per_page:(page + 1) * per_page], "total": total, "page": page}
+        elif entry is not None:
+            result = entry.pages.get((page, per_page))
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def set_page(self, user_id: int, page: int, per_page: int, result: Dict[str, Any],
+                 generation: Optional[int] = None):
+        if self._is_stale(user_id, generation):
+            return
+        entry = self._entry_for_write(user_id)
+        entry.pages[(page, per_page)] = result
+        for habit in result["habits"]:
+            entry.by_id[habit["id"]] = habit
+        if result["page"] == 0 and result["total"] == len(result["habits"]):
+            # Весь список уместился на первой странице
+            entry.habits = result["habits"]
+
+    def get_habit(self, user_id: int, habit_id: int) -> Optional[Dict[str, Any]]:
+        entry = self._entry(user_id)
+        habit = entry.by_id.get(habit_id) if entry is not None else None
+        if habit is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return habit
+
+    def set_habit(self, user_id: int, habit: Dict[str, Any], generation: Optional[int] = None):
+        if self._is_stale(user_id, generation):
+            return
+        self._entry_for_write(user_id).by_id[habit["id"]] = habit
+
+    def replace_habit(self, user_id: int, habit: Dict[str, Any]):
+        """Заменить привычку и в списке, и в поиске по id (если список закэширован)"""
+        entry = self._entry_for_write(user_id)
+        if entry.habits is not None:
+            entry.habits = _replaced(entry.habits, habit)
+        for result in entry.pages.values():
+            result["habits"] = _replaced(result["habits"], habit)
+        entry.by_id[habit["id"]] = habit
+
+    def invalidate(self, user_id: int, habit_id: Optional[int] = None):
+        """Сбросить список привычек пользователя и, если указано, одну привычку"""
+        # Даже без записи: чтение из БД может идти прямо сейчас
+        self._next_generation(user_id)
+        entry = self._users.get(user_id)
+        if entry is None:
+            return
+        self.invalidations += 1
+        entry.habits = None
+        entry.pages.clear()
+        if habit_id is None:
+            entry.by_id.clear()
+        else:
+            entry.by_id.pop(habit_id, None)
+
+    def clear(self):
+        self._users.clear()
+        self._generations.clear()
+        self._last_generation += 1
+        self._generation_floor = self._last_generation
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total * 100, 1) if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "stale_fills": self.stale_fills,
+            "users": len(self._users),
+        }
@@ -0,0 +1,727 @@
+import logging
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import datetime, date, timedelta
+from typing import AsyncIterator, Dict, Any, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, select, func, delete, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from config import (
+    HABIT_LOG_AUDIT, DATABASE_URL, DB_ECHO, DB_POOL_SIZE, DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_BUSY_TIMEOUT_MS,
+    HABIT_CACHE_MAX_USERS, HABIT_CACHE_TTL, DIGEST_FETCH_SIZE, HABITS_PER_PAGE
+)
+from database.cache import HabitCache
+from database.models import (
+    Base, User, UserHabit, HabitLog, HabitYearBits, UserDailyStats, HabitDailyStats
+)
+from database.migrations import run_migrations
+from utils.streaks import (
+    batch_habit_stats, habit_stats, pack_year, unpack_year, year_has_day, year_offset, years_to_bits
+)
+
+logger = logging.getLogger(__name__)
+
+# Поля привычки, которые разрешено менять через update_habit
+EDITABLE_FIELDS = {
+    "name": "current_habit",
+    "description": "description",
+    "reminder_time": "reminder_time",
+    "frequency": "frequency",
+    "emoji": "emoji",
+}
+
+
+class Database:
+    """Асинхронный движок и фабрика сессий"""
+
+    def __init__(self, url: str = DATABASE_URL):
+        self.url = url
+        self.engine: AsyncEngine = self._create_engine(url)
+        self.session_factory = async_sessionmaker(self.engine, expire_on_commit=False)
+
+    @staticmethod
+    def _create_engine(url: str) -> AsyncEngine:
+        """Создать движок с пулом соединений и WAL для SQLite"""
+        is_sqlite = url.startswith("sqlite")
+        is_memory = is_sqlite and (":memory:" in url or url.rstrip("/").endswith("sqlite+aiosqlite:"))
+
+        kwargs: Dict[str, Any] = {"echo": DB_ECHO}
+        if not is_memory:
+            # aiosqlite по умолчанию использует NullPool и открывает файл на каждый запрос
+            kwargs.update(
+                poolclass=AsyncAdaptedQueuePool,
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_timeout=DB_POOL_TIMEOUT,
+                pool_recycle=DB_POOL_RECYCLE,
+                pool_pre_ping=not is_sqlite,
+            )
+
+        engine = create_async_engine(url, **kwargs)
+
+        if is_sqlite:
+            @event.listens_for(engine.sync_engine, "connect")
+            def _set_sqlite_pragmas(dbapi_connection, connection_record):
+                cursor = dbapi_connection.cursor()
+                if not is_memory:
+                    cursor.execute("PRAGMA journal_mode=WAL")
+                    cursor.execute("PRAGMA synchronous=NORMAL")
+                cursor.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+                cursor.execute("PRAGMA foreign_keys=ON")
+                cursor.close()
+
+        return engine
+
+    async def init_models(self):
+        """Создать таблицы, если их еще нет, и применить миграции"""
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(run_migrations)
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncSession]:
+        """Сессия с автоматическим откатом при ошибке"""
+        async with self.session_factory() as session:
+            try:
+                yield session
+            except Exception:
+                await session.rollback()
+                raise
+
+    def insert(self, model):
+        """INSERT с поддержкой ON CONFLICT для текущего диалекта"""
+        if self.engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        return insert(model)
+
+    async def close(self):
+        """Закрыть все соединения пула"""
+        await self.engine.dispose()
+
+
+db = Database()
+habit_cache = HabitCache(max_users=HABIT_CACHE_MAX_USERS, ttl=HABIT_CACHE_TTL)
+
+# Выполнения (habit_id, день), которые буфер записи (database.write_behind) уже
+# принял, но еще не записал: привычка из БД показывается с ними, как и в кэше
+unflushed_completions: Set[Tuple[int, date]] = set()
+
+
+# ---------- Вспомогательные функции ----------
+def _current_streak(habit: UserHabit, today: date) -> int:
+    """Цепочка жива, если последнее выполнение было сегодня или вчера"""
+    if habit.last_completed is None or today - habit.last_completed > timedelta(days=1):
+        return 0
+    return habit.current_streak or 0
+
+
+def _habit_to_dict(habit: UserHabit, today: date, completed_today: bool) -> Dict[str, Any]:
+    streak = _current_streak(habit, today)
+    best_streak = habit.best_streak or 0
+    total_days = habit.total_days or 0
+    if not completed_today and (habit.id, today) in unflushed_completions:
+        # Так же, как CompletionBuffer.submit: цепочка продолжается со вчера
+        completed_today = True
+        streak += 1
+        best_streak = max(best_streak, streak)
+        total_days += 1
+    return {
+        "id": habit.id,
+        "user_id": habit.user_id,
+        "name": habit.current_habit,
+        "description": habit.description or "",
+        "reminder_time": habit.reminder_time or "нет",
+        "frequency": habit.frequency or "daily",
+        "emoji": habit.emoji or "🎯",
+        "streak": streak,
+        "best_streak": best_streak,
+        "total_days": total_days,
+        "completed_today": completed_today,
+        "created_at": habit.created_at,
+        "updated_at": habit.updated_at,
+    }
+
+
+async def _completed_today(session: AsyncSession, today: date, user_id: Optional[int] = None,
+                           habit_ids: Optional[List[int]] = None) -> Set[int]:
+    """id привычек, у которых в годовом блоке отмечен сегодняшний день"""
+    query = select(HabitYearBits.habit_id, HabitYearBits.bits).where(HabitYearBits.year == today.year)
+    if user_id is not None:
+        query = query.where(HabitYearBits.user_id == user_id)
+    if habit_ids is not None:
+        query = query.where(HabitYearBits.habit_id.in_(habit_ids))
+    result = await session.execute(query)
+    return {habit_id for habit_id, bits in result if year_has_day(bits, today)}
+
+
+async def _load_history(session: AsyncSession, habit_ids: Iterable[int]) -> Dict[int, List[Tuple[int, bytes]]]:
+    """Годовые блоки привычек: habit_id -> [(year, bits)]"""
+    years: Dict[int, List[Tuple[int, bytes]]] = {}
+    habit_ids = list(habit_ids)
+    for start in range(0, len(habit_ids), 500):
+        result = await session.execute(
+            select(HabitYearBits.habit_id, HabitYearBits.year, HabitYearBits.bits)
+            .where(HabitYearBits.habit_id.in_(habit_ids[start:start + 500]))
+        )
+        for habit_id, year, bits in result:
+            years.setdefault(habit_id, []).append((year, bits))
+    return years
+
+
+def _advance_streak(habit: UserHabit, day: date):
+    """Учесть выполнение за day в счетчиках цепочки"""
+    if habit.last_completed == day - timedelta(days=1):
+        habit.current_streak = (habit.current_streak or 0) + 1
+    else:
+        habit.current_streak = 1
+    habit.best_streak = max(habit.best_streak or 0, habit.current_streak)
+    habit.total_days = (habit.total_days or 0) + 1
+    habit.last_completed = day
+
+
+async def _record_daily_rollups(session: AsyncSession, completions: List[Tuple[int, int, date]]):
+    """Увеличить дневные агрегаты по выполнениям (user_id, habit_id, day) в текущей транзакции"""
+    per_user = Counter((user_id, day) for user_id, _, day in completions)
+    per_habit = Counter((habit_id, user_id, day) for user_id, habit_id, day in completions)
+
+    user_rows = [{"user_id": user_id, "day": day, "completions": count} for (user_id, day), count in per_user.items()]
+    for start in range(0, len(user_rows), 200):
+        statement = db.insert(UserDailyStats).values(user_rows[start:start + 200])
+        await session.execute(statement.on_conflict_do_update(
+            index_elements=[UserDailyStats.user_id, UserDailyStats.day],
+            set_={"completions": UserDailyStats.completions + statement.excluded.completions},
+        ))
+
+    habit_rows = [
+        {"habit_id": habit_id, "day": day, "user_id": user_id, "completions": count}
+        for (habit_id, user_id, day), count in per_habit.items()
+    ]
+    for start in range(0, len(habit_rows), 200):
+        statement = db.insert(HabitDailyStats).values(habit_rows[start:start + 200])
+        await session.execute(statement.on_conflict_do_update(
+            index_elements=[HabitDailyStats.habit_id, HabitDailyStats.day],
+            set_={"completions": HabitDailyStats.completions + statement.excluded.completions},
+        ))
+
+
+def _habits_page_query(user_id: int, today: date, page: int, per_page: int):
+    # Страница выбирается по индексу (user_id, id) без соединения, а блоки
+    # года подтягиваются только для ее строк; общее число — тоже по индексу
+    page_ids = (
+        select(UserHabit.id).where(UserHabit.user_id == user_id)
+        .order_by(UserHabit.id).limit(per_page).offset(page * per_page)
+    )
+    total = select(func.count()).where(UserHabit.user_id == user_id).scalar_subquery()
+    return (
+        select(UserHabit, HabitYearBits.bits, total.label("total"))
+        .outerjoin(
+            HabitYearBits,
+            (HabitYearBits.habit_id == UserHabit.id) & (HabitYearBits.year == today.year),
+        )
+        .where(UserHabit.id.in_(page_ids))
+        .order_by(UserHabit.id)
+    )
+
+
+# ---------- Привычки ----------
+async def add_habit(user_id: int, name: str, description: Optional[str] = None,
+                    reminder_time: Optional[str] = None, frequency: str = "daily",
+                    emoji: str = "🎯") -> Optional[int]:
+    """Создать привычку и вернуть ее id"""
+    try:
+        async with db.session() as session:
+            habit = UserHabit(
+                user_id=user_id,
+                current_habit=name,
+                habit_type="positive",
+                description=description,
+                reminder_time=reminder_time,
+                frequency=frequency,
+                emoji=emoji,
+            )
+            session.add(habit)
+            await session.commit()
+            habit_cache.invalidate(user_id)
+            return habit.id
+    except SQLAlchemyError as e:
+        logger.error(f"Error in add_habit: {e}")
+        return None
+
+
+async def get_user_habits(user_id: int) -> List[Dict[str, Any]]:
+    """Все привычки пользователя с отметкой о выполнении сегодня"""
+    cached = habit_cache.get_habits(user_id)
+    if cached is not None:
+        return cached
+    generation = habit_cache.generation(user_id)
+
+    async with db.session() as session:
+        result = await session.execute(
+            select(UserHabit).where(UserHabit.user_id == user_id).order_by(UserHabit.id)
+        )
+        habits = result.scalars().all()
+        today = datetime.utcnow().date()
+        done = await _completed_today(session, today, user_id=user_id)
+
+    habit_dicts = [_habit_to_dict(habit, today, habit.id in done) for habit in habits]
+    habit_cache.set_habits(user_id, habit_dicts, generation)
+    return habit_dicts
+
+
+async def get_habits_page(user_id: int, page: int = 0, per_page: int = HABITS_PER_PAGE) -> Dict[str, Any]:
+    """Одна страница привычек пользователя и общее их число.
+
+    Привычки страницы, отметка за сегодня из годового блока и общее
+    число привычек приходят одним запросом, так что стоимость не
+    зависит от того, сколько всего привычек у пользователя.
+    Страница кэшируется до первого изменения привычек пользователя;
+    если весь список уже в кэше, страница берется из него.
+    """
+    page = max(page, 0)
+    cached = habit_cache.get_page(user_id, page, per_page)
+    if cached is not None:
+        return cached
+    generation = habit_cache.generation(user_id)
+    requested = page
+
+    today = datetime.utcnow().date()
+    async with db.session() as session:
+        rows = (await session.execute(_habits_page_query(user_id, today, page, per_page))).all()
+        if not rows and page > 0:
+            # Страница пропала (привычки удалили) — показать последнюю
+            total = await session.scalar(select(func.count()).where(UserHabit.user_id == user_id))
+            page = max(total - 1, 0) // per_page
+            rows = (await session.execute(_habits_page_query(user_id, today, page, per_page))).all()
+
+    habits = [_habit_to_dict(habit, today, bits is not None and year_has_day(bits, today)) for habit, bits, _ in rows]
+    result = {"habits": habits, "total": rows[0][2] if rows else 0, "page": page}
+    habit_cache.set_page(user_id, requested, per_page, result, generation)
+    return result
+
+
+async def get_habit_by_id(habit_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+    """Привычка пользователя по id"""
+    cached = habit_cache.get_habit(user_id, habit_id)
+    if cached is not None:
+        return cached
+    generation = habit_cache.generation(user_id)
+
+    async with db.session() as session:
+        habit = await session.scalar(
+            select(UserHabit).where(UserHabit.id == habit_id, UserHabit.user_id == user_id)
+        )
+        if habit is None:
+            return None
+        today = datetime.utcnow().date()
+        done = await _completed_today(session, today, habit_ids=[habit_id])
+
+    habit_dict = _habit_to_dict(habit, today, habit_id in done)
+    habit_cache.set_habit(user_id, habit_dict, generation)
+    return habit_dict
+
+
+async def update_habit(habit_id: int, user_id: int, field: str, value: Any) -> bool:
+    """Обновить одно поле привычки"""
+    column = EDITABLE_FIELDS.get(field)
+    if column is None:
+        return False
+
+    try:
+        async with db.session() as session:
+            habit = await session.scalar(
+                select(UserHabit).where(UserHabit.id == habit_id, UserHabit.user_id == user_id)
+            )
+            if habit is None:
+                return False
+            setattr(habit, column, value)
+            await session.commit()
+            habit_cache.invalidate(user_id, habit_id)
+            return True
+    except SQLAlchemyError as e:
+        logger.error(f"Error in update_habit: {e}")
+        return False
+
+
+async def delete_habit(habit_id: int, user_id: int) -> bool:
+    """Удалить привычку (журнал habit_logs сохраняется).
+
+    Ее выполнения вычитаются из дневных итогов пользователя, а
+    агрегаты и годовые блоки привычки удаляются: статистика периода
+    считается только по существующим привычкам, а id удаленной
+    привычки SQLite может выдать новой.
+    """
+    try:
+        async with db.session() as session:
+            result = await session.execute(
+                delete(UserHabit).where(UserHabit.id == habit_id, UserHabit.user_id == user_id)
+            )
+            if result.rowcount:
+                removed = (
+                    select(HabitDailyStats.completions)
+                    .where(HabitDailyStats.habit_id == habit_id, HabitDailyStats.day == UserDailyStats.day)
+                    .scalar_subquery()
+                )
+                await session.execute(
+                    update(UserDailyStats)
+                    .where(
+                        UserDailyStats.user_id == user_id,
+                        UserDailyStats.day.in_(select(HabitDailyStats.day).where(HabitDailyStats.habit_id == habit_id)),
+                    )
+                    .values(completions=UserDailyStats.completions - removed)
+                )
+                await session.execute(
+                    delete(UserDailyStats).where(UserDailyStats.user_id == user_id, UserDailyStats.completions <= 0)
+                )
+                await session.execute(delete(HabitDailyStats).where(HabitDailyStats.habit_id == habit_id))
+                await session.execute(delete(HabitYearBits).where(HabitYearBits.habit_id == habit_id))
+            await session.commit()
+            habit_cache.invalidate(user_id, habit_id)
+            return result.rowcount > 0
+    except SQLAlchemyError as e:
+        logger.error(f"Error in delete_habit: {e}")
+        return False
+
+
+async def mark_habits_completed_bulk(events: List[Tuple[int, int, date]]) -> int:
+    """Записать пачку выполнений (habit_id, user_id, day) одной транзакцией.
+
+    Уже отмеченные дни и чужие или удаленные привычки пропускаются.
+    Возвращает число примененных выполнений.
+    """
+    if not events:
+        return 0
+    habit_ids = list({habit_id for habit_id, _, _ in events})
+    years = list({day.year for _, _, day in events})
+
+    async with db.session() as session:
+        habits: Dict[int, UserHabit] = {}
+        blocks: Dict[Tuple[int, int], HabitYearBits] = {}
+        for start in range(0, len(habit_ids), 500):
+            chunk = habit_ids[start:start + 500]
+            result = await session.execute(select(UserHabit).where(UserHabit.id.in_(chunk)))
+            habits.update((habit.id, habit) for habit in result.scalars())
+            result = await session.execute(
+                select(HabitYearBits).where(HabitYearBits.habit_id.in_(chunk), HabitYearBits.year.in_(years))
+            )
+            blocks.update(((block.habit_id, block.year), block) for block in result.scalars())
+
+        applied: List[Tuple[int, int, date]] = []
+        for habit_id, user_id, day in sorted(events, key=lambda event: event[2]):
+            habit = habits.get(habit_id)
+            if habit is None or habit.user_id != user_id or habit.last_completed == day:
+                continue
+
+            year, offset = year_offset(day)
+            block = blocks.get((habit_id, year))
+            if block is None:
+                block = HabitYearBits(habit_id=habit_id, year=year, user_id=user_id, bits=pack_year(0))
+                session.add(block)
+                blocks[(habit_id, year)] = block
+            bits = unpack_year(block.bits)
+            if bits >> offset & 1:
+                continue
+            block.bits = pack_year(bits | 1 << offset)
+
+            _advance_streak(habit, day)
+            if HABIT_LOG_AUDIT:
+                session.add(HabitLog(
+                    user_id=user_id,
+                    habit_id=habit_id,
+                    habit_name=habit.current_habit,
+                    success=True,
+                    log_day=day,
+                ))
+            applied.append((user_id, habit_id, day))
+
+        await _record_daily_rollups(session, applied)
+        await session.commit()
+
+    for user_id, habit_id, _ in applied:
+        habit_cache.invalidate(user_id, habit_id)
+    return len(applied)
+
+
+# ---------- Напоминания ----------
+async def get_reminder_schedule() -> List[Tuple[int, int, str]]:
+    """Тройки (habit_id, user_id, reminder_time) всех привычек с напоминанием"""
+    async with db.session() as session:
+        result = await session.execute(
+            select(UserHabit.id, UserHabit.user_id, UserHabit.reminder_time)
+            .where(UserHabit.reminder_time.is_not(None))
+        )
+        return [(habit_id, user_id, reminder_time) for habit_id, user_id, reminder_time in result]
+
+
+async def get_reminder_settings() -> Dict[int, Tuple[Optional[Tuple[int, int]], Optional[str]]]:
+    """Окно активных часов и часовой пояс пользователей, которые их меняли"""
+    async with db.session() as session:
+        result = await session.execute(
+            select(User.user_id, User.active_from, User.active_to, User.timezone)
+            .where((User.active_from.is_not(None) & User.active_to.is_not(None)) | User.timezone.is_not(None))
+        )
+        return {
+            user_id: ((start, end) if start is not None and end is not None else None, zone)
+            for user_id, start, end, zone in result
+        }
+
+
+async def get_user_settings(user_id: int) -> Dict[str, Any]:
+    """Настройки пользователя; незаданные значения — None"""
+    async with db.session() as session:
+        row = (await session.execute(
+            select(User.active_from, User.active_to, User.timezone).where(User.user_id == user_id)
+        )).first()
+    if row is None:
+        return {"active_hours": None, "timezone": None}
+    return {
+        "active_hours": (row.active_from, row.active_to)
+        if row.active_from is not None and row.active_to is not None else None,
+        "timezone": row.timezone,
+    }
+
+
+async def _save_user_settings(user_id: int, **values: Any) -> bool:
+    async with db.session() as session:
+        statement = db.insert(User).values(user_id=user_id, **values)
+        await session.execute(statement.on_conflict_do_update(
+            index_elements=[User.user_id],
+            set_={name: statement.excluded[name] for name in values},
+        ))
+        await session.commit()
+        return True
+
+
+async def set_active_hours(user_id: int, start: int, end: int) -> bool:
+    """Сохранить окно активных часов (часы включительно, окно может переходить через полночь)"""
+    try:
+        return await _save_user_settings(user_id, active_from=start, active_to=end)
+    except SQLAlchemyError as e:
+        logger.error(f"Error in set_active_hours: {e}")
+        return False
+
+
+async def set_timezone(user_id: int, zone: str) -> bool:
+    """Сохранить часовой пояс пользователя (каноническое имя из utils.timezones)"""
+    try:
+        return await _save_user_settings(user_id, timezone=zone)
+    except SQLAlchemyError as e:
+        logger.error(f"Error in set_timezone: {e}")
+        return False
+
+
+async def get_habits_by_ids(habit_ids: List[int]) -> List[Dict[str, Any]]:
+    """Привычки по списку id одним запросом (для рассылки напоминаний)"""
+    habits: List[UserHabit] = []
+    async with db.session() as session:
+        # Порциями, чтобы не упереться в лимит параметров SQLite
+        for start in range(0, len(habit_ids), 500):
+            result = await session.execute(
+                select(UserHabit).where(UserHabit.id.in_(habit_ids[start:start + 500]))
+            )
+            habits.extend(result.scalars().all())
+        today = datetime.utcnow().date()
+        done = await _completed_today(session, today, habit_ids=habit_ids)
+
+    return [_habit_to_dict(habit, today, habit.id in done) for habit in habits]
+
+
+# ---------- Статистика ----------
+def get_cache_stats() -> Dict[str, Any]:
+    """Счетчики попаданий и промахов кэша привычек"""
+    return habit_cache.stats()
+
+
+def _habit_stats_view(stats: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "total_completions": stats["total_completions"],
+        "success_rate": stats["success_rate"],
+        "longest_streak": stats["longest_streak"],
+        "current_streak": stats["current_streak"],
+        "completions_last_7_days": stats["completions_last_7_days"],
+    }
+
+
+async def get_habit_stats(habit_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+    """Статистика по одной привычке"""
+    today = datetime.utcnow().date()
+    async with db.session() as session:
+        habit = await session.scalar(
+            select(UserHabit).where(UserHabit.id == habit_id, UserHabit.user_id == user_id)
+        )
+        if habit is None:
+            return None
+        years = await _load_history(session, [habit_id])
+
+    start = habit.created_at.date()
+    bits = years_to_bits(years.get(habit_id, []), start)
+    return _habit_stats_view(habit_stats(bits, start, today, habit.frequency))
+
+
+async def get_all_habit_stats(user_id: Optional[int] = None) -> Dict[int, Dict[str, Any]]:
+    """Статистика всех привычек (или привычек одного пользователя) за один проход по годовым блокам"""
+    today = datetime.utcnow().date()
+    habits_query = select(UserHabit.id, UserHabit.frequency, UserHabit.created_at)
+    years_query = select(HabitYearBits.habit_id, HabitYearBits.year, HabitYearBits.bits)
+    if user_id is not None:
+        habits_query = habits_query.where(UserHabit.user_id == user_id)
+        years_query = years_query.where(HabitYearBits.user_id == user_id)
+
+    async with db.session() as session:
+        habits = {
+            habit_id: (frequency, created_at.date())
+            for habit_id, frequency, created_at in await session.execute(habits_query)
+        }
+        bits: Dict[int, int] = dict.fromkeys(habits, 0)
+        rows = await session.stream(years_query.execution_options(yield_per=5000))
+        async for habit_id, year, blob in rows:
+            if habit_id in habits:
+                bits[habit_id] |= years_to_bits([(year, blob)], habits[habit_id][1])
+
+    stats = batch_habit_stats(
+        ((habit_id, frequency, start, bits[habit_id]) for habit_id, (frequency, start) in habits.items()),
+        today,
+    )
+    return {habit_id: _habit_stats_view(item) for habit_id, item in stats.items()}
+
+
+async def get_user_stats(user_id: int) -> Dict[str, Any]:
+    """Общая статистика пользователя"""
+    async with db.session() as session:
+        result = await session.execute(select(UserHabit).where(UserHabit.user_id == user_id))
+        habits = result.scalars().all()
+        if not habits:
+            return {"total_habits": 0}
+        today = datetime.utcnow().date()
+        done = await _completed_today(session, today, user_id=user_id)
+
+    possible_days = sum((today - habit.created_at.date()).days + 1 for habit in habits)
+    total_completions = sum(habit.total_days or 0 for habit in habits)
+
+    return {
+        "total_habits": len(habits),
+        "active_habits": len(habits),
+        "longest_streak": max(habit.best_streak or 0 for habit in habits),
+        "success_rate": round(total_completions / possible_days * 100) if possible_days else 0,
+        "completed_today": sum(1 for habit in habits if habit.id in done),
+    }
+
+
+async def stream_daily_digests(day: date, fetch_size: int = DIGEST_FETCH_SIZE) -> AsyncIterator[Dict[str, Any]]:
+    """Итоги дня по всем пользователям с привычками, по одному пользователю за раз.
+
+    Пользователи читаются порциями по fetch_size с keyset-пагинацией по
+    user_id: каждая порция — отдельный короткий запрос в своей сессии,
+    поэтому транзакция чтения не держится, пока идет рассылка. Серверного
+    курсора нет. В памяти одновременно строки привычек одной порции
+    (fetch_size пользователей) и одна собираемая сводка; очередь рассылки
+    добавляет к этому не больше queue_size + concurrency сообщений.
+    """
+    last_user_id: Optional[int] = None
+    while True:
+        user_ids = select(UserHabit.user_id).distinct().order_by(UserHabit.user_id).limit(fetch_size)
+        if last_user_id is not None:
+            user_ids = user_ids.where(UserHabit.user_id > last_user_id)
+        query = (
+            select(
+                UserHabit.user_id, UserHabit.id, UserHabit.current_habit, UserHabit.emoji,
+                UserHabit.current_streak, UserHabit.last_completed,
+                func.coalesce(HabitDailyStats.completions, 0).label("completions"),
+            )
+            .outerjoin(
+                HabitDailyStats,
+                (HabitDailyStats.habit_id == UserHabit.id) & (HabitDailyStats.day == day),
+            )
+            .where(UserHabit.user_id.in_(user_ids.scalar_subquery()))
+            .order_by(UserHabit.user_id, UserHabit.id)
+        )
+        async with db.session() as session:
+            rows = (await session.execute(query)).all()
+        if not rows:
+            return
+
+        digest: Optional[Dict[str, Any]] = None
+        for row in rows:
+            if digest is None or digest["user_id"] != row.user_id:
+                if digest is not None:
+                    yield digest
+                digest = {"user_id": row.user_id, "day": day, "completed": 0, "habits": []}
+            done = row.completions > 0
+            digest["completed"] += done
+            digest["habits"].append({
+                "name": row.current_habit,
+                "emoji": row.emoji or "🎯",
+                "streak": _current_streak(row, day),
+                "completed": done,
+            })
+        yield digest
+        last_user_id = rows[-1].user_id
+
+
+def period_bounds(period: str, today: date, first_day: date) -> Tuple[date, date]:
+    """Первый и последний день периода статистики"""
+    if period == "today":
+        return today, today
+    if period == "week":
+        return today - timedelta(days=today.weekday()), today
+    if period == "month":
+        return today.replace(day=1), today
+    if period == "last_30_days":
+        return today - timedelta(days=29), today
+    return first_day, today
+
+
+async def get_period_stats(user_id: int, period: str) -> Optional[Dict[str, Any]]:
+    """Статистика за период по дневным агрегатам, без чтения журнала выполнений"""
+    today = datetime.utcnow().date()
+    async with db.session() as session:
+        result = await session.execute(
+            select(UserHabit.id, UserHabit.current_habit, UserHabit.emoji, UserHabit.created_at)
+            .where(UserHabit.user_id == user_id)
+        )
+        habits = result.all()
+        if not habits:
+            return None
+
+        start, end = period_bounds(period, today, min(habit.created_at.date() for habit in habits))
+
+        completions, active_days = (await session.execute(
+            select(func.coalesce(func.sum(UserDailyStats.completions), 0), func.count())
+            .where(UserDailyStats.user_id == user_id, UserDailyStats.day.between(start, end))
+        )).one()
+
+        result = await session.execute(
+            select(HabitDailyStats.habit_id, func.sum(HabitDailyStats.completions))
+            .where(HabitDailyStats.user_id == user_id, HabitDailyStats.day.between(start, end))
+            .group_by(HabitDailyStats.habit_id)
+        )
+        per_habit = dict(result.all())
+
+    # Сколько дней каждая существующая привычка могла быть выполнена в периоде
+    possible = 0
+    habit_completions = 0
+    best_habit = None
+    for habit in habits:
+        habit_start = max(start, habit.created_at.date())
+        if habit_start <= end:
+            possible += (end - habit_start).days + 1
+        done = per_habit.get(habit.id, 0)
+        habit_completions += done
+        if done and (best_habit is None or done > best_habit[1]):
+            best_habit = (f"{habit.emoji or '🎯'} {habit.current_habit}", done)
+
+    return {
+        "start": start,
+        "end": end,
+        "days": (end - start).days + 1,
+        "completions": completions,
+        "active_days": active_days,
+        "success_rate": round(habit_completions / possible * 100) if possible else 0,
+        "best_habit": best_habit[0] if best_habit else None,
+        "best_habit_completions": best_habit[1] if best_habit else 0,
+    }
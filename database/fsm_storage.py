@@ -0,0 +1,228 @@
+import asyncio
+import contextvars
+import json
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Set
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from sqlalchemy import delete
+
+from config import (
+    FSM_STORAGE, FSM_REDIS_URL, FSM_STATE_TTL,
+    FSM_FLUSH_INTERVAL, FSM_FLUSH_BATCH, FSM_CACHE_SIZE
+)
+from database.database import Database, db
+from database.models import FSMRecord
+
+logger = logging.getLogger(__name__)
+
+# Как часто удалять из БД просроченные состояния
+PURGE_INTERVAL = 300.0
+
+
+class _Record:
+    __slots__ = ("state", "data", "updated_at")
+
+    def __init__(self, state: Optional[str] = None, data: Optional[Dict[str, Any]] = None,
+                 updated_at: Optional[datetime] = None):
+        self.state = state
+        self.data = data or {}
+        self.updated_at = updated_at or datetime.utcnow()
+
+    @property
+    def empty(self) -> bool:
+        return self.state is None and not self.data
+
+
+class SQLiteStorage(BaseStorage):
+    """FSM-хранилище в таблице fsm_states.
+
+    Чтения обслуживаются из LRU-кэша в памяти, запись в БД идет пачками
+    из фоновой задачи раз в flush_interval секунд или при накоплении
+    flush_batch измененных ключей. Состояния старше ttl считаются
+    брошенными: при чтении они пусты, а из БД удаляются периодически.
+    Кэш корректен, пока апдейты одного пользователя обрабатывает один
+    процесс.
+    """
+
+    def __init__(self, database: Database = db, ttl: int = FSM_STATE_TTL,
+                 flush_interval: float = FSM_FLUSH_INTERVAL, flush_batch: int = FSM_FLUSH_BATCH,
+                 cache_size: int = FSM_CACHE_SIZE):
+        self.database = database
+        self.ttl = timedelta(seconds=ttl)
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.cache_size = cache_size
+        self._records: "OrderedDict[str, _Record]" = OrderedDict()
+        self._dirty: Set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._last_purge = datetime.utcnow()
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id or ''}:{key.destiny}"
+
+    def _expired(self, record: _Record) -> bool:
+        return record.updated_at < datetime.utcnow() - self.ttl
+
+    async def _get_record(self, key: StorageKey) -> _Record:
+        storage_key = self._key(key)
+        record = self._records.get(storage_key)
+
+        if record is None:
+            async with self.database.session() as session:
+                row = await session.get(FSMRecord, storage_key)
+            # Пока шел запрос, ключ мог загрузить и изменить параллельный апдейт
+            record = self._records.get(storage_key)
+            if record is None:
+                if row is None:
+                    record = _Record()
+                else:
+                    record = _Record(row.state, json.loads(row.data) if row.data else {}, row.updated_at)
+                self._records[storage_key] = record
+                self._evict()
+
+        if not record.empty and self._expired(record):
+            record.state = None
+            record.data = {}
+            self._mark_dirty(storage_key)
+
+        self._records.move_to_end(storage_key)
+        return record
+
+    def _evict(self):
+        """Выкинуть из памяти самые старые уже сохраненные записи"""
+        while len(self._records) > self.cache_size:
+            for storage_key in self._records:
+                if storage_key not in self._dirty:
+                    del self._records[storage_key]
+                    break
+            else:
+                return
+
+    def _mark_dirty(self, storage_key: str):
+        self._dirty.add(storage_key)
+        if not self._closing and (self._flush_task is None or self._flush_task.done()):
+            # Пустой контекст: иначе задача унаследует метрики апдейта, который ее запустил
+            self._flush_task = asyncio.create_task(self._flush_loop(), context=contextvars.Context())
+        if len(self._dirty) >= self.flush_batch:
+            self._wakeup.set()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._get_record(key)
+        record.state = state.state if isinstance(state, State) else state
+        record.updated_at = datetime.utcnow()
+        self._mark_dirty(self._key(key))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._get_record(key)).state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record = await self._get_record(key)
+        record.data = data.copy()
+        record.updated_at = datetime.utcnow()
+        self._mark_dirty(self._key(key))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._get_record(key)).data.copy()
+
+    async def _flush_loop(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+                if datetime.utcnow() - self._last_purge > timedelta(seconds=PURGE_INTERVAL):
+                    await self.purge_expired()
+            except Exception as e:
+                logger.error(f"Error flushing FSM storage: {e}")
+
+    async def flush(self):
+        """Записать все измененные ключи одной транзакцией"""
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            dirty, self._dirty = self._dirty, set()
+
+            upserts = []
+            deletes = []
+            for storage_key in dirty:
+                record = self._records.get(storage_key)
+                if record is None or record.empty:
+                    deletes.append(storage_key)
+                else:
+                    upserts.append({
+                        "key": storage_key,
+                        "state": record.state,
+                        "data": json.dumps(record.data, ensure_ascii=False, default=str),
+                        "updated_at": record.updated_at,
+                    })
+
+            try:
+                async with self.database.session() as session:
+                    for start in range(0, len(deletes), 500):
+                        await session.execute(
+                            delete(FSMRecord).where(FSMRecord.key.in_(deletes[start:start + 500]))
+                        )
+                    for start in range(0, len(upserts), 500):
+                        await session.execute(self._upsert_statement(upserts[start:start + 500]))
+                    await session.commit()
+            except BaseException:
+                # Вернуть ключи в очередь, чтобы не потерять изменения (в том числе при отмене)
+                self._dirty |= dirty
+                raise
+
+            self._evict()
+
+    def _upsert_statement(self, rows):
+        statement = self.database.insert(FSMRecord).values(rows)
+        return statement.on_conflict_do_update(
+            index_elements=[FSMRecord.key],
+            set_={
+                "state": statement.excluded.state,
+                "data": statement.excluded.data,
+                "updated_at": statement.excluded.updated_at,
+            },
+        )
+
+    async def purge_expired(self) -> int:
+        """Удалить из БД брошенные состояния"""
+        self._last_purge = datetime.utcnow()
+        cutoff = datetime.utcnow() - self.ttl
+        async with self.database.session() as session:
+            result = await session.execute(delete(FSMRecord).where(FSMRecord.updated_at < cutoff))
+            await session.commit()
+        if result.rowcount:
+            logger.info(f"Purged {result.rowcount} expired FSM states")
+        return result.rowcount
+
+    async def close(self) -> None:
+        # Не отменяем задачу посреди записи, а даем ей закончить текущую пачку
+        self._closing = True
+        self._wakeup.set()
+        if self._flush_task is not None:
+            await self._flush_task
+        await self.flush()
+
+
+def create_fsm_storage(kind: str = FSM_STORAGE) -> BaseStorage:
+    """Хранилище FSM по настройке FSM_STORAGE"""
+    if kind == "memory":
+        from aiogram.fsm.storage.memory import MemoryStorage
+        return MemoryStorage()
+
+    if kind == "redis":
+        # redis не входит в обязательные зависимости; локально подойдет fakeredis
+        from aiogram.fsm.storage.redis import RedisStorage
+        return RedisStorage.from_url(FSM_REDIS_URL, state_ttl=FSM_STATE_TTL, data_ttl=FSM_STATE_TTL)
+
+    return SQLiteStorage()
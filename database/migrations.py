@@ -0,0 +1,174 @@
+import logging
+from datetime import datetime, date, timedelta
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+from utils.streaks import pack_year, year_offset
+
+logger = logging.getLogger(__name__)
+
+
+# ---------- Вспомогательные функции ----------
+def _add_column_if_missing(conn: Connection, table: str, column: str, ddl_type: str):
+    columns = {col["name"] for col in inspect(conn).get_columns(table)}
+    if column not in columns:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+
+
+def _replay_streaks(days: List[date], today: date) -> Tuple[int, int]:
+    """Текущая и лучшая цепочка по отсортированным дням выполнения"""
+    best = 0
+    run = 0
+    previous = None
+    for day in days:
+        if previous is not None and day - previous == timedelta(days=1):
+            run += 1
+        elif day != previous:
+            run = 1
+        best = max(best, run)
+        previous = day
+    current = run if previous is not None and today - previous <= timedelta(days=1) else 0
+    return current, best
+
+
+# ---------- Миграции ----------
+def _0001_indexes_and_streak_counters(conn: Connection):
+    """Индексы, уникальный ключ выполнения за день и счетчики цепочек"""
+    # Поля, которых не было в исходной схеме (config.py до выноса моделей)
+    _add_column_if_missing(conn, "user_habits", "description", "TEXT")
+    _add_column_if_missing(conn, "user_habits", "reminder_time", "VARCHAR(20)")
+    _add_column_if_missing(conn, "user_habits", "frequency", "VARCHAR(20)")
+    _add_column_if_missing(conn, "user_habits", "emoji", "VARCHAR(10)")
+    _add_column_if_missing(conn, "habit_logs", "habit_id", "INTEGER")
+    _add_column_if_missing(conn, "user_habits", "last_completed", "DATE")
+    _add_column_if_missing(conn, "habit_logs", "log_day", "DATE")
+
+    conn.execute(text("UPDATE habit_logs SET log_day = DATE(log_date) WHERE log_day IS NULL"))
+    # Перед уникальным индексом оставляем одну запись на привычку в день
+    conn.execute(text(
+        "DELETE FROM habit_logs WHERE habit_id IS NOT NULL AND id NOT IN ("
+        "SELECT MIN(id) FROM habit_logs WHERE habit_id IS NOT NULL GROUP BY habit_id, log_day)"
+    ))
+
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_user_habits_user_id ON user_habits (user_id)"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_user_habits_user_id_name ON user_habits (user_id, current_habit)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_habit_logs_user_id_log_date ON habit_logs (user_id, log_date)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_habit_logs_habit_id_log_date ON habit_logs (habit_id, log_date)"
+    ))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_habit_logs_habit_id_log_day ON habit_logs (habit_id, log_day)"
+    ))
+
+    # Одноразовый пересчет счетчиков из истории, дальше они обновляются инкрементально
+    days_by_habit: Dict[int, List[date]] = {}
+    rows = conn.execute(text(
+        "SELECT habit_id, log_day FROM habit_logs "
+        "WHERE habit_id IS NOT NULL AND success = 1 ORDER BY habit_id, log_day"
+    ))
+    for habit_id, log_day in rows:
+        day = log_day if isinstance(log_day, date) else date.fromisoformat(str(log_day))
+        days_by_habit.setdefault(habit_id, []).append(day)
+
+    today = datetime.utcnow().date()
+    for habit_id, days in days_by_habit.items():
+        current, best = _replay_streaks(days, today)
+        conn.execute(
+            text(
+                "UPDATE user_habits SET current_streak = :current, best_streak = :best, "
+                "total_days = :total, last_completed = :last WHERE id = :habit_id"
+            ),
+            {"current": current, "best": best, "total": len(days), "last": days[-1], "habit_id": habit_id},
+        )
+
+
+def _0002_daily_rollups(conn: Connection):
+    """Заполнить дневные агрегаты по пользователям и привычкам из журнала"""
+    conn.execute(text(
+        "INSERT OR IGNORE INTO habit_daily_stats (habit_id, day, user_id, completions) "
+        "SELECT habit_id, log_day, MIN(user_id), COUNT(*) FROM habit_logs "
+        "WHERE habit_id IS NOT NULL AND success = 1 GROUP BY habit_id, log_day"
+    ))
+    conn.execute(text(
+        "INSERT OR IGNORE INTO user_daily_stats (user_id, day, completions) "
+        "SELECT user_id, day, SUM(completions) FROM habit_daily_stats GROUP BY user_id, day"
+    ))
+
+
+def _0003_drop_deleted_habit_rollups(conn: Connection):
+    """Убрать из агрегатов выполнения удаленных привычек и пересобрать дневные итоги"""
+    conn.execute(text("DELETE FROM habit_daily_stats WHERE habit_id NOT IN (SELECT id FROM user_habits)"))
+    conn.execute(text("DELETE FROM user_daily_stats"))
+    conn.execute(text(
+        "INSERT INTO user_daily_stats (user_id, day, completions) "
+        "SELECT user_id, day, SUM(completions) FROM habit_daily_stats GROUP BY user_id, day"
+    ))
+
+
+def _0004_habit_year_bits(conn: Connection):
+    """Упаковать журнал выполнений в годовые битовые блоки"""
+    blocks: Dict[Tuple[int, int], List[int]] = {}
+    rows = conn.execute(text(
+        "SELECT habit_id, MIN(user_id), log_day FROM habit_logs "
+        "WHERE habit_id IN (SELECT id FROM user_habits) AND success = 1 GROUP BY habit_id, log_day"
+    ))
+    for habit_id, user_id, log_day in rows:
+        day = log_day if isinstance(log_day, date) else date.fromisoformat(str(log_day))
+        year, offset = year_offset(day)
+        block = blocks.setdefault((habit_id, year), [user_id, 0])
+        block[1] |= 1 << offset
+
+    for (habit_id, year), (user_id, bits) in blocks.items():
+        conn.execute(
+            text(
+                "INSERT OR IGNORE INTO habit_year_bits (habit_id, year, user_id, bits) "
+                "VALUES (:habit_id, :year, :user_id, :bits)"
+            ),
+            {"habit_id": habit_id, "year": year, "user_id": user_id, "bits": pack_year(bits)},
+        )
+
+
+def _0005_user_active_hours(conn: Connection):
+    """Окно активных часов пользователя для ежечасных напоминаний"""
+    _add_column_if_missing(conn, "users", "active_from", "INTEGER")
+    _add_column_if_missing(conn, "users", "active_to", "INTEGER")
+
+
+def _0006_user_timezone(conn: Connection):
+    """Часовой пояс пользователя для местного времени напоминаний"""
+    _add_column_if_missing(conn, "users", "timezone", "VARCHAR(64)")
+
+
+MIGRATIONS: List[Tuple[int, Callable[[Connection], None]]] = [
+    (1, _0001_indexes_and_streak_counters),
+    (2, _0002_daily_rollups),
+    (3, _0003_drop_deleted_habit_rollups),
+    (4, _0004_habit_year_bits),
+    (5, _0005_user_active_hours),
+    (6, _0006_user_timezone),
+]
+
+
+def run_migrations(conn: Connection):
+    """Применить все еще не примененные миграции"""
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, applied_at TIMESTAMP NOT NULL)"
+    ))
+    applied = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+    for version, migration in MIGRATIONS:
+        if version in applied:
+            continue
+        logger.info(f"Applying migration {version}: {migration.__name__}")
+        migration(conn)
+        conn.execute(
+            text("INSERT INTO schema_migrations (version, applied_at) VALUES (:version, :applied_at)"),
+            {"version": version, "applied_at": datetime.utcnow()},
+        )
@@ -0,0 +1,101 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, BigInteger, DateTime, Date, Boolean, Text, Index, LargeBinary
+from sqlalchemy.ext.declarative import declarative_base
+
+Base = declarative_base()
+
+class User(Base):
+    __tablename__ = "users"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(BigInteger, unique=True, nullable=False)
+    username = Column(String(100))
+    first_name = Column(String(100))
+    active_from = Column(Integer)  # окно ежечасных напоминаний, NULL — значения по умолчанию
+    active_to = Column(Integer)
+    timezone = Column(String(64))  # имя IANA или "UTC+03:00", NULL — UTC
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class UserHabit(Base):
+    __tablename__ = "user_habits"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(BigInteger, nullable=False)
+    current_habit = Column(String(100))
+    habit_type = Column(String(20))  # 'positive' or 'negative'
+    description = Column(Text)
+    reminder_time = Column(String(20))
+    frequency = Column(String(20), default="daily")
+    emoji = Column(String(10), default="🎯")
+    current_streak = Column(Integer, default=0)
+    best_streak = Column(Integer, default=0)
+    total_days = Column(Integer, default=0)
+    last_completed = Column(Date)  # день последнего выполнения, для инкрементальной цепочки
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_user_habits_user_id", "user_id"),
+        Index("ix_user_habits_user_id_name", "user_id", "current_habit"),
+    )
+
+class HabitLog(Base):
+    __tablename__ = "habit_logs"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(BigInteger, nullable=False)
+    habit_id = Column(Integer)
+    habit_name = Column(String(100))
+    success = Column(Boolean)
+    log_date = Column(DateTime, default=datetime.utcnow)
+    log_day = Column(Date)  # день выполнения, не больше одной записи на привычку в день
+
+    __table_args__ = (
+        Index("ix_habit_logs_user_id_log_date", "user_id", "log_date"),
+        Index("ix_habit_logs_habit_id_log_date", "habit_id", "log_date"),
+        Index("ux_habit_logs_habit_id_log_day", "habit_id", "log_day", unique=True),
+    )
+
+class HabitYearBits(Base):
+    __tablename__ = "habit_year_bits"
+
+    habit_id = Column(Integer, primary_key=True)
+    year = Column(Integer, primary_key=True)
+    user_id = Column(BigInteger, nullable=False)
+    bits = Column(LargeBinary(46), nullable=False)  # бит i — выполнение в (i + 1)-й день года
+
+    __table_args__ = (
+        Index("ix_habit_year_bits_user_id_year", "user_id", "year"),
+    )
+
+class UserDailyStats(Base):
+    __tablename__ = "user_daily_stats"
+
+    user_id = Column(BigInteger, primary_key=True)
+    day = Column(Date, primary_key=True)
+    completions = Column(Integer, nullable=False, default=0)
+
+class HabitDailyStats(Base):
+    __tablename__ = "habit_daily_stats"
+
+    habit_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    user_id = Column(BigInteger, nullable=False)
+    completions = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_habit_daily_stats_user_id_day", "user_id", "day"),
+    )
+
+class FSMRecord(Base):
+    __tablename__ = "fsm_states"
+
+    key = Column(String(200), primary_key=True)
+    state = Column(String(100))
+    data = Column(Text)  # JSON
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_fsm_states_updated_at", "updated_at"),
+    )
@@ -0,0 +1,39 @@
+import importlib
+from typing import Any, Dict
+
+# Откуда берутся объекты, которые нужны хэндлерам; по умолчанию — database.database
+_SOURCES: Dict[str, str] = {
+    "completion_buffer": "database.write_behind",
+}
+_DEFAULT_SOURCE = "database.database"
+
+
+class Repository:
+    """Функции работы с БД для хэндлеров.
+
+    Модули с SQLAlchemy импортируются при первом обращении, а не при
+    импорте хэндлеров. Найденный объект сохраняется в атрибут
+    экземпляра, поэтому дальше обращение repo.get_user_habits — обычное
+    чтение атрибута, без import на каждый апдейт. resolve() делает это
+    для всех функций сразу при старте бота.
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        # Вызывается только для еще не найденных имен
+        if name.startswith("__"):
+            raise AttributeError(name)
+        value = getattr(importlib.import_module(_SOURCES.get(name, _DEFAULT_SOURCE)), name)
+        setattr(self, name, value)
+        return value
+
+    def resolve(self):
+        """Найти заранее все публичные функции database.database и объекты из _SOURCES"""
+        module = importlib.import_module(_DEFAULT_SOURCE)
+        for name, value in vars(module).items():
+            if not name.startswith("_") and callable(value) and getattr(value, "__module__", None) == module.__name__:
+                setattr(self, name, value)
+        for name in _SOURCES:
+            getattr(self, name)
+
+
+repo = Repository()
@@ -0,0 +1,163 @@
+import asyncio
+import contextvars
+import logging
+from datetime import datetime, date
+from typing import Any, Dict, Optional, Tuple
+
+from config import (
+    COMPLETION_FLUSH_INTERVAL, COMPLETION_FLUSH_BATCH, COMPLETION_FLUSH_MAX_DELAY, COMPLETION_FLUSH_MAX_RETRIES
+)
+from database.database import get_habit_by_id, habit_cache, mark_habits_completed_bulk, unflushed_completions
+
+logger = logging.getLogger(__name__)
+
+
+class CompletionBuffer:
+    """Отложенная запись выполнений привычек.
+
+    submit() сразу обновляет привычку в кэше и возвращает ее новое
+    состояние, а в БД выполнения уходят пачками из фоновой задачи раз
+    в flush_interval секунд или при накоплении flush_batch событий.
+    close() дописывает остаток, поэтому при штатной остановке ничего
+    не теряется; выполнения, пришедшие после close(), пишутся сразу.
+    Пока выполнение не записано, оно лежит и в unflushed_completions:
+    привычка, заново прочитанная из БД после промаха кэша, тоже
+    показывается выполненной. Неудачная запись повторяется с
+    экспоненциальной паузой, после max_retries неудач подряд пачка
+    отбрасывается с ошибкой в логе. Как и кэш привычек, буфер
+    рассчитан на то, что апдейты одного пользователя обрабатывает
+    один процесс.
+    """
+
+    def __init__(self, flush_interval: float = COMPLETION_FLUSH_INTERVAL,
+                 flush_batch: int = COMPLETION_FLUSH_BATCH,
+                 max_delay: float = COMPLETION_FLUSH_MAX_DELAY,
+                 max_retries: int = COMPLETION_FLUSH_MAX_RETRIES):
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self._pending: Dict[Tuple[int, date], int] = {}  # (habit_id, day) -> user_id
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.submitted = 0
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.dropped = 0
+        self._failed_in_row = 0
+
+    async def submit(self, habit_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+        """Отметить выполнение за сегодня. None, если уже отмечено или привычки нет"""
+        today = datetime.utcnow().date()
+        if (habit_id, today) in self._pending:
+            return None
+
+        habit = await get_habit_by_id(habit_id, user_id)
+        # Пока шел запрос, то же нажатие могло прийти повторно
+        if habit is None or habit["completed_today"] or (habit_id, today) in self._pending:
+            return None
+
+        # Непрерванная цепочка без отметки за сегодня продолжается со вчера
+        streak = habit["streak"] + 1
+        habit = {
+            **habit,
+            "completed_today": True,
+            "streak": streak,
+            "best_streak": max(habit["best_streak"], streak),
+            "total_days": habit["total_days"] + 1,
+        }
+        if self._closing:
+            # Фоновая запись уже остановлена: пишем сразу, иначе выполнение потеряется
+            if not await mark_habits_completed_bulk([(habit_id, user_id, today)]):
+                return None
+            habit_cache.replace_habit(user_id, habit)
+            self.submitted += 1
+            self.written += 1
+            return habit
+
+        habit_cache.replace_habit(user_id, habit)
+        self._pending[(habit_id, today)] = user_id
+        unflushed_completions.add((habit_id, today))
+        self.submitted += 1
+        if not self._closing and (self._flush_task is None or self._flush_task.done()):
+            # Пустой контекст: иначе задача унаследует метрики апдейта, который ее запустил
+            self._flush_task = asyncio.create_task(self._flush_loop(), context=contextvars.Context())
+        if len(self._pending) >= self.flush_batch:
+            self._wakeup.set()
+        return habit
+
+    async def _flush_loop(self):
+        delay = self.flush_interval
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+                delay = self.flush_interval
+            except Exception as e:
+                logger.error(f"Error flushing completions: {e}")
+                delay = min(delay * 2, self.max_delay)
+
+    async def flush(self):
+        """Записать накопленные выполнения одной транзакцией"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+
+            events = [(habit_id, user_id, day) for (habit_id, day), user_id in pending.items()]
+            try:
+                self.written += await mark_habits_completed_bulk(events)
+                self.batches += 1
+                self._failed_in_row = 0
+                # Теперь выполнения есть в БД (или пропущены, если привычку удалили)
+                unflushed_completions.difference_update(pending)
+            except BaseException:
+                self.failures += 1
+                self._failed_in_row += 1
+                if self._failed_in_row > self.max_retries:
+                    self._drop(pending)
+                    raise
+                # Вернуть события в очередь, чтобы не потерять выполнения
+                for key, user_id in pending.items():
+                    self._pending.setdefault(key, user_id)
+                raise
+
+    def _drop(self, pending: Dict[Tuple[int, date], int]):
+        """Отказаться от пачки после max_retries неудач подряд"""
+        logger.error(
+            f"Dropping {len(pending)} habit completions after {self._failed_in_row} failed writes in a row"
+        )
+        self.dropped += len(pending)
+        self._failed_in_row = 0
+        unflushed_completions.difference_update(pending)
+        # В кэше эти привычки показаны выполненными — пусть перечитаются из БД
+        for user_id in set(pending.values()):
+            habit_cache.invalidate(user_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "submitted": self.submitted,
+            "written": self.written,
+            "batches": self.batches,
+            "failures": self.failures,
+            "dropped": self.dropped,
+        }
+
+    async def close(self) -> None:
+        # Не отменяем задачу посреди записи, а даем ей закончить текущую пачку
+        self._closing = True
+        self._wakeup.set()
+        if self._flush_task is not None:
+            await self._flush_task
+        await self.flush()
+
+
+completion_buffer = CompletionBuffer()
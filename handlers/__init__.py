@@ -1,13 +1,15 @@
 from .start_handler import router as start_router
 from .menu_handlers import router as menu_router
 from .habit_handlers import router as habit_router
+from .admin_handlers import router as admin_router
 
 # Экспортируем все роутеры для удобного импорта
-routers = [start_router, menu_router, habit_router]
+routers = [start_router, menu_router, habit_router, admin_router]
 
 __all__ = [
     'start_router',
     'menu_router',
     'habit_router',
+    'admin_router',
     'routers'
 ]
\ No newline at end of file
@@ -0,0 +1,26 @@
+from aiogram import Router, types
+from aiogram.filters import Command
+import logging
+
+from config import ADMIN_IDS
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+
+@router.message(Command("metrics"))
+async def cmd_metrics(message: types.Message):
+    """Метрики обработки апдейтов в формате Prometheus (только для админов)"""
+    from services.metrics import metrics
+
+    if message.from_user.id not in ADMIN_IDS:
+        return
+
+    try:
+        report = metrics.render()
+        await message.answer_document(
+            types.BufferedInputFile(report.encode(), filename="metrics.txt"),
+            caption=f"⏱ В обработке: {metrics.in_flight}",
+        )
+    except Exception as e:
+        logger.error(f"Error in cmd_metrics: {e}")
@@ -1,8 +1,9 @@
-from aiogram import Router, types, F
+from aiogram import types
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.exceptions import TelegramBadRequest
 import logging
+from html import escape
 
 from keyboards import (
     get_main_menu,
@@ -13,17 +14,32 @@ from keyboards import (
     get_habit_actions_keyboard,
     get_habits_keyboard,
     get_edit_habit_keyboard,
-    get_emoji_selection_keyboard
+    get_emoji_selection_keyboard,
+    HabitCard,
+    HabitsPage,
+    BackToHabits,
+    AddHabit,
+    CompleteHabit,
+    EditHabit,
+    DeleteHabit,
+    HabitStats,
+    BackToHabit,
+    EditField,
+    PickEmoji,
+    BackToEdit
 )
+from database.repository import repo
 from utils.states import HabitStates, EditHabitStates, DeleteHabitStates
+from utils.dispatch import TableRouter
+from utils.habit_card import render_habit_card
 from typing import Dict, Any
 
-router = Router()
+router = TableRouter()
 logger = logging.getLogger(__name__)
 
 
 # ---------- Добавление привычки ----------
-@router.message(F.text == "➕ Добавить привычку")
+@router.text("➕ Добавить привычку")
 @router.message(Command("addhabit"))
 async def add_habit_start(message: types.Message, state: FSMContext):
     """Начать процесс добавления привычки"""
@@ -139,11 +155,11 @@ async def process_habit_frequency(message: types.Message, state: FSMContext):
         confirmation_text = f"""
 ✅ <b>Проверьте данные привычки:</b>
 
-<b>Название:</b> {data['name']}
-<b>Описание:</b> {data.get('description', 'нет')}
-<b>Время напоминания:</b> {data['reminder_time']}
-<b>Частота:</b> {message.text}
-<b>Эмодзи:</b> {data['emoji']}
+<b>Название:</b> {escape(data['name'], quote=False)}
+<b>Описание:</b> {escape(data.get('description') or 'нет', quote=False)}
+<b>Время напоминания:</b> {escape(data['reminder_time'], quote=False)}
+<b>Частота:</b> {escape(message.text, quote=False)}
+<b>Эмодзи:</b> {escape(data['emoji'], quote=False)}
 
 <b>Все верно?</b>
         """
@@ -162,8 +178,6 @@ async def process_habit_frequency(message: types.Message, state: FSMContext):
 @router.message(HabitStates.waiting_for_habit_confirmation)
 async def process_habit_confirmation(message: types.Message, state: FSMContext):
     """Подтвердить создание привычки"""
-    from database.database import add_habit
-
     try:
         if message.text == "❌ Отмена":
             await state.clear()
@@ -173,7 +187,7 @@ async def process_habit_confirmation(message: types.Message, state: FSMContext):
         if message.text == "✅ Подтвердить":
             data = await state.get_data()
 
-            habit_id = add_habit(
+            habit_id = await repo.add_habit(
                 user_id=message.from_user.id,
                 name=data['name'],
                 description=data.get('description'),
@@ -184,8 +198,8 @@ async def process_habit_confirmation(message: types.Message, state: FSMContext):
 
             if habit_id:
                 await message.answer(
-                    f"🎉 <b>Привычка \"{data['name']}\" успешно создана!</b>\n\n"
-                    f"Теперь я буду напоминать вам о ней в {data['reminder_time']}",
+                    f"🎉 <b>Привычка \"{escape(data['name'], quote=False)}\" успешно создана!</b>\n\n"
+                    f"Теперь я буду напоминать вам о ней в {escape(data['reminder_time'], quote=False)}",
                     parse_mode="HTML",
                     reply_markup=get_main_menu()
                 )
@@ -193,7 +207,7 @@ async def process_habit_confirmation(message: types.Message, state: FSMContext):
                 # Планируем напоминание через сервис
                 try:
                     from services.reminder_service import schedule_habit_reminder
-                    await schedule_habit_reminder(habit_id, data['reminder_time'])
+                    await schedule_habit_reminder(habit_id, data['reminder_time'], message.from_user.id)
                 except ImportError:
                     logger.warning("Reminder service not available")
             else:
@@ -211,42 +225,21 @@ async def process_habit_confirmation(message: types.Message, state: FSMContext):
 
 
 # ---------- Работа с существующими привычками ----------
-@router.callback_query(F.data.startswith("habit_"))
-async def show_habit_details(callback: types.CallbackQuery):
+@router.callback(HabitCard)
+async def show_habit_details(callback: types.CallbackQuery, callback_data: HabitCard):
     """Показать детали привычки"""
-    from database.database import get_habit_by_id
-
     try:
-        habit_id = int(callback.data.split("_")[1])
-        habit = get_habit_by_id(habit_id, callback.from_user.id)
+        habit_id = callback_data.habit_id
+        habit = await repo.get_habit_by_id(habit_id, callback.from_user.id)
 
         if not habit:
             await callback.answer("❌ Привычка не найдена")
             return
 
-        # Получаем дополнительные данные
-        completed_today = habit.get('completed_today', False)
-        streak = habit.get('streak', 0)
-        reminder_time = habit.get('reminder_time', 'нет')
-        created_at = habit.get('created_at', '')
-
-        status = "✅ Выполнено сегодня" if completed_today else "⏳ Ожидает выполнения"
-
-        habit_text = f"""
-{habit.get('emoji', '🎯')} <b>{habit['name']}</b>
-
-{habit.get('description', '')}
-
-<b>Статус:</b> {status}
-<b>Цепочка:</b> 🔥 {streak} дней
-<b>Время напоминания:</b> {reminder_time}
-<b>Создана:</b> {str(created_at)[:10] if created_at else 'Неизвестно'}
-        """
-
         await callback.message.edit_text(
-            habit_text,
+            render_habit_card(habit),
             parse_mode="HTML",
-            reply_markup=get_habit_actions_keyboard(habit_id)
+            reply_markup=get_habit_actions_keyboard(habit_id, callback_data.page)
         )
         await callback.answer()
     except TelegramBadRequest:
@@ -256,44 +249,28 @@ async def show_habit_details(callback: types.CallbackQuery):
         await callback.answer("❌ Произошла ошибка при загрузке привычки")
 
 
-@router.callback_query(F.data.startswith("complete_"))
-async def complete_habit(callback: types.CallbackQuery):
+@router.callback(CompleteHabit)
+async def complete_habit(callback: types.CallbackQuery, callback_data: CompleteHabit):
     """Отметить привычку выполненной"""
-    from database.database import mark_habit_completed, get_habit_by_id
-
     try:
-        habit_id = int(callback.data.split("_")[1])
+        habit_id = callback_data.habit_id
 
-        success = mark_habit_completed(habit_id, callback.from_user.id)
+        # Ответ строится из кэша, запись в БД уходит в ближайшей пачке
+        habit = await repo.completion_buffer.submit(habit_id, callback.from_user.id)
 
-        if success:
-            habit = get_habit_by_id(habit_id, callback.from_user.id)
-            streak = habit.get('streak', 0) if habit else 0
+        if habit:
+            streak = habit.get('streak', 0)
             await callback.answer(f"✅ Привычка выполнена! Цепочка: {streak} дней")
 
             # Обновляем сообщение
-            if habit:
-                status = "✅ Выполнено сегодня"
-                habit_text = f"""
-{habit.get('emoji', '🎯')} <b>{habit['name']}</b>
-
-{habit.get('description', '')}
-
-<b>Статус:</b> {status}
-<b>Цепочка:</b> 🔥 {streak} дней
-<b>Время напоминания:</b> {habit.get('reminder_time', 'нет')}
-
-🎉 <b>Поздравляем! Вы поддерживаете цепочку {streak} дней!</b>
-                """
-
-                try:
-                    await callback.message.edit_text(
-                        habit_text,
-                        parse_mode="HTML",
-                        reply_markup=get_habit_actions_keyboard(habit_id)
-                    )
-                except TelegramBadRequest:
-                    pass  # Сообщение уже обновлено
+            try:
+                await callback.message.edit_text(
+                    render_habit_card(habit, "completed"),
+                    parse_mode="HTML",
+                    reply_markup=get_habit_actions_keyboard(habit_id, callback_data.page)
+                )
+            except TelegramBadRequest:
+                pass  # Сообщение уже обновлено
         else:
             await callback.answer("❌ Уже выполнено сегодня")
     except Exception as e:
@@ -301,17 +278,17 @@ async def complete_habit(callback: types.CallbackQuery):
         await callback.answer("❌ Произошла ошибка")
 
 
-@router.callback_query(F.data.startswith("edit_"))
-async def edit_habit_start(callback: types.CallbackQuery, state: FSMContext):
+@router.callback(EditHabit)
+async def edit_habit_start(callback: types.CallbackQuery, callback_data: EditHabit, state: FSMContext):
     """Начать редактирование привычки"""
     try:
-        habit_id = int(callback.data.split("_")[1])
+        habit_id = callback_data.habit_id
 
         await state.update_data(habit_id=habit_id)
         await callback.message.edit_text(
             "✏️ <b>Что вы хотите изменить?</b>",
             parse_mode="HTML",
-            reply_markup=get_edit_habit_keyboard(habit_id)  # Передаем habit_id
+            reply_markup=get_edit_habit_keyboard(habit_id, callback_data.page)
         )
         await state.set_state(EditHabitStates.waiting_for_edit_field)
         await callback.answer()
@@ -322,21 +299,15 @@ async def edit_habit_start(callback: types.CallbackQuery, state: FSMContext):
         await callback.answer("❌ Произошла ошибка")
 
 
-@router.callback_query(F.data.startswith("edit_field_"))
-async def edit_field_selected(callback: types.CallbackQuery, state: FSMContext):
+@router.callback(EditField)
+async def edit_field_selected(callback: types.CallbackQuery, callback_data: EditField, state: FSMContext):
     """Обработать выбор поля для редактирования"""
     try:
-        field = callback.data.split("_")[2]
-
-        # Получаем habit_id из состояния
-        data = await state.get_data()
-        habit_id = data.get('habit_id')
+        field = callback_data.field
+        habit_id = callback_data.habit_id
 
-        if not habit_id:
-            await callback.answer("❌ Ошибка: ID привычки не найден")
-            return
-
-        await state.update_data(edit_field=field)
+        # habit_id приходит в кнопке, в состоянии он нужен для ввода нового значения
+        await state.update_data(habit_id=habit_id, edit_field=field)
 
         field_names = {
             "name": "название",
@@ -365,22 +336,14 @@ async def edit_field_selected(callback: types.CallbackQuery, state: FSMContext):
         await callback.answer("❌ Произошла ошибка")
 
 
-@router.callback_query(F.data.startswith("emoji_"))
-async def process_emoji_selection(callback: types.CallbackQuery, state: FSMContext):
+@router.callback(PickEmoji)
+async def process_emoji_selection(callback: types.CallbackQuery, callback_data: PickEmoji, state: FSMContext):
     """Обработать выбор эмодзи"""
-    from database.database import update_habit
-
     try:
-        emoji = callback.data.split("_")[1]
-        data = await state.get_data()
-        habit_id = data.get('habit_id')
-        field = data.get('edit_field')
+        emoji = callback_data.emoji
+        habit_id = callback_data.habit_id
 
-        if not habit_id or field != "emoji":
-            await callback.answer("❌ Ошибка данных")
-            return
-
-        success = update_habit(habit_id, callback.from_user.id, field, emoji)
+        success = await repo.update_habit(habit_id, callback.from_user.id, "emoji", emoji)
 
         if success:
             # Показываем успешное обновление
@@ -407,38 +370,15 @@ async def process_emoji_selection(callback: types.CallbackQuery, state: FSMConte
 
 async def show_habit_after_edit(callback: types.CallbackQuery, habit_id: int):
     """Показать привычку после редактирования"""
-    from database.database import get_habit_by_id
-
     try:
-        habit = get_habit_by_id(habit_id, callback.from_user.id)
+        habit = await repo.get_habit_by_id(habit_id, callback.from_user.id)
 
         if not habit:
             await callback.answer("❌ Привычка не найдена")
             return
 
-        # Получаем дополнительные данные
-        completed_today = habit.get('completed_today', False)
-        streak = habit.get('streak', 0)
-        reminder_time = habit.get('reminder_time', 'нет')
-        created_at = habit.get('created_at', '')
-
-        status = "✅ Выполнено сегодня" if completed_today else "⏳ Ожидает выполнения"
-
-        habit_text = f"""
-{habit.get('emoji', '🎯')} <b>{habit['name']}</b>
-
-{habit.get('description', '')}
-
-<b>Статус:</b> {status}
-<b>Цепочка:</b> 🔥 {streak} дней
-<b>Время напоминания:</b> {reminder_time}
-<b>Создана:</b> {str(created_at)[:10] if created_at else 'Неизвестно'}
-
-✅ <i>Изменения сохранены!</i>
-        """
-
         await callback.message.edit_text(
-            habit_text,
+            render_habit_card(habit, "saved"),
             parse_mode="HTML",
             reply_markup=get_habit_actions_keyboard(habit_id)
         )
@@ -449,8 +389,6 @@ async def show_habit_after_edit(callback: types.CallbackQuery, habit_id: int):
 @router.message(EditHabitStates.waiting_for_new_value)
 async def process_new_value(message: types.Message, state: FSMContext):
     """Обработать новое значение для поля"""
-    from database.database import update_habit
-
     try:
         data = await state.get_data()
         habit_id = data.get('habit_id')
@@ -467,14 +405,14 @@ async def process_new_value(message: types.Message, state: FSMContext):
             await message.answer("❌ Название слишком длинное. Максимум 100 символов.")
             return
 
-        success = update_habit(habit_id, message.from_user.id, field, message.text.strip())
+        success = await repo.update_habit(habit_id, message.from_user.id, field, message.text.strip())
 
         if success:
             # Обновляем напоминание если изменилось время
             if field == "reminder_time":
                 try:
                     from services.reminder_service import update_habit_reminder
-                    await update_habit_reminder(habit_id, message.text.strip())
+                    await update_habit_reminder(habit_id, message.text.strip(), message.from_user.id)
                 except ImportError:
                     logger.warning("Reminder service not available")
 
@@ -497,25 +435,24 @@ async def process_new_value(message: types.Message, state: FSMContext):
                              reply_markup=get_main_menu())
 
 
-@router.callback_query(F.data.startswith("delete_"))
-async def delete_habit_start(callback: types.CallbackQuery, state: FSMContext):
+@router.callback(DeleteHabit)
+async def delete_habit_start(callback: types.CallbackQuery, callback_data: DeleteHabit, state: FSMContext):
     """Начать процесс удаления привычки"""
-    from database.database import get_habit_by_id
-
     try:
-        habit_id = int(callback.data.split("_")[1])
+        habit_id = callback_data.habit_id
 
         await state.update_data(habit_id=habit_id)
 
-        habit = get_habit_by_id(habit_id, callback.from_user.id)
+        habit = await repo.get_habit_by_id(habit_id, callback.from_user.id)
 
         if not habit:
             await callback.answer("❌ Привычка не найдена")
             return
 
-        await callback.message.edit_text(
+        # Подтверждение — ответной клавиатурой, ее нельзя прикрепить к правке сообщения
+        await callback.message.answer(
             f"🗑️ <b>Вы уверены, что хотите удалить привычку?</b>\n\n"
-            f"<b>{habit.get('emoji', '🎯')} {habit['name']}</b>\n"
+            f"<b>{escape(habit.get('emoji') or '🎯', quote=False)} {escape(habit['name'], quote=False)}</b>\n"
             f"🔥 Цепочка: {habit.get('streak', 0)} дней\n\n"
             f"<i>Это действие нельзя отменить!</i>",
             parse_mode="HTML",
@@ -531,8 +468,6 @@ async def delete_habit_start(callback: types.CallbackQuery, state: FSMContext):
 @router.message(DeleteHabitStates.waiting_for_confirmation)
 async def delete_habit_confirm(message: types.Message, state: FSMContext):
     """Подтвердить удаление привычки"""
-    from database.database import get_habit_by_id, delete_habit
-
     try:
         if message.text == "❌ Отмена":
             await state.clear()
@@ -548,7 +483,7 @@ async def delete_habit_confirm(message: types.Message, state: FSMContext):
                 await message.answer("❌ Сессия истекла", reply_markup=get_main_menu())
                 return
 
-            habit = get_habit_by_id(habit_id, message.from_user.id)
+            habit = await repo.get_habit_by_id(habit_id, message.from_user.id)
 
             if habit:
                 # Удаляем напоминание если есть сервис
@@ -559,7 +494,7 @@ async def delete_habit_confirm(message: types.Message, state: FSMContext):
                     logger.warning("Reminder service not available")
 
                 # Удаляем из БД
-                delete_habit(habit_id, message.from_user.id)
+                await repo.delete_habit(habit_id, message.from_user.id)
 
                 await message.answer(
                     f"🗑️ Привычка \"{habit['name']}\" удалена\n"
@@ -578,22 +513,20 @@ async def delete_habit_confirm(message: types.Message, state: FSMContext):
                              reply_markup=get_main_menu())
 
 
-@router.callback_query(F.data.startswith("stats_habit_"))
-async def show_habit_stats(callback: types.CallbackQuery):
+@router.callback(HabitStats)
+async def show_habit_stats(callback: types.CallbackQuery, callback_data: HabitStats):
     """Показать статистику привычки"""
-    from database.database import get_habit_stats, get_habit_by_id
-
     try:
-        habit_id = int(callback.data.split("_")[2])
-        stats = get_habit_stats(habit_id, callback.from_user.id)
-        habit = get_habit_by_id(habit_id, callback.from_user.id)
+        habit_id = callback_data.habit_id
+        stats = await repo.get_habit_stats(habit_id, callback.from_user.id)
+        habit = await repo.get_habit_by_id(habit_id, callback.from_user.id)
 
         if not stats or not habit:
             await callback.answer("❌ Статистика не найдена")
             return
 
         stats_text = f"""
-📊 <b>Статистика привычки "{habit['name']}"</b>
+📊 <b>Статистика привычки "{escape(habit['name'], quote=False)}"</b>
 
 📈 <b>Выполнено дней:</b> {stats.get('total_completions', 0)}
 📅 <b>Успешность:</b> {stats.get('success_rate', 0)}%
@@ -605,7 +538,7 @@ async def show_habit_stats(callback: types.CallbackQuery):
         await callback.message.edit_text(
             stats_text,
             parse_mode="HTML",
-            reply_markup=get_habit_actions_keyboard(habit_id)
+            reply_markup=get_habit_actions_keyboard(habit_id, callback_data.page)
         )
         await callback.answer()
     except TelegramBadRequest:
@@ -616,15 +549,13 @@ async def show_habit_stats(callback: types.CallbackQuery):
 
 
 # ---------- Навигация ----------
-@router.callback_query(F.data == "back_to_habits")
-async def back_to_habits_list(callback: types.CallbackQuery):
+@router.callback(BackToHabits)
+async def back_to_habits_list(callback: types.CallbackQuery, callback_data: BackToHabits):
     """Вернуться к списку привычек"""
-    from database.database import get_user_habits
-
     try:
-        habits = get_user_habits(callback.from_user.id)
+        page = await repo.get_habits_page(callback.from_user.id, callback_data.page)
 
-        if not habits:
+        if not page["habits"]:
             await callback.message.edit_text(
                 "📭 У вас пока нет привычек",
                 reply_markup=get_main_menu()
@@ -634,7 +565,7 @@ async def back_to_habits_list(callback: types.CallbackQuery):
         await callback.message.edit_text(
             "📋 <b>Ваши привычки:</b>",
             parse_mode="HTML",
-            reply_markup=get_habits_keyboard(habits)
+            reply_markup=get_habits_keyboard(page["habits"], page["page"], total=page["total"])
         )
         await callback.answer()
     except Exception as e:
@@ -642,17 +573,14 @@ async def back_to_habits_list(callback: types.CallbackQuery):
         await callback.answer("❌ Произошла ошибка")
 
 
-@router.callback_query(F.data.startswith("page_"))
-async def change_page(callback: types.CallbackQuery):
+@router.callback(HabitsPage)
+async def change_page(callback: types.CallbackQuery, callback_data: HabitsPage):
     """Смена страницы в списке привычек"""
-    from database.database import get_user_habits
-
     try:
-        page = int(callback.data.split("_")[1])
-        habits = get_user_habits(callback.from_user.id)
+        page = await repo.get_habits_page(callback.from_user.id, callback_data.page)
 
         await callback.message.edit_reply_markup(
-            reply_markup=get_habits_keyboard(habits, page)
+            reply_markup=get_habits_keyboard(page["habits"], page["page"], total=page["total"])
         )
         await callback.answer()
     except TelegramBadRequest:
@@ -662,7 +590,7 @@ async def change_page(callback: types.CallbackQuery):
         await callback.answer("❌ Произошла ошибка")
 
 
-@router.callback_query(F.data == "add_habit")
+@router.callback(AddHabit)
 async def add_habit_from_list(callback: types.CallbackQuery):
     """Добавить привычку из списка"""
     try:
@@ -676,42 +604,21 @@ async def add_habit_from_list(callback: types.CallbackQuery):
         await callback.answer("❌ Произошла ошибка")
 
 
-@router.callback_query(F.data.startswith("back_to_habit_"))
-async def back_to_habit(callback: types.CallbackQuery):
+@router.callback(BackToHabit)
+async def back_to_habit(callback: types.CallbackQuery, callback_data: BackToHabit):
     """Вернуться к просмотру привычки"""
-    from database.database import get_habit_by_id
-
     try:
-        habit_id = int(callback.data.split("_")[3])
-        habit = get_habit_by_id(habit_id, callback.from_user.id)
+        habit_id = callback_data.habit_id
+        habit = await repo.get_habit_by_id(habit_id, callback.from_user.id)
 
         if not habit:
             await callback.answer("❌ Привычка не найдена")
             return
 
-        # Получаем дополнительные данные
-        completed_today = habit.get('completed_today', False)
-        streak = habit.get('streak', 0)
-        reminder_time = habit.get('reminder_time', 'нет')
-        created_at = habit.get('created_at', '')
-
-        status = "✅ Выполнено сегодня" if completed_today else "⏳ Ожидает выполнения"
-
-        habit_text = f"""
-{habit.get('emoji', '🎯')} <b>{habit['name']}</b>
-
-{habit.get('description', '')}
-
-<b>Статус:</b> {status}
-<b>Цепочка:</b> 🔥 {streak} дней
-<b>Время напоминания:</b> {reminder_time}
-<b>Создана:</b> {str(created_at)[:10] if created_at else 'Неизвестно'}
-        """
-
         await callback.message.edit_text(
-            habit_text,
+            render_habit_card(habit),
             parse_mode="HTML",
-            reply_markup=get_habit_actions_keyboard(habit_id)
+            reply_markup=get_habit_actions_keyboard(habit_id, callback_data.page)
         )
         await callback.answer()
     except TelegramBadRequest:
@@ -721,12 +628,11 @@ async def back_to_habit(callback: types.CallbackQuery):
         await callback.answer("❌ Произошла ошибка при загрузке привычки")
 
 
-@router.callback_query(F.data.startswith("back_to_edit_"))
-async def back_to_edit(callback: types.CallbackQuery, state: FSMContext):
+@router.callback(BackToEdit)
+async def back_to_edit(callback: types.CallbackQuery, callback_data: BackToEdit, state: FSMContext):
     """Вернуться к выбору поля редактирования"""
     try:
-        # Получаем habit_id из callback_data
-        habit_id = int(callback.data.split("_")[3])
+        habit_id = callback_data.habit_id
 
         # Обновляем состояние
         await state.update_data(habit_id=habit_id)
@@ -742,4 +648,11 @@ async def back_to_edit(callback: types.CallbackQuery, state: FSMContext):
         await callback.answer("❌ Сообщение устарело")
     except Exception as e:
         logger.error(f"Error in back_to_edit: {e}")
-        await callback.answer("❌ Произошла ошибка")
\ No newline at end of file
+        await callback.answer("❌ Произошла ошибка")
+
+
+# ---------- Устаревшие кнопки ----------
+@router.callback_query()
+async def stale_callback(callback: types.CallbackQuery):
+    """Кнопка из старого сообщения: callback_data другой версии или неизвестная"""
+    await callback.answer("❌ Кнопка устарела. Откройте список привычек заново.")
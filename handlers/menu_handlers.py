@@ -1,26 +1,34 @@
-from aiogram import Router, types, F
-from aiogram.filters import Command
+from aiogram import types
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 import logging
+import re
+from html import escape
 
 from keyboards import (
     get_main_menu,
     get_habits_keyboard,
     get_stats_period_keyboard,
-    get_back_keyboard
+    get_back_keyboard,
+    BackToMenu,
+    StatsPeriod
 )
+from database.repository import repo
+from utils.timezones import DEFAULT_TIMEZONE, parse_timezone
+from utils.dispatch import TableRouter
 
-router = Router()
+router = TableRouter()
 logger = logging.getLogger(__name__)
 
+HOURS_PATTERN = re.compile(r"^\s*(\d{1,2})\s*-\s*(\d{1,2})\s*$")
 
-@router.message(F.text == "📝 Мои привычки")
+
+@router.text("📝 Мои привычки")
 @router.message(Command("myhabits", "habits"))
 async def show_habits(message: types.Message):
     """Показать список привычек пользователя"""
-    from database.database import get_user_habits
-
-    habits = get_user_habits(message.from_user.id)
+    page = await repo.get_habits_page(message.from_user.id)
+    habits = page["habits"]
 
     if not habits:
         await message.answer(
@@ -32,12 +40,12 @@ async def show_habits(message: types.Message):
         return
 
     habits_text = "📋 <b>Ваши привычки:</b>\n\n"
-    for i, habit in enumerate(habits[:5], 1):  # Показываем первые 5
+    for habit in habits:  # Только первая страница, остальные — кнопками
         status = "✅" if habit.get('completed_today') else "⏳"
-        emoji = habit.get('emoji', '🎯')
-        name = habit.get('name', 'Без названия')
+        emoji = escape(habit.get('emoji') or '🎯', quote=False)
+        name = escape(habit.get('name') or 'Без названия', quote=False)
         streak = habit.get('streak', 0)
-        reminder_time = habit.get('reminder_time', 'нет')
+        reminder_time = escape(habit.get('reminder_time') or 'нет', quote=False)
 
         habits_text += f"{status} {emoji} <b>{name}</b>\n"
         habits_text += f"   🔥 Цепочка: {streak} дней\n"
@@ -46,17 +54,15 @@ async def show_habits(message: types.Message):
     await message.answer(
         habits_text,
         parse_mode="HTML",
-        reply_markup=get_habits_keyboard(habits)
+        reply_markup=get_habits_keyboard(habits, page["page"], total=page["total"])
     )
 
 
-@router.message(F.text == "📊 Статистика")
+@router.text("📊 Статистика")
 @router.message(Command("stats", "statistics"))
 async def show_stats_menu(message: types.Message):
     """Показать меню статистики"""
-    from database.database import get_user_stats
-
-    stats = get_user_stats(message.from_user.id)
+    stats = await repo.get_user_stats(message.from_user.id)
 
     if not stats or stats.get('total_habits', 0) == 0:
         await message.answer(
@@ -91,10 +97,10 @@ async def show_stats_menu(message: types.Message):
     )
 
 
-@router.callback_query(F.data.startswith("stats_period_"))
-async def show_period_stats(callback: types.CallbackQuery):
+@router.callback(StatsPeriod)
+async def show_period_stats(callback: types.CallbackQuery, callback_data: StatsPeriod):
     """Показать статистику за выбранный период"""
-    period = callback.data.split("_")[2]
+    period = callback_data.period
 
     period_names = {
         "today": "сегодня",
@@ -106,17 +112,26 @@ async def show_period_stats(callback: types.CallbackQuery):
 
     period_name = period_names.get(period, period)
 
-    # Здесь должна быть логика получения статистики за период
-    # Пока заглушка
-    stats_text = f"""
+    try:
+        stats = await repo.get_period_stats(callback.from_user.id, period)
+
+        if not stats:
+            stats_text = "📊 <b>Статистика появится после добавления первой привычки</b>"
+        else:
+            best_habit = (
+                f"{escape(stats['best_habit'], quote=False)} ({stats['best_habit_completions']})"
+                if stats['best_habit'] else "—"
+            )
+            stats_text = f"""
 📊 <b>Статистика за {period_name}:</b>
+<i>{stats['start'].strftime('%d.%m.%Y')} — {stats['end'].strftime('%d.%m.%Y')}</i>
 
-🚧 <i>Функция в разработке</i>
-
-Скоро здесь появится детальная статистика за выбранный период!
-    """
+✅ <b>Выполнений:</b> {stats['completions']}
+📅 <b>Активных дней:</b> {stats['active_days']}/{stats['days']}
+📈 <b>Успешность:</b> {stats['success_rate']}%
+🏆 <b>Лучшая привычка:</b> {best_habit}
+            """
 
-    try:
         await callback.message.edit_text(
             stats_text,
             parse_mode="HTML",
@@ -125,26 +140,32 @@ async def show_period_stats(callback: types.CallbackQuery):
     except Exception as e:
         logger.error(f"Error in show_period_stats: {e}")
         await callback.answer("❌ Не удалось обновить статистику")
+        return
 
     await callback.answer()
 
 
-@router.message(F.text == "⚙️ Настройки")
+@router.text("⚙️ Настройки")
 @router.message(Command("settings"))
 async def show_settings(message: types.Message):
     """Показать настройки"""
-    settings_text = """
+    from services.reminder_service import DEFAULT_ACTIVE_HOURS
+
+    settings = await repo.get_user_settings(message.from_user.id)
+    start, end = settings["active_hours"] or DEFAULT_ACTIVE_HOURS
+
+    settings_text = f"""
 ⚙️ <b>Настройки</b>
 
-<i>Здесь вы можете настроить:</i>
-• Часовой пояс
-• Время напоминаний
-• Язык интерфейса
-• Уведомления
+🌍 <b>Часовой пояс:</b> {settings["timezone"] or DEFAULT_TIMEZONE}
+<i>Время напоминаний указывается по этому поясу.</i>
+Изменить: /timezone Europe/Moscow или /timezone +3
 
-🚧 <b>Раздел в разработке</b>
+⏰ <b>Активные часы:</b> {start:02d}:00–{end:02d}:59
+<i>Ежечасные напоминания приходят только в это время.</i>
+Изменить: /hours 8-22
 
-<i>Скоро здесь появятся настройки!</i>
+🚧 <b>Скоро:</b> язык интерфейса, уведомления
     """
 
     await message.answer(
@@ -154,7 +175,78 @@ async def show_settings(message: types.Message):
     )
 
 
-@router.message(F.text == "🔙 Назад")
+@router.message(Command("timezone"))
+async def cmd_timezone(message: types.Message, command: CommandObject):
+    """Задать часовой пояс: /timezone Europe/Moscow или /timezone +3"""
+    from services.reminder_service import update_timezone
+
+    try:
+        if not command.args:
+            await message.answer(
+                "🌍 Укажите часовой пояс, например: <code>/timezone Europe/Moscow</code> "
+                "или <code>/timezone +3</code>",
+                parse_mode="HTML"
+            )
+            return
+
+        zone = parse_timezone(command.args)
+        if zone is None:
+            await message.answer(
+                "❌ Не знаю такого часового пояса. Используйте название вроде "
+                "<code>Europe/Moscow</code> или смещение вроде <code>+3</code>",
+                parse_mode="HTML"
+            )
+            return
+
+        if not await repo.set_timezone(message.from_user.id, zone):
+            await message.answer("❌ Не удалось сохранить настройки", reply_markup=get_main_menu())
+            return
+
+        await update_timezone(message.from_user.id, zone)
+        await message.answer(
+            f"✅ Часовой пояс: {zone}\nНапоминания будут приходить по местному времени.",
+            reply_markup=get_main_menu()
+        )
+    except Exception as e:
+        logger.error(f"Error in cmd_timezone: {e}")
+        await message.answer("❌ Произошла ошибка. Попробуйте снова.", reply_markup=get_main_menu())
+
+
+@router.message(Command("hours"))
+async def cmd_hours(message: types.Message, command: CommandObject):
+    """Задать окно активных часов для ежечасных напоминаний: /hours 8-22"""
+    from services.reminder_service import update_active_hours
+
+    try:
+        match = HOURS_PATTERN.match(command.args or "")
+        if match is None:
+            await message.answer(
+                "⏰ Укажите окно активных часов, например: <code>/hours 8-22</code>\n\n"
+                "Ежечасные напоминания будут приходить с 8:00 до 22:59.",
+                parse_mode="HTML"
+            )
+            return
+
+        start, end = int(match.group(1)), int(match.group(2))
+        if start > 23 or end > 23:
+            await message.answer("❌ Часы должны быть от 0 до 23")
+            return
+
+        if not await repo.set_active_hours(message.from_user.id, start, end):
+            await message.answer("❌ Не удалось сохранить настройки", reply_markup=get_main_menu())
+            return
+
+        await update_active_hours(message.from_user.id, start, end)
+        await message.answer(
+            f"✅ Активные часы: {start:02d}:00–{end:02d}:59",
+            reply_markup=get_main_menu()
+        )
+    except Exception as e:
+        logger.error(f"Error in cmd_hours: {e}")
+        await message.answer("❌ Произошла ошибка. Попробуйте снова.", reply_markup=get_main_menu())
+
+
+@router.text("🔙 Назад")
 async def back_to_menu(message: types.Message):
     """Вернуться в главное меню"""
     await message.answer(
@@ -164,7 +256,7 @@ async def back_to_menu(message: types.Message):
     )
 
 
-@router.callback_query(F.data == "back_to_menu")
+@router.callback(BackToMenu)
 async def back_to_menu_callback(callback: types.CallbackQuery):
     """Обработчик inline кнопки возврата в меню"""
     try:
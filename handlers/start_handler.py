@@ -1,10 +1,11 @@
-from aiogram import Router, types, F
+from aiogram import types
 from aiogram.filters import Command, CommandStart
 from aiogram.fsm.context import FSMContext
 
 from keyboards import get_main_menu
+from utils.dispatch import TableRouter
 
-router = Router()
+router = TableRouter()
 
 
 @router.message(CommandStart())
@@ -46,6 +47,8 @@ async def cmd_help(message: types.Message):
 /addhabit - Добавить привычку
 /stats - Статистика
 /settings - Настройки
+/timezone - Часовой пояс
+/hours - Активные часы ежечасных напоминаний
 
 <b>Как это работает:</b>
 1. Добавьте привычку с помощью кнопки "➕ Добавить привычку"
@@ -60,7 +63,7 @@ async def cmd_help(message: types.Message):
 
 
 @router.message(Command("cancel"))
-@router.message(F.text == "❌ Отмена")
+@router.text("❌ Отмена")
 async def cmd_cancel(message: types.Message, state: FSMContext):
     """Отмена текущего действия"""
     await state.clear()
@@ -9,7 +9,21 @@ from .keyboards import (
     get_stats_period_keyboard,
     get_edit_habit_keyboard,
     get_emoji_selection_keyboard,
-    get_back_keyboard
+    get_back_keyboard,
+    HabitCard,
+    HabitsPage,
+    BackToHabits,
+    AddHabit,
+    BackToMenu,
+    CompleteHabit,
+    EditHabit,
+    DeleteHabit,
+    HabitStats,
+    BackToHabit,
+    EditField,
+    PickEmoji,
+    BackToEdit,
+    StatsPeriod
 )
 
 __all__ = [
@@ -23,5 +37,19 @@ __all__ = [
     'get_stats_period_keyboard',
     'get_edit_habit_keyboard',
     'get_emoji_selection_keyboard',
-    'get_back_keyboard'
+    'get_back_keyboard',
+    'HabitCard',
+    'HabitsPage',
+    'BackToHabits',
+    'AddHabit',
+    'BackToMenu',
+    'CompleteHabit',
+    'EditHabit',
+    'DeleteHabit',
+    'HabitStats',
+    'BackToHabit',
+    'EditField',
+    'PickEmoji',
+    'BackToEdit',
+    'StatsPeriod'
 ]
\ No newline at end of file
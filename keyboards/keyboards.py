@@ -5,10 +5,84 @@ from aiogram.types import (
     InlineKeyboardButton
 )
 from aiogram.utils.keyboard import ReplyKeyboardBuilder, InlineKeyboardBuilder
-from typing import List, Dict, Any
+from functools import lru_cache
+from typing import List, Dict, Any, Literal, Optional
 
+from config import HABITS_PER_PAGE, KEYBOARD_CACHE_SIZE
+from utils.callback_data import PackedCallback
 
-def get_main_menu() -> ReplyKeyboardMarkup:
+EDIT_FIELDS = ("name", "description", "reminder_time", "frequency", "emoji")
+HABIT_EMOJIS = ("🎯", "💪", "🏃", "📚", "💧", "🥗", "😴", "🧘", "🎨", "🎸", "✍️", "🧹", "💰", "🌱", "🌟")
+STATS_PERIODS = ("today", "week", "month", "all_time", "last_30_days")
+
+
+# ---------- callback_data инлайн-кнопок ----------
+# Номер страницы списка едет вместе с habit_id, чтобы "назад" вел на ту же страницу
+class HabitCard(PackedCallback, code="h"):
+    habit_id: int
+    page: int = 0
+
+
+class HabitsPage(PackedCallback, code="p"):
+    page: int
+
+
+class BackToHabits(PackedCallback, code="l"):
+    page: int = 0
+
+
+class AddHabit(PackedCallback, code="a"):
+    pass
+
+
+class BackToMenu(PackedCallback, code="m"):
+    pass
+
+
+class CompleteHabit(PackedCallback, code="c"):
+    habit_id: int
+    page: int = 0
+
+
+class EditHabit(PackedCallback, code="e"):
+    habit_id: int
+    page: int = 0
+
+
+class DeleteHabit(PackedCallback, code="d"):
+    habit_id: int
+    page: int = 0
+
+
+class HabitStats(PackedCallback, code="s"):
+    habit_id: int
+    page: int = 0
+
+
+class BackToHabit(PackedCallback, code="b"):
+    habit_id: int
+    page: int = 0
+
+
+class EditField(PackedCallback, code="f"):
+    habit_id: int
+    field: Literal[EDIT_FIELDS]
+
+
+class PickEmoji(PackedCallback, code="j"):
+    habit_id: int
+    emoji: Literal[HABIT_EMOJIS]
+
+
+class BackToEdit(PackedCallback, code="r"):
+    habit_id: int
+
+
+class StatsPeriod(PackedCallback, code="t"):
+    period: Literal[STATS_PERIODS]
+
+
+def _build_main_menu() -> ReplyKeyboardMarkup:
     """Главное меню бота"""
     builder = ReplyKeyboardBuilder()
 
@@ -21,14 +95,14 @@ def get_main_menu() -> ReplyKeyboardMarkup:
     return builder.as_markup(resize_keyboard=True)
 
 
-def get_cancel_keyboard() -> ReplyKeyboardMarkup:
+def _build_cancel_keyboard() -> ReplyKeyboardMarkup:
     """Клавиатура с кнопкой отмены"""
     builder = ReplyKeyboardBuilder()
     builder.button(text="❌ Отмена")
     return builder.as_markup(resize_keyboard=True)
 
 
-def get_confirm_keyboard() -> ReplyKeyboardMarkup:
+def _build_confirm_keyboard() -> ReplyKeyboardMarkup:
     """Клавиатура подтверждения"""
     builder = ReplyKeyboardBuilder()
     builder.button(text="✅ Подтвердить")
@@ -36,28 +110,34 @@ def get_confirm_keyboard() -> ReplyKeyboardMarkup:
     return builder.as_markup(resize_keyboard=True)
 
 
-def get_back_keyboard() -> ReplyKeyboardMarkup:
+def _build_back_keyboard() -> ReplyKeyboardMarkup:
     """Клавиатура с кнопкой назад"""
     builder = ReplyKeyboardBuilder()
     builder.button(text="🔙 Назад")
     return builder.as_markup(resize_keyboard=True)
 
 
-def get_habits_keyboard(habits: List[Dict[str, Any]], page: int = 0, per_page: int = 5) -> InlineKeyboardMarkup:
-    """Инлайн-клавиатура со списком привычек"""
+def get_habits_keyboard(habits: List[Dict[str, Any]], page: int = 0, per_page: int = HABITS_PER_PAGE,
+                        total: Optional[int] = None) -> InlineKeyboardMarkup:
+    """Инлайн-клавиатура со списком привычек.
+
+    Если передан total, habits — уже готовая страница (get_habits_page),
+    иначе это весь список и страница вырезается здесь.
+    """
     builder = InlineKeyboardBuilder()
 
     # Если привычек нет
     if not habits:
-        builder.button(text="➕ Добавить первую привычку", callback_data="add_habit")
+        builder.button(text="➕ Добавить первую привычку", callback_data=AddHabit().pack())
         builder.adjust(1)
         return builder.as_markup()
 
     # Отображаем привычки для текущей страницы
-    start_idx = page * per_page
-    end_idx = min(start_idx + per_page, len(habits))
+    if total is None:
+        total = len(habits)
+        habits = habits[page * per_page:(page + 1) * per_page]
 
-    for habit in habits[start_idx:end_idx]:
+    for habit in habits:
         habit_id = habit.get('id', 0)
         emoji = habit.get('emoji', '🎯')
         name = habit.get('name', 'Без названия')
@@ -65,47 +145,44 @@ def get_habits_keyboard(habits: List[Dict[str, Any]], page: int = 0, per_page: i
 
         builder.button(
             text=f"{emoji} {name} 🔥{streak}",
-            callback_data=f"habit_{habit_id}"
+            callback_data=HabitCard(habit_id=habit_id, page=page).pack()
         )
 
     # Пагинация
-    if len(habits) > per_page:
+    if total > per_page:
         row_buttons = []
         if page > 0:
-            row_buttons.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=f"page_{page - 1}"))
+            row_buttons.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=HabitsPage(page=page - 1).pack()))
 
-        # Информация о странице
-        total_pages = (len(habits) + per_page - 1) // per_page
-
-        if (page + 1) * per_page < len(habits):
-            row_buttons.append(InlineKeyboardButton(text="Вперед ➡️", callback_data=f"page_{page + 1}"))
+        if (page + 1) * per_page < total:
+            row_buttons.append(InlineKeyboardButton(text="Вперед ➡️", callback_data=HabitsPage(page=page + 1).pack()))
 
         if row_buttons:
             builder.row(*row_buttons)
 
     # Кнопки действий
-    builder.button(text="➕ Добавить привычку", callback_data="add_habit")
-    builder.button(text="🔙 В главное меню", callback_data="back_to_menu")
+    builder.button(text="➕ Добавить привычку", callback_data=AddHabit().pack())
+    builder.button(text="🔙 В главное меню", callback_data=BackToMenu().pack())
 
     builder.adjust(1)
     return builder.as_markup()
 
 
-def get_habit_actions_keyboard(habit_id: int) -> InlineKeyboardMarkup:
+def _build_habit_actions_keyboard(habit_id: int, page: int = 0) -> InlineKeyboardMarkup:
     """Действия с конкретной привычкой"""
     builder = InlineKeyboardBuilder()
 
-    builder.button(text="✅ Отметить выполнение", callback_data=f"complete_{habit_id}")
-    builder.button(text="✏️ Редактировать", callback_data=f"edit_{habit_id}")
-    builder.button(text="🗑️ Удалить", callback_data=f"delete_{habit_id}")
-    builder.button(text="📊 Статистика привычки", callback_data=f"stats_habit_{habit_id}")
-    builder.button(text="🔙 К списку привычек", callback_data="back_to_habits")
+    builder.button(text="✅ Отметить выполнение", callback_data=CompleteHabit(habit_id=habit_id, page=page).pack())
+    builder.button(text="✏️ Редактировать", callback_data=EditHabit(habit_id=habit_id, page=page).pack())
+    builder.button(text="🗑️ Удалить", callback_data=DeleteHabit(habit_id=habit_id, page=page).pack())
+    builder.button(text="📊 Статистика привычки", callback_data=HabitStats(habit_id=habit_id, page=page).pack())
+    builder.button(text="🔙 К списку привычек", callback_data=BackToHabits(page=page).pack())
 
     builder.adjust(1)
     return builder.as_markup()
 
 
-def get_time_selection_keyboard() -> ReplyKeyboardMarkup:
+def _build_time_selection_keyboard() -> ReplyKeyboardMarkup:
     """Выбор времени напоминания"""
     builder = ReplyKeyboardBuilder()
 
@@ -121,7 +198,7 @@ def get_time_selection_keyboard() -> ReplyKeyboardMarkup:
     return builder.as_markup(resize_keyboard=True)
 
 
-def get_frequency_keyboard() -> ReplyKeyboardMarkup:
+def _build_frequency_keyboard() -> ReplyKeyboardMarkup:
     """Выбор частоты выполнения"""
     builder = ReplyKeyboardBuilder()
 
@@ -142,7 +219,7 @@ def get_frequency_keyboard() -> ReplyKeyboardMarkup:
     return builder.as_markup(resize_keyboard=True)
 
 
-def get_stats_period_keyboard() -> InlineKeyboardMarkup:
+def _build_stats_period_keyboard() -> InlineKeyboardMarkup:
     """Выбор периода для статистики"""
     builder = InlineKeyboardBuilder()
 
@@ -155,14 +232,14 @@ def get_stats_period_keyboard() -> InlineKeyboardMarkup:
     ]
 
     for text, callback in periods:
-        builder.button(text=text, callback_data=f"stats_period_{callback}")
+        builder.button(text=text, callback_data=StatsPeriod(period=callback).pack())
 
-    builder.button(text="🔙 Назад", callback_data="back_to_menu")
+    builder.button(text="🔙 Назад", callback_data=BackToMenu().pack())
     builder.adjust(2, 2, 1)
     return builder.as_markup()
 
 
-def get_edit_habit_keyboard(habit_id: int) -> InlineKeyboardMarkup:
+def _build_edit_habit_keyboard(habit_id: int, page: int = 0) -> InlineKeyboardMarkup:
     """Выбор поля для редактирования привычки"""
     builder = InlineKeyboardBuilder()
 
@@ -175,24 +252,96 @@ def get_edit_habit_keyboard(habit_id: int) -> InlineKeyboardMarkup:
     ]
 
     for text, field in fields:
-        builder.button(text=text, callback_data=f"edit_field_{field}")
+        builder.button(text=text, callback_data=EditField(habit_id=habit_id, field=field).pack())
 
     # Кнопка возврата к привычке с передачей habit_id
-    builder.button(text="🔙 Назад к привычке", callback_data=f"back_to_habit_{habit_id}")
+    builder.button(text="🔙 Назад к привычке", callback_data=BackToHabit(habit_id=habit_id, page=page).pack())
     builder.adjust(2, 2, 1)
     return builder.as_markup()
 
 
-def get_emoji_selection_keyboard(habit_id: int) -> InlineKeyboardMarkup:
+def _build_emoji_selection_keyboard(habit_id: int) -> InlineKeyboardMarkup:
     """Выбор эмодзи для привычки"""
     builder = InlineKeyboardBuilder()
 
-    emojis = ["🎯", "💪", "🏃", "📚", "💧", "🥗", "😴", "🧘", "🎨", "🎸", "✍️", "🧹", "💰", "🌱", "🌟"]
-
-    for emoji in emojis:
-        builder.button(text=emoji, callback_data=f"emoji_{emoji}")
+    for emoji in HABIT_EMOJIS:
+        builder.button(text=emoji, callback_data=PickEmoji(habit_id=habit_id, emoji=emoji).pack())
 
     # Кнопка возврата к редактированию с передачей habit_id
-    builder.button(text="🔙 Назад", callback_data=f"back_to_edit_{habit_id}")
+    builder.button(text="🔙 Назад", callback_data=BackToEdit(habit_id=habit_id).pack())
     builder.adjust(5, 5, 5, 1)
-    return builder.as_markup()
\ No newline at end of file
+    return builder.as_markup()
+
+
+# ---------- Готовые клавиатуры ----------
+# Статические клавиатуры собираются один раз при импорте, а зависящие от
+# habit_id кэшируются с вытеснением. Разметка общая для всех вызовов,
+# поэтому менять возвращенные объекты нельзя.
+_MAIN_MENU = _build_main_menu()
+_CANCEL_KEYBOARD = _build_cancel_keyboard()
+_CONFIRM_KEYBOARD = _build_confirm_keyboard()
+_BACK_KEYBOARD = _build_back_keyboard()
+_TIME_SELECTION_KEYBOARD = _build_time_selection_keyboard()
+_FREQUENCY_KEYBOARD = _build_frequency_keyboard()
+_STATS_PERIOD_KEYBOARD = _build_stats_period_keyboard()
+
+
+def get_main_menu() -> ReplyKeyboardMarkup:
+    """Главное меню бота"""
+    return _MAIN_MENU
+
+
+def get_cancel_keyboard() -> ReplyKeyboardMarkup:
+    """Клавиатура с кнопкой отмены"""
+    return _CANCEL_KEYBOARD
+
+
+def get_confirm_keyboard() -> ReplyKeyboardMarkup:
+    """Клавиатура подтверждения"""
+    return _CONFIRM_KEYBOARD
+
+
+def get_back_keyboard() -> ReplyKeyboardMarkup:
+    """Клавиатура с кнопкой назад"""
+    return _BACK_KEYBOARD
+
+
+def get_time_selection_keyboard() -> ReplyKeyboardMarkup:
+    """Выбор времени напоминания"""
+    return _TIME_SELECTION_KEYBOARD
+
+
+def get_frequency_keyboard() -> ReplyKeyboardMarkup:
+    """Выбор частоты выполнения"""
+    return _FREQUENCY_KEYBOARD
+
+
+def get_stats_period_keyboard() -> InlineKeyboardMarkup:
+    """Выбор периода для статистики"""
+    return _STATS_PERIOD_KEYBOARD
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def get_habit_actions_keyboard(habit_id: int, page: int = 0) -> InlineKeyboardMarkup:
+    """Действия с конкретной привычкой"""
+    return _build_habit_actions_keyboard(habit_id, page)
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def get_edit_habit_keyboard(habit_id: int, page: int = 0) -> InlineKeyboardMarkup:
+    """Выбор поля для редактирования привычки"""
+    return _build_edit_habit_keyboard(habit_id, page)
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def get_emoji_selection_keyboard(habit_id: int) -> InlineKeyboardMarkup:
+    """Выбор эмодзи для привычки"""
+    return _build_emoji_selection_keyboard(habit_id)
+
+
+def get_keyboard_cache_stats() -> Dict[str, Any]:
+    """Счетчики кэша клавиатур, зависящих от habit_id"""
+    return {
+        func.__name__: func.cache_info()._asdict()
+        for func in (get_habit_actions_keyboard, get_edit_habit_keyboard, get_emoji_selection_keyboard)
+    }
@@ -0,0 +1,169 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from config import ANTIFLOOD_BURST, ANTIFLOOD_MAX_USERS, ANTIFLOOD_RATE, ANTIFLOOD_WINDOW
+from services.fanout import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Причины, по которым апдейт не дошел до хэндлера
+IN_FLIGHT = "in_flight"
+COALESCED = "coalesced"
+RATE_LIMITED = "rate_limited"
+
+
+class Antiflood:
+    """Состояние антифлуда процесса: нажатия в обработке, недавние нажатия и лимиты пользователей.
+
+    Повтор нажатия (тот же пользователь, сообщение и callback_data), пока
+    первое еще обрабатывается или в течение window секунд после него,
+    отбрасывается. Склеивается только повтор последнего нажатия на
+    сообщении: "вперед", "назад", "вперед" — три разных шага. Каждый
+    апдейт пользователя тратит токен из его bucket: rate в секунду,
+    не больше burst подряд. Об отказе по лимиту пользователь узнает один
+    раз, пока лимит не отпустит.
+    """
+
+    def __init__(self, window: float = ANTIFLOOD_WINDOW, rate: float = ANTIFLOOD_RATE,
+                 burst: float = ANTIFLOOD_BURST, max_users: int = ANTIFLOOD_MAX_USERS):
+        self.window = window
+        self.rate = rate
+        self.burst = burst
+        self.max_users = max_users
+        self._in_flight: Set[Tuple[Hashable, Optional[str]]] = set()
+        # Сообщение -> (последняя callback_data, время окончания обработки), по возрастанию времени
+        self._recent: "OrderedDict[Hashable, Tuple[Optional[str], float]]" = OrderedDict()
+        self._buckets: Dict[int, TokenBucket] = {}
+        # Пользователи, которым уже сказали про лимит в текущем отказе
+        self._warned: Set[int] = set()
+        self.dropped: Dict[str, int] = {IN_FLIGHT: 0, COALESCED: 0, RATE_LIMITED: 0}
+
+    def _bucket(self, user_id: int) -> TokenBucket:
+        bucket = self._buckets.get(user_id)
+        if bucket is not None:
+            return bucket
+        # Полный bucket ничем не отличается от нового, такие можно выбросить
+        if len(self._buckets) >= self.max_users:
+            now = time.monotonic()
+            for key in [key for key, item in self._buckets.items() if item.is_idle(now)]:
+                del self._buckets[key]
+                self._warned.discard(key)
+        bucket = self._buckets[user_id] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    def allow(self, user_id: int) -> bool:
+        """Есть ли у пользователя токен на еще один апдейт"""
+        if self._bucket(user_id).try_acquire():
+            self._warned.discard(user_id)
+            return True
+        self.dropped[RATE_LIMITED] += 1
+        return False
+
+    def should_warn(self, user_id: int) -> bool:
+        """Первый отказ по лимиту подряд: только на него пользователю отвечают"""
+        if user_id in self._warned:
+            return False
+        self._warned.add(user_id)
+        return True
+
+    def begin(self, message: Hashable, data: Optional[str]) -> Optional[str]:
+        """Начать обработку нажатия; причина отказа, если это дубль"""
+        if (message, data) in self._in_flight:
+            self.dropped[IN_FLIGHT] += 1
+            return IN_FLIGHT
+
+        now = time.monotonic()
+        recent = self._recent
+        while recent:
+            oldest, (_, finished) = next(iter(recent.items()))
+            if now - finished < self.window:
+                break
+            del recent[oldest]
+        last = recent.get(message)
+        if last is not None and last[0] == data:
+            self.dropped[COALESCED] += 1
+            return COALESCED
+
+        self._in_flight.add((message, data))
+        return None
+
+    def cancel(self, message: Hashable, data: Optional[str]):
+        """Снять нажатие, которое не дошло до хэндлера: повтор не склеивается с ним"""
+        self._in_flight.discard((message, data))
+
+    def finish(self, message: Hashable, data: Optional[str]):
+        self._in_flight.discard((message, data))
+        self._recent.pop(message, None)
+        self._recent[message] = (data, time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики для /metrics"""
+        return {"dropped": dict(self.dropped), "users": len(self._buckets), "in_flight": len(self._in_flight)}
+
+
+def _message_key(callback: CallbackQuery) -> Hashable:
+    message = callback.message
+    if message is not None:
+        return callback.from_user.id, message.chat.id, message.message_id
+    return callback.from_user.id, callback.inline_message_id
+
+
+class AntifloodMiddleware(BaseMiddleware):
+    """Внешний middleware на message и callback_query: дубли нажатий и лимит на пользователя"""
+
+    def __init__(self, antiflood: Antiflood):
+        self.antiflood = antiflood
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        user = getattr(event, "from_user", None)
+        if user is None:
+            return await handler(event, data)
+
+        if not isinstance(event, CallbackQuery):
+            if self.antiflood.allow(user.id):
+                return await handler(event, data)
+            # Сообщение не обработано, в том числе ввод в диалоге: один раз просим повторить
+            if isinstance(event, Message) and self.antiflood.should_warn(user.id):
+                try:
+                    await event.answer("⏳ Слишком много сообщений. Подождите немного и отправьте последнее еще раз")
+                except TelegramAPIError as e:
+                    logger.warning(f"Could not answer dropped message: {e}")
+            return None
+
+        message = _message_key(event)
+        if self.antiflood.begin(message, event.data) is not None:
+            # Дубль: первое нажатие уже ответит пользователю, здесь только убираем "часики"
+            await self._answer(event)
+            return None
+        # Дубли отсеиваются до лимита, чтобы не тратить на них токены
+        if not self.antiflood.allow(user.id):
+            self.antiflood.cancel(message, event.data)
+            await self._answer(event, "⏳ Слишком много нажатий, подождите немного")
+            return None
+        try:
+            return await handler(event, data)
+        finally:
+            self.antiflood.finish(message, event.data)
+
+    async def _answer(self, callback: CallbackQuery, text: Optional[str] = None):
+        try:
+            await callback.answer(text)
+        except TelegramAPIError as e:
+            logger.warning(f"Could not answer dropped callback: {e}")
+
+
+def setup_antiflood(dp: Dispatcher, instance: Optional[Antiflood] = None):
+    """Подключить антифлуд к сообщениям и нажатиям"""
+    middleware = AntifloodMiddleware(instance or antiflood)
+    dp.message.outer_middleware(middleware)
+    dp.callback_query.outer_middleware(middleware)
+
+
+antiflood = Antiflood()
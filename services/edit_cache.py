@@ -0,0 +1,123 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import DeleteMessage, EditMessageReplyMarkup, EditMessageText, SendMessage
+from aiogram.types import InlineKeyboardMarkup
+
+from config import EDIT_CACHE_SIZE
+
+NO_MARKUP = 0
+
+# Текст и клавиатура сообщения; None — текст неизвестен (меняли только клавиатуру)
+_Rendered = Tuple[Optional[int], int]
+
+
+def _text_key(method: Any) -> int:
+    return hash((method.text, repr(method.parse_mode), repr(method.entities), repr(method.disable_web_page_preview)))
+
+
+def _markup_key(markup: Any) -> int:
+    if not isinstance(markup, InlineKeyboardMarkup):
+        return NO_MARKUP
+    return hash(markup.model_dump_json(exclude_none=True))
+
+
+def _is_not_modified(error: TelegramBadRequest) -> bool:
+    return "message is not modified" in error.message
+
+
+class EditCache:
+    """Последний отправленный текст и клавиатура сообщений бота.
+
+    Ключ — (chat_id, message_id), значение — хэши содержимого. Правка,
+    которая совпадает с тем, что уже показано, в Telegram не уходит:
+    он все равно ответил бы "message is not modified". Старые записи
+    вытесняются по LRU.
+    """
+
+    def __init__(self, size: int = EDIT_CACHE_SIZE):
+        self.size = size
+        self._rendered: "OrderedDict[Tuple[int, int], _Rendered]" = OrderedDict()
+        self.skipped: Dict[str, int] = {}
+        self.not_modified: Dict[str, int] = {}
+        self.evicted = 0
+
+    def get(self, key: Tuple[int, int]) -> Optional[_Rendered]:
+        rendered = self._rendered.get(key)
+        if rendered is not None:
+            self._rendered.move_to_end(key)
+        return rendered
+
+    def put(self, key: Tuple[int, int], rendered: _Rendered):
+        self._rendered[key] = rendered
+        self._rendered.move_to_end(key)
+        if len(self._rendered) > self.size:
+            self._rendered.popitem(last=False)
+            self.evicted += 1
+
+    def forget(self, key: Tuple[int, int]):
+        self._rendered.pop(key, None)
+
+    def count(self, counters: Dict[str, int], method: str):
+        counters[method] = counters.get(method, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики для /metrics"""
+        return {
+            "size": len(self._rendered),
+            "evicted": self.evicted,
+            "skipped": dict(self.skipped),
+            "not_modified": dict(self.not_modified),
+        }
+
+
+class EditCacheMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: не отправлять правки, которые ничего не меняют"""
+
+    def __init__(self, cache: EditCache):
+        self.cache = cache
+
+    async def __call__(self, make_request, bot, method):
+        if isinstance(method, (EditMessageText, EditMessageReplyMarkup)) and method.inline_message_id is None:
+            return await self._edit(make_request, bot, method)
+
+        result = await make_request(bot, method)
+        if isinstance(method, SendMessage) and isinstance(method.reply_markup, InlineKeyboardMarkup):
+            # Правки приходят только по инлайн-кнопкам, остальные сообщения не запоминаем
+            self.cache.put((result.chat.id, result.message_id),
+                           (_text_key(method), _markup_key(method.reply_markup)))
+        elif isinstance(method, DeleteMessage):
+            self.cache.forget((method.chat_id, method.message_id))
+        return result
+
+    async def _edit(self, make_request, bot, method):
+        key = (method.chat_id, method.message_id)
+        name = type(method).__name__
+        markup = _markup_key(method.reply_markup)
+        shown = self.cache.get(key)
+        if isinstance(method, EditMessageText):
+            rendered = (_text_key(method), markup)
+            unchanged = shown == rendered
+        else:
+            rendered = (shown[0] if shown is not None else None, markup)
+            unchanged = shown is not None and shown[1] == markup
+
+        if unchanged:
+            # Вместо ошибки "message is not modified" — успех; хэндлеры результат правки не читают
+            self.cache.count(self.cache.skipped, name)
+            return True
+
+        try:
+            result = await make_request(bot, method)
+        except TelegramBadRequest as e:
+            if _is_not_modified(e):
+                self.cache.count(self.cache.not_modified, name)
+                self.cache.put(key, rendered)
+            raise
+        self.cache.put(key, rendered)
+        return result
+
+
+edit_cache = EditCache()
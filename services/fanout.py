@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, Dict, Iterable, Optional, Union
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+
+from config import (
+    FANOUT_GLOBAL_RATE, FANOUT_PER_CHAT_RATE, FANOUT_CONCURRENCY,
+    FANOUT_QUEUE_SIZE, FANOUT_MAX_RETRIES
+)
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы задержек рассылки, секунды
+LAG_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+
+class TokenBucket:
+    """Классический token bucket: rate токенов в секунду, не больше capacity в запасе"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def is_idle(self, now: float) -> bool:
+        """Bucket полон и никем не занят — его можно выбросить и создать заново"""
+        if self._lock.locked():
+            return False
+        self._refill(now)
+        return self._tokens >= self.capacity
+
+    def try_acquire(self) -> bool:
+        """Взять токен без ожидания; False, если токенов нет"""
+        if self._lock.locked():
+            return False
+        self._refill(time.monotonic())
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                self._refill(time.monotonic())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class OutgoingMessage:
+    chat_id: int
+    text: str
+    reply_markup: Any = None
+    parse_mode: Optional[str] = "HTML"
+    attempts: int = 0
+
+
+class FanoutDispatcher:
+    """Массовая рассылка с ограничением скорости.
+
+    Сообщения идут через ограниченную очередь и пул воркеров. Каждая
+    отправка ждет токен в bucket своего чата и в глобальном bucket.
+    На TelegramRetryAfter все воркеры ставятся на паузу, а сообщение
+    возвращается в очередь.
+    """
+
+    def __init__(self, global_rate: float = FANOUT_GLOBAL_RATE,
+                 per_chat_rate: float = FANOUT_PER_CHAT_RATE,
+                 concurrency: int = FANOUT_CONCURRENCY,
+                 queue_size: int = FANOUT_QUEUE_SIZE,
+                 max_retries: int = FANOUT_MAX_RETRIES):
+        self.global_rate = global_rate
+        self.per_chat_rate = per_chat_rate
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self._global_bucket = TokenBucket(global_rate)
+        self._paused_until = 0.0
+        self.reports: Dict[str, Dict[str, Any]] = {}
+
+    async def _wait_pause(self):
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _chat_bucket(self, chat_buckets: Dict[int, TokenBucket], chat_id: int) -> TokenBucket:
+        bucket = chat_buckets.get(chat_id)
+        if bucket is not None:
+            return bucket
+        # На длинной рассылке почти все чаты получают по одному сообщению:
+        # полные bucket ничем не отличаются от новых, их можно не хранить
+        if len(chat_buckets) >= self.queue_size + self.concurrency:
+            now = time.monotonic()
+            for key in [key for key, item in chat_buckets.items() if item.is_idle(now)]:
+                del chat_buckets[key]
+        bucket = chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, 1)
+        return bucket
+
+    async def _worker(self, bot, queue: asyncio.Queue, chat_buckets: Dict[int, TokenBucket],
+                      report: Dict[str, Any], lags, started: float):
+        while True:
+            message = await queue.get()
+            try:
+                if message is None:
+                    return
+                bucket = self._chat_bucket(chat_buckets, message.chat_id)
+                await bucket.acquire()
+                await self._wait_pause()
+                await self._global_bucket.acquire()
+
+                try:
+                    await bot.send_message(
+                        message.chat_id,
+                        message.text,
+                        parse_mode=message.parse_mode,
+                        reply_markup=message.reply_markup
+                    )
+                    report["sent"] += 1
+                    lag = time.monotonic() - started
+                    lags.observe(lag)
+                    report["lag_max"] = max(report["lag_max"], lag)
+                except TelegramRetryAfter as e:
+                    report["retry_after"] += 1
+                    self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+                    message.attempts += 1
+                    if message.attempts <= self.max_retries:
+                        queue.put_nowait(message)
+                    else:
+                        report["failed"] += 1
+                except (TelegramForbiddenError, TelegramBadRequest):
+                    # Пользователь заблокировал бота или чат недоступен — повтор бесполезен
+                    report["dropped"] += 1
+                except Exception as e:
+                    logger.error(f"Error sending message to {message.chat_id}: {e}")
+                    report["failed"] += 1
+            finally:
+                queue.task_done()
+
+    async def _enqueue(self, queue: asyncio.Queue, message: OutgoingMessage, report: Dict[str, Any]):
+        while queue.qsize() >= self.queue_size:
+            await asyncio.sleep(0.01)
+        queue.put_nowait(message)
+        report["queued"] += 1
+
+    async def dispatch(self, bot, slot: str,
+                       messages: Union[Iterable[OutgoingMessage], AsyncIterable[OutgoingMessage]]) -> Dict[str, Any]:
+        """Разослать сообщения слота и вернуть отчет о скорости и задержках.
+
+        messages может быть и асинхронным генератором: следующее сообщение
+        берется из него, только когда в очереди есть место.
+        """
+        from services.metrics import Histogram
+
+        started = time.monotonic()
+        report: Dict[str, Any] = {
+            "slot": slot, "queued": 0, "sent": 0, "failed": 0, "dropped": 0, "retry_after": 0,
+            "lag_max": 0.0,
+        }
+        # Задержки копятся в корзинах, а не списком: память не растет с размером рассылки
+        lags = Histogram(LAG_BUCKETS)
+        chat_buckets: Dict[int, TokenBucket] = {}
+        # Запас под повторы после RetryAfter, чтобы воркер не блокировался на put
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size + self.concurrency)
+
+        workers = [
+            asyncio.create_task(self._worker(bot, queue, chat_buckets, report, lags, started))
+            for _ in range(self.concurrency)
+        ]
+        try:
+            if hasattr(messages, "__aiter__"):
+                async for message in messages:
+                    await self._enqueue(queue, message, report)
+            else:
+                for message in messages:
+                    await self._enqueue(queue, message, report)
+            await queue.join()
+        except BaseException:
+            # Рассылка прервана: воркеры могут ждать отправки, а очередь — быть полной
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers, return_exceptions=True)
+
+        duration = time.monotonic() - started
+        lag_max = report["lag_max"]
+        lag_p95 = lags.quantile(0.95) if lags.count else 0.0
+        report.update(
+            duration=round(duration, 3),
+            throughput=round(report["sent"] / duration, 2) if duration > 0 else 0.0,
+            lag_avg=round(lags.sum / lags.count, 3) if lags.count else 0.0,
+            lag_p95=round(lag_max if lag_p95 is None else min(lag_p95, lag_max), 3),
+            lag_max=round(lag_max, 3),
+        )
+        self.reports[slot] = report
+        logger.info(
+            f"Fan-out {slot}: sent {report['sent']}/{report['queued']} in {report['duration']}s "
+            f"({report['throughput']} msg/s, lag max {report['lag_max']}s)"
+        )
+        return report
+
+
+dispatcher = FanoutDispatcher()
@@ -0,0 +1,302 @@
+import time
+import weakref
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.types import TelegramObject, Update
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from database.repository import repo
+from keyboards.keyboards import get_keyboard_cache_stats
+from services.antiflood import antiflood
+from services.edit_cache import edit_cache
+from utils.habit_card import get_card_cache_stats
+
+# Границы корзин гистограммы задержек, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Время запросов вне обработки апдейтов (напоминания, рассылки)
+BACKGROUND = "background"
+UNHANDLED = "unhandled"
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами в формате Prometheus"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Верхняя граница корзины, в которую попадает квантиль q; None — за последней границей"""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+
+class _UpdateTimings:
+    """Время одного апдейта, накапливается через contextvar.
+
+    Задачи, запущенные из хэндлера, наследуют его контекст; после
+    записи апдейта (finished) их запросы считаются фоновыми.
+    """
+
+    __slots__ = ("handler", "db_seconds", "db_queries", "api_seconds", "api_calls", "finished")
+
+    def __init__(self):
+        self.handler = UNHANDLED
+        self.db_seconds = 0.0
+        self.db_queries = 0
+        self.api_seconds = 0.0
+        self.api_calls = 0
+        self.finished = False
+
+
+_current: ContextVar[Optional[_UpdateTimings]] = ContextVar("update_timings", default=None)
+
+
+class MetricsRegistry:
+    """Счетчики обработки апдейтов в памяти процесса"""
+
+    def __init__(self):
+        self.latency: Dict[str, Histogram] = {}
+        self.db_seconds: Dict[str, float] = {}
+        self.db_queries: Dict[str, int] = {}
+        self.api_seconds: Dict[str, float] = {}
+        self.api_calls: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.updates: Dict[str, int] = {}
+        self.api_methods: Dict[str, Histogram] = {}
+        self.in_flight = 0
+
+    def record_update(self, update_type: str, timings: _UpdateTimings, elapsed: float, failed: bool):
+        handler = timings.handler
+        histogram = self.latency.get(handler)
+        if histogram is None:
+            histogram = self.latency[handler] = Histogram()
+        histogram.observe(elapsed)
+        self.updates[update_type] = self.updates.get(update_type, 0) + 1
+        self._add_db(handler, timings.db_seconds, timings.db_queries)
+        self._add_api(handler, timings.api_seconds, timings.api_calls)
+        if failed:
+            self.errors[handler] = self.errors.get(handler, 0) + 1
+
+    def _add_db(self, handler: str, seconds: float, queries: int):
+        if queries:
+            self.db_seconds[handler] = self.db_seconds.get(handler, 0.0) + seconds
+            self.db_queries[handler] = self.db_queries.get(handler, 0) + queries
+
+    def _add_api(self, handler: str, seconds: float, calls: int):
+        if calls:
+            self.api_seconds[handler] = self.api_seconds.get(handler, 0.0) + seconds
+            self.api_calls[handler] = self.api_calls.get(handler, 0) + calls
+
+    def record_query(self, seconds: float):
+        timings = _current.get()
+        if timings is not None and not timings.finished:
+            timings.db_seconds += seconds
+            timings.db_queries += 1
+        else:
+            self._add_db(BACKGROUND, seconds, 1)
+
+    def record_api_call(self, method: str, seconds: float):
+        histogram = self.api_methods.get(method)
+        if histogram is None:
+            histogram = self.api_methods[method] = Histogram()
+        histogram.observe(seconds)
+
+        timings = _current.get()
+        if timings is not None and not timings.finished:
+            timings.api_seconds += seconds
+            timings.api_calls += 1
+        else:
+            self._add_api(BACKGROUND, seconds, 1)
+
+    def render(self) -> str:
+        """Текст в формате Prometheus exposition 0.0.4"""
+        lines: List[str] = []
+
+        def counter(name: str, help_text: str, values: Dict[str, Any], label: str = "handler", kind: str = "counter"):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in sorted(values.items()):
+                lines.append(f'{name}{{{label}="{key}"}} {value}')
+
+        def single(name: str, help_text: str, number: Any, kind: str = "counter"):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {number}")
+
+        def histogram(name: str, help_text: str, values: Dict[str, Histogram], label: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, item in sorted(values.items()):
+                cumulative = 0
+                for bound, count in zip(item.buckets, item.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{label}="{key}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{label}="{key}",le="+Inf"}} {item.count}')
+                lines.append(f'{name}_sum{{{label}="{key}"}} {item.sum:.6f}')
+                lines.append(f'{name}_count{{{label}="{key}"}} {item.count}')
+
+        histogram("bot_handler_duration_seconds", "Update processing time by handler", self.latency, "handler")
+        counter("bot_handler_db_seconds_total", "Time spent in database queries", self.db_seconds)
+        counter("bot_handler_db_queries_total", "Database queries executed", self.db_queries)
+        counter("bot_handler_api_seconds_total", "Time spent in Telegram Bot API calls", self.api_seconds)
+        counter("bot_handler_api_calls_total", "Telegram Bot API calls made", self.api_calls)
+        counter("bot_handler_errors_total", "Updates that ended with an exception", self.errors)
+        counter("bot_updates_total", "Updates received by type", self.updates, label="type")
+        histogram("bot_api_request_duration_seconds", "Telegram Bot API call time by method", self.api_methods, "method")
+        edits = edit_cache.stats()
+        counter("bot_edits_skipped_total", "Message edits not sent because nothing changed", edits["skipped"],
+                label="method")
+        counter("bot_edits_not_modified_total", "Message edits rejected by Telegram as not modified",
+                edits["not_modified"], label="method")
+        single("bot_edit_cache_messages", "Messages whose last content is remembered", edits["size"], kind="gauge")
+        single("bot_edit_cache_evictions_total", "Messages dropped from the edit cache", edits["evicted"])
+        flood = antiflood.stats()
+        counter("bot_antiflood_dropped_total", "Updates dropped before handlers by reason", flood["dropped"],
+                label="reason")
+        single("bot_antiflood_users", "Users with a rate limit bucket", flood["users"], kind="gauge")
+
+        habits = repo.get_cache_stats()
+        counter("bot_habit_cache_requests_total", "Habit cache lookups by result",
+                {"hit": habits["hits"], "miss": habits["misses"]}, label="result")
+        single("bot_habit_cache_evictions_total", "Users dropped from the habit cache", habits["evictions"])
+        single("bot_habit_cache_invalidations_total", "Habit cache resets after writes", habits["invalidations"])
+        single("bot_habit_cache_stale_fills_total", "Database reads not cached because of a concurrent write",
+               habits["stale_fills"])
+        single("bot_habit_cache_users", "Users with cached habits", habits["users"], kind="gauge")
+        keyboards = get_keyboard_cache_stats()
+        counter("bot_keyboard_cache_hits_total", "Habit keyboards served from cache",
+                {name: info["hits"] for name, info in keyboards.items()}, label="keyboard")
+        counter("bot_keyboard_cache_misses_total", "Habit keyboards built",
+                {name: info["misses"] for name, info in keyboards.items()}, label="keyboard")
+        cards = get_card_cache_stats()
+        counter("bot_card_cache_requests_total", "Habit card renders by result",
+                {"hit": cards["hits"], "miss": cards["misses"]}, label="result")
+        single("bot_card_cache_cards", "Rendered habit cards kept", cards["size"], kind="gauge")
+        completions = repo.completion_buffer.stats()
+        single("bot_completions_submitted_total", "Habit completions accepted", completions["submitted"])
+        single("bot_completions_written_total", "Habit completions written to the database", completions["written"])
+        single("bot_completion_batches_total", "Completion batches written", completions["batches"])
+        single("bot_completion_flush_failures_total", "Completion batches that failed", completions["failures"])
+        single("bot_completions_dropped_total", "Completions dropped after repeated write failures",
+               completions["dropped"])
+        single("bot_completions_pending", "Completions waiting to be written", completions["pending"], kind="gauge")
+
+        single("bot_updates_in_flight", "Updates being processed right now", self.in_flight, kind="gauge")
+        return "\n".join(lines) + "\n"
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Внешний middleware на update: время, ошибки и число апдейтов в обработке"""
+
+    def __init__(self, registry: "MetricsRegistry"):
+        self.registry = registry
+        self._sessions = weakref.WeakSet()
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: Update, data: Dict[str, Any]) -> Any:
+        bot = data.get("bot")
+        if bot is not None and bot.session not in self._sessions:
+            # Время Bot API меряется в middleware сессии бота, ставим его один раз
+            self._sessions.add(bot.session)
+            bot.session.middleware(ApiMetricsMiddleware(self.registry))
+
+        timings = _UpdateTimings()
+        token = _current.set(timings)
+        self.registry.in_flight += 1
+        started = time.perf_counter()
+        failed = False
+        try:
+            return await handler(event, data)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.registry.in_flight -= 1
+            self.registry.record_update(event.event_type, timings, time.perf_counter() - started, failed)
+            timings.finished = True
+            _current.reset(token)
+
+
+class HandlerNameMiddleware(BaseMiddleware):
+    """Внутренний middleware: запоминает, какой хэндлер сработал"""
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        timings = _current.get()
+        handler_object = data.get("handler")
+        if timings is not None and handler_object is not None:
+            timings.handler = getattr(handler_object.callback, "__name__", UNHANDLED)
+        return await handler(event, data)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: время каждого вызова Bot API"""
+
+    def __init__(self, registry: "MetricsRegistry"):
+        self.registry = registry
+
+    async def __call__(self, make_request, bot, method):
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        finally:
+            self.registry.record_api_call(type(method).__name__, time.perf_counter() - started)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    metrics.record_query(time.perf_counter() - conn.info["query_started"].pop())
+
+
+def _handle_error(exception_context):
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        metrics.record_query(time.perf_counter() - started.pop())
+
+
+def instrument_engine(engine: AsyncEngine):
+    """Мерить время SQL-запросов через события движка"""
+    sync_engine = engine.sync_engine
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+def setup_metrics(dp: Dispatcher, engine: Optional[AsyncEngine] = None):
+    """Подключить сбор метрик к диспетчеру и, если передан, к движку БД"""
+    dp.update.outer_middleware(UpdateMetricsMiddleware(metrics))
+    # Внутренние middleware корневого роутера действуют и во вложенных роутерах
+    for name, observer in dp.observers.items():
+        if name not in ("update", "error"):
+            observer.middleware(HandlerNameMiddleware())
+    if engine is not None:
+        instrument_engine(engine)
+
+
+metrics = MetricsRegistry()
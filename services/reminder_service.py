@@ -1,18 +1,422 @@
 import asyncio
-from database.database import db
-from keyboards.keyboards import get_daily_check_keybord, get_negative_check_keyboard
+import contextvars
+import logging
+import re
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from html import escape
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
+
+from config import ACTIVE_HOURS_FROM, ACTIVE_HOURS_TO, DIGEST_TIME
+from keyboards.keyboards import get_habit_actions_keyboard, get_habits_keyboard
+from services.fanout import OutgoingMessage, dispatcher
+from utils.timezones import DEFAULT_TIMEZONE, utc_offset_minutes
+
+logger = logging.getLogger(__name__)
 
 bot = None
 
+DIGEST_JOB_ID = "daily_digest"
+TICK_JOB_ID = "reminder_tick"
+MINUTES_PER_DAY = 24 * 60
+# Сколько пропущенных минут догоняет опоздавший тик; более старые пропускаются
+MAX_CATCH_UP_MINUTES = 5
+
+# Значение reminder_time для ежечасных напоминаний (кнопка клавиатуры выбора времени)
+HOURLY = "⏰ Каждый час"
+DEFAULT_ACTIVE_HOURS = (ACTIVE_HOURS_FROM, ACTIVE_HOURS_TO)
+
+TIME_PATTERN = re.compile(r"^([01]\d|2[0-3]):([0-5]\d)$")
+
+
 def set_bot(bot_instance):
     global bot
     bot = bot_instance
 
-asyns def schedule_reminders(user_id: int, habit: str, habit_type: str):
 
-    if habit_type == "negative":
-        # Утреннее напоминание
-        asyncio.create_task(send_morning_reminder(user_id, habit))
+class ReminderEngine:
+    """Индекс напоминаний по минутам суток UTC.
+
+    Время напоминания задается в часовом поясе пользователя, а в
+    индексе привычка лежит в ячейке минуты UTC, в которую это время
+    наступает при текущем смещении пояса. Одна задача APScheduler
+    срабатывает раз в минуту и берет готовые множества своей минуты —
+    без задач на каждую привычку и без перебора всех привычек.
+
+    Ежечасная привычка лежит в ячейках начала каждого часа из окна
+    активных часов владельца. На каждом тике смещения используемых
+    поясов сверяются с текущими; при переходе на летнее или зимнее
+    время переиндексируются только привычки пользователей этого пояса.
+    """
+
+    def __init__(self, timezone: str = "UTC"):
+        self.scheduler = AsyncIOScheduler(timezone=timezone)
+        self._slots: Dict[int, Set[int]] = {}  # минута UTC -> привычки с фиксированным временем
+        self._hourly: Dict[int, Set[int]] = {}  # минута UTC -> ежечасные привычки
+        self._habits: Dict[int, Tuple[int, Optional[int]]] = {}  # habit_id -> (user_id, местная минута или None)
+        self._user_habits: Dict[int, Set[int]] = {}
+        self._active_hours: Dict[int, Tuple[int, int]] = {}
+        self._timezones: Dict[int, str] = {}  # только пользователи не в UTC
+        self._zone_users: Dict[str, Set[int]] = {}
+        self._offsets: Dict[str, int] = {}  # пояс -> текущее смещение, минуты
+        self._tasks: Set[asyncio.Task] = set()
+        self._last_minute: Optional[datetime] = None  # последняя обработанная минута
+
+    @staticmethod
+    def parse_slot(reminder_time: Optional[str]) -> Optional[str]:
+        """Вернуть слот "HH:MM" или None для значений без конкретного времени"""
+        if reminder_time and TIME_PATTERN.match(reminder_time.strip()):
+            return reminder_time.strip()
+        return None
+
+    @staticmethod
+    def window(start: int, end: int) -> List[int]:
+        """Часы окна включительно; окно может переходить через полночь"""
+        return [hour % 24 for hour in range(start, start + (end - start) % 24 + 1)]
+
+    def _offset(self, user_id: int) -> int:
+        zone = self._timezones.get(user_id)
+        if zone is None:
+            return 0
+        offset = self._offsets.get(zone)
+        if offset is None:
+            offset = self._offsets[zone] = utc_offset_minutes(zone, datetime.now(timezone.utc))
+        return offset
+
+    def _minutes(self, habit_id: int) -> Tuple[Dict[int, Set[int]], List[int]]:
+        """Индекс и минуты UTC, в которых лежит привычка"""
+        user_id, local = self._habits[habit_id]
+        offset = self._offset(user_id)
+        if local is None:
+            hours = self.window(*self._active_hours.get(user_id, DEFAULT_ACTIVE_HOURS))
+            return self._hourly, [(hour * 60 - offset) % MINUTES_PER_DAY for hour in hours]
+        return self._slots, [(local - offset) % MINUTES_PER_DAY]
+
+    def _index(self, habit_id: int):
+        index, minutes = self._minutes(habit_id)
+        for minute in minutes:
+            index.setdefault(minute, set()).add(habit_id)
+
+    def _unindex(self, habit_id: int):
+        index, minutes = self._minutes(habit_id)
+        for minute in minutes:
+            habits = index[minute]
+            habits.discard(habit_id)
+            if not habits:
+                del index[minute]
+
+    def add(self, habit_id: int, reminder_time: Optional[str], user_id: Optional[int] = None):
+        self.remove(habit_id)
+        if reminder_time == HOURLY and user_id is not None:
+            local = None
+        else:
+            slot = self.parse_slot(reminder_time)
+            if slot is None:
+                return
+            hour, minute = slot.split(":")
+            local = int(hour) * 60 + int(minute)
+
+        self._habits[habit_id] = (user_id, local)
+        self._user_habits.setdefault(user_id, set()).add(habit_id)
+        self._index(habit_id)
+
+    def remove(self, habit_id: int):
+        if habit_id not in self._habits:
+            return
+        self._unindex(habit_id)
+        user_id, _ = self._habits.pop(habit_id)
+        habits = self._user_habits[user_id]
+        habits.discard(habit_id)
+        if not habits:
+            del self._user_habits[user_id]
+
+    @contextmanager
+    def _reindexing(self, habit_ids: Iterable[int]):
+        """Вынуть привычки из индекса на время смены настроек и положить обратно"""
+        habit_ids = list(habit_ids)
+        for habit_id in habit_ids:
+            self._unindex(habit_id)
+        yield
+        for habit_id in habit_ids:
+            self._index(habit_id)
+
+    def set_active_hours(self, user_id: int, start: int, end: int):
+        """Сменить окно пользователя и переложить его ежечасные привычки"""
+        with self._reindexing(self._user_habits.get(user_id, ())):
+            self._active_hours[user_id] = (start, end)
+
+    def set_timezone(self, user_id: int, zone: str):
+        """Сменить пояс пользователя и переложить все его напоминания"""
+        with self._reindexing(self._user_habits.get(user_id, ())):
+            previous = self._timezones.pop(user_id, None)
+            if previous is not None:
+                users = self._zone_users[previous]
+                users.discard(user_id)
+                if not users:
+                    del self._zone_users[previous]
+                    self._offsets.pop(previous, None)
+            if zone != DEFAULT_TIMEZONE:
+                self._timezones[user_id] = zone
+                self._zone_users.setdefault(zone, set()).add(user_id)
+
+    def refresh_offsets(self, now: datetime):
+        """Переиндексировать пользователей поясов, у которых сменилось смещение"""
+        for zone, users in self._zone_users.items():
+            offset = utc_offset_minutes(zone, now)
+            if self._offsets.setdefault(zone, offset) == offset:
+                continue
+            habit_ids = [habit_id for user_id in users for habit_id in self._user_habits.get(user_id, ())]
+            with self._reindexing(habit_ids):
+                self._offsets[zone] = offset
+            logger.info(f"Timezone {zone} offset changed, reindexed {len(habit_ids)} reminders")
+
+    def slot_size(self, minute: int) -> int:
+        return len(self._slots.get(minute, ()))
+
+    def hourly_size(self, minute: int) -> int:
+        return len(self._hourly.get(minute, ()))
+
+    async def load(self):
+        """Восстановить все напоминания и настройки пользователей из базы данных"""
+        from database.database import get_reminder_schedule, get_reminder_settings
+
+        for user_id, (active_hours, zone) in (await get_reminder_settings()).items():
+            if active_hours is not None:
+                self._active_hours[user_id] = active_hours
+            if zone is not None:
+                self.set_timezone(user_id, zone)
+        for habit_id, user_id, reminder_time in await get_reminder_schedule():
+            self.add(habit_id, reminder_time, user_id)
+        logger.info(
+            f"Loaded {len(self._habits)} reminders into {len(self._slots)} minute slots "
+            f"and {len(self._hourly)} hourly slots"
+        )
+
+    def start(self):
+        self.scheduler.add_job(
+            self._tick,
+            CronTrigger(minute="*", timezone=self.scheduler.timezone),
+            id=TICK_JOB_ID,
+            replace_existing=True,
+            coalesce=True,
+            misfire_grace_time=30,
+        )
+        if not self.scheduler.running:
+            self.scheduler.start()
+
+    def shutdown(self):
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=False)
+        for task in self._tasks:
+            task.cancel()
+
+    def _spawn(self, coroutine):
+        # Рассылка может идти дольше минуты, а тик не должен ее ждать
+        # Пустой контекст: запросы рассылки не относятся ни к одному апдейту
+        task = asyncio.create_task(coroutine, context=contextvars.Context())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _tick(self, now: Optional[datetime] = None):
+        """Разослать напоминания всех минут, наступивших с прошлого тика.
+
+        Тик может опоздать (задержка цикла событий, misfire grace) и
+        начаться уже в следующей минуте; поэтому обрабатывается не
+        текущая минута, а все пропущенные после последней обработанной.
+        """
+        now = (now or datetime.now(timezone.utc)).replace(second=0, microsecond=0)
+        self.refresh_offsets(now)
+        first = now
+        if self._last_minute is not None:
+            first = self._last_minute + timedelta(minutes=1)
+            oldest = now - timedelta(minutes=MAX_CATCH_UP_MINUTES - 1)
+            if first < oldest:
+                skipped = oldest - timedelta(minutes=1)
+                logger.warning(f"Reminder tick is late, skipping minutes {first:%H:%M}-{skipped:%H:%M} UTC")
+                first = oldest
+        moment = first
+        while moment <= now:
+            self._fire_minute(moment)
+            moment += timedelta(minutes=1)
+        if self._last_minute is None or now > self._last_minute:
+            self._last_minute = now
+
+    def _fire_minute(self, moment: datetime):
+        minute = moment.hour * 60 + moment.minute
+        label = f"{moment.hour:02d}:{moment.minute:02d} UTC"
+
+        habit_ids = self._slots.get(minute)
+        if habit_ids:
+            self._spawn(self._fire_slot(label, list(habit_ids)))
+        habit_ids = self._hourly.get(minute)
+        if habit_ids:
+            self._spawn(self._fire_hourly(label, list(habit_ids)))
+
+    async def _fire_slot(self, label: str, habit_ids: List[int]):
+        from database.database import get_habits_by_ids
+
+        habits = await get_habits_by_ids(habit_ids)
+        logger.info(f"Reminder slot {label}: {len(habits)} habits")
+        if bot is None:
+            return
+        await dispatcher.dispatch(
+            bot,
+            label,
+            (build_reminder_message(habit) for habit in habits if not habit.get('completed_today'))
+        )
+
+    async def _fire_hourly(self, label: str, habit_ids: List[int]):
+        from database.database import get_habits_by_ids
+
+        habits = await get_habits_by_ids(habit_ids)
+        logger.info(f"Hourly reminders {label}: {len(habits)} habits")
+        if bot is None:
+            return
+
+        # Одно сообщение на пользователя, сколько бы ежечасных привычек у него ни было
+        by_user: Dict[int, List[dict]] = {}
+        for habit in habits:
+            if not habit.get('completed_today'):
+                by_user.setdefault(habit['user_id'], []).append(habit)
+        await dispatcher.dispatch(
+            bot,
+            f"hourly {label}",
+            (build_hourly_message(user_habits) for user_habits in by_user.values())
+        )
+
+
+engine = ReminderEngine()
+
+
+def build_reminder_message(habit: dict) -> OutgoingMessage:
+    """Сообщение-напоминание о привычке для рассылки"""
+    return OutgoingMessage(
+        chat_id=habit['user_id'],
+        text=(
+            f"⏰ <b>Напоминание:</b> {habit.get('emoji', '🎯')} {escape(habit['name'], quote=False)}\n\n"
+            f"🔥 Цепочка: {habit.get('streak', 0)} дней"
+        ),
+        reply_markup=get_habit_actions_keyboard(habit['id'])
+    )
+
+
+def build_hourly_message(habits: List[dict]) -> OutgoingMessage:
+    """Ежечасное напоминание сразу обо всех невыполненных привычках пользователя"""
+    if len(habits) == 1:
+        return build_reminder_message(habits[0])
+    lines = ["⏰ <b>Ежечасное напоминание:</b>\n"]
+    lines.extend(f"{habit.get('emoji', '🎯')} {escape(habit['name'], quote=False)}" for habit in habits)
+    return OutgoingMessage(
+        chat_id=habits[0]['user_id'],
+        text="\n".join(lines),
+        reply_markup=get_habits_keyboard(habits)
+    )
+
+
+def build_digest_message(digest: Dict[str, Any]) -> OutgoingMessage:
+    """Сводка дня пользователя из уже загруженных данных, без запросов к БД"""
+    lines = [
+        "📋 <b>Итоги дня</b>\n",
+        f"Выполнено: {digest['completed']} из {len(digest['habits'])}\n",
+    ]
+    for habit in digest["habits"]:
+        mark = "✅" if habit["completed"] else "⬜"
+        streak = f" — 🔥 {habit['streak']}" if habit["streak"] else ""
+        lines.append(f"{mark} {habit['emoji']} {escape(habit['name'], quote=False)}{streak}")
+    if digest["completed"] < len(digest["habits"]):
+        lines.append("\nДо конца дня еще можно успеть! 💪")
+    return OutgoingMessage(chat_id=digest["user_id"], text="\n".join(lines))
+
+
+async def _digest_messages(day) -> AsyncIterator[OutgoingMessage]:
+    from database.database import stream_daily_digests
+
+    async for digest in stream_daily_digests(day):
+        yield build_digest_message(digest)
+
+
+async def send_daily_digest() -> Optional[Dict[str, Any]]:
+    """Разослать итоги дня всем пользователям с привычками"""
+    if bot is None:
+        return None
+    day = datetime.utcnow().date()
+    # Сводки читаются порциями пользователей по мере освобождения места в очереди рассылки
+    return await dispatcher.dispatch(bot, f"digest {day}", _digest_messages(day))
+
+
+def schedule_daily_digest(digest_time: Optional[str] = DIGEST_TIME):
+    """Поставить ежедневную сводку на время "HH:MM" по UTC"""
+    slot = ReminderEngine.parse_slot(digest_time)
+    if slot is None:
+        return
+    hour, minute = slot.split(":")
+    engine.scheduler.add_job(
+        send_daily_digest,
+        CronTrigger(hour=int(hour), minute=int(minute), timezone=engine.scheduler.timezone),
+        id=DIGEST_JOB_ID,
+        replace_existing=True,
+        coalesce=True,
+        misfire_grace_time=600,
+    )
+
+
+async def start_reminder_service():
+    """Загрузить напоминания из БД и запустить планировщик"""
+    await engine.load()
+    schedule_daily_digest()
+    engine.start()
+
+
+def stop_reminder_service():
+    engine.shutdown()
+
+
+# ---------- Изменения индекса из хэндлеров ----------
+# Методы движка, которые можно вызвать командой из другого процесса
+ENGINE_COMMANDS = {"add", "remove", "set_active_hours", "set_timezone"}
+
+# В режиме 'sharded' хэндлеры работают в воркерах, а движок запущен только во
+# фронт-процессе: воркер отправляет изменения туда через эту очередь
+_control_queue = None
+
+
+def set_control_queue(queue):
+    global _control_queue
+    _control_queue = queue
+
+
+def apply_command(command: str, *args: Any):
+    """Применить изменение к движку этого процесса"""
+    if command not in ENGINE_COMMANDS:
+        raise ValueError(f"Unknown reminder command: {command}")
+    getattr(engine, command)(*args)
+
+
+def _change(command: str, *args: Any):
+    if _control_queue is not None:
+        _control_queue.put((command, *args))
     else:
-        # Для положительной привычки
-        asyncio.create_task(send_habit_reminder(user_id, habit))
\ No newline at end of file
+        apply_command(command, *args)
+
+
+async def schedule_habit_reminder(habit_id: int, reminder_time: str, user_id: Optional[int] = None):
+    _change("add", habit_id, reminder_time, user_id)
+
+
+async def update_habit_reminder(habit_id: int, reminder_time: str, user_id: Optional[int] = None):
+    _change("add", habit_id, reminder_time, user_id)
+
+
+async def update_active_hours(user_id: int, start: int, end: int):
+    _change("set_active_hours", user_id, start, end)
+
+
+async def update_timezone(user_id: int, zone: str):
+    _change("set_timezone", user_id, zone)
+
+
+async def cancel_habit_reminder(habit_id: int):
+    _change("remove", habit_id)
@@ -0,0 +1,257 @@
+import asyncio
+import importlib
+import json
+import logging
+import multiprocessing as mp
+from multiprocessing.reduction import ForkingPickler
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import GetUpdates
+
+from config import BOT_TOKEN, SHARD_MAX_RESTARTS
+from services.telegram import create_bot
+
+logger = logging.getLogger(__name__)
+
+# Поля апдейта, в которых Telegram передает автора
+_USER_FIELDS = (
+    "message", "edited_message", "callback_query", "inline_query",
+    "chosen_inline_result", "shipping_query", "pre_checkout_query",
+    "poll_answer", "my_chat_member", "chat_member", "chat_join_request",
+)
+
+DispatcherFactory = Union[str, Callable[[], Dispatcher]]
+
+
+def update_user_id(update: Dict[str, Any]) -> Optional[int]:
+    """id пользователя, от которого пришел сырой апдейт"""
+    for field in _USER_FIELDS:
+        event = update.get(field)
+        if event:
+            user = event.get("from") or event.get("user")
+            if user:
+                return user["id"]
+            chat = event.get("chat")
+            if chat:
+                return chat["id"]
+    return None
+
+
+def shard_for(update: Dict[str, Any], workers: int) -> int:
+    """Номер воркера для апдейта: один пользователь всегда попадает в один воркер"""
+    user_id = update_user_id(update)
+    if user_id is None:
+        user_id = update.get("update_id", 0)
+    return user_id % workers
+
+
+def _resolve_factory(factory: DispatcherFactory) -> Callable[[], Dispatcher]:
+    if callable(factory):
+        return factory
+    module_name, _, attr = factory.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+async def _worker_loop(index: int, queue: mp.Queue, factory: DispatcherFactory, token: str,
+                       stats_queue: Optional[mp.Queue], control_queue: Optional[mp.Queue]):
+    if control_queue is not None:
+        # Напоминания рассылает фронт-процесс: изменения из хэндлеров уходят туда
+        from services.reminder_service import set_control_queue
+        set_control_queue(control_queue)
+    dp = _resolve_factory(factory)()
+    bot = create_bot(token)
+    loop = asyncio.get_running_loop()
+    # Последняя задача каждого пользователя: следующий апдейт ждет ее,
+    # так что апдейты одного пользователя идут по порядку, а разных — параллельно
+    tails: Dict[int, asyncio.Task] = {}
+    processed = 0
+
+    async def process(user_id: int, update: Dict[str, Any], previous: Optional[asyncio.Task]):
+        nonlocal processed
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)
+        try:
+            await dp.feed_raw_update(bot, update)
+        except Exception as e:
+            logger.error(f"Worker {index}: error processing update {update.get('update_id')}: {e}")
+        finally:
+            processed += 1
+            if tails.get(user_id) is asyncio.current_task():
+                del tails[user_id]
+
+    await dp.emit_startup(bot=bot)
+    if stats_queue is not None:
+        stats_queue.put(("ready", index))
+
+    try:
+        while True:
+            raw = await loop.run_in_executor(None, queue.get)
+            if raw is None:
+                break
+            update = json.loads(raw)
+            user_id = update_user_id(update) or 0
+            tails[user_id] = asyncio.create_task(process(user_id, update, tails.get(user_id)))
+
+        if tails:
+            await asyncio.gather(*tails.values(), return_exceptions=True)
+    finally:
+        await dp.emit_shutdown(bot=bot)
+        await bot.session.close()
+        if stats_queue is not None:
+            stats_queue.put(("done", index, processed))
+
+
+def _worker_main(index: int, queue: mp.Queue, factory: DispatcherFactory, token: str,
+                 stats_queue: Optional[mp.Queue] = None, control_queue: Optional[mp.Queue] = None):
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_worker_loop(index, queue, factory, token, stats_queue, control_queue))
+
+
+class ShardedRunner:
+    """Фронт-процесс, раздающий апдейты N воркерам по from_user.id.
+
+    Каждый воркер — отдельный процесс со своим Dispatcher, пулом
+    соединений с БД и кэшем привычек (модули импортируются заново).
+    Движок напоминаний работает только во фронт-процессе: изменения
+    привычек и настроек воркеры присылают в очередь control, а
+    apply_control() применяет их к движку.
+
+    Упавший воркер перезапускается (watch), его очередь переходит к
+    новому процессу; апдейт, который он обрабатывал, теряется. После
+    max_restarts перезапусков одного воркера watch падает с ошибкой.
+
+    Режим окупается только при нескольких ядрах. На одном ядре
+    benchmarks/bot_load.py с настоящими роутерами дает для двух
+    воркеров 57–96 апдейтов/с (p99 3,3–3,7 с) против 131–212 у polling:
+    три процесса делят ядро, а воркеры еще и ждут друг друга на
+    блокировке записи SQLite.
+    """
+
+    def __init__(self, factory: DispatcherFactory, workers: int, token: str = BOT_TOKEN,
+                 stats_queue: Optional[mp.Queue] = None, max_restarts: int = SHARD_MAX_RESTARTS):
+        self.factory = factory
+        self.workers = workers
+        self.token = token
+        self.stats_queue = stats_queue
+        self.max_restarts = max_restarts
+        self._context = mp.get_context("spawn")
+        self._queues: List[mp.Queue] = []
+        self._processes: List[mp.Process] = []
+        self.restarts: List[int] = [0] * workers
+        self.control: mp.Queue = self._context.Queue()
+
+    def _start_worker(self, index: int, queue: mp.Queue) -> mp.Process:
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, queue, self.factory, self.token, self.stats_queue, self.control),
+            name=f"bot-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def start(self):
+        for index in range(self.workers):
+            queue = self._context.Queue()
+            self._queues.append(queue)
+            self._processes.append(self._start_worker(index, queue))
+        logger.info(f"Started {self.workers} update workers")
+
+    def _restart(self, index: int):
+        old, queue = self._queues[index], self._context.Queue()
+        moved = 0
+        # Воркер ждет queue.get в потоке и умирает, держа блокировку чтения,
+        # так что old.get() зависнет. Читатель у очереди один — он мертв,
+        # поэтому оставшиеся апдейты читаются из канала напрямую
+        reader = old._reader
+        while reader.poll(0.1):
+            queue.put(ForkingPickler.loads(reader.recv_bytes()))
+            moved += 1
+        old.close()
+        self._queues[index] = queue
+        self._processes[index] = self._start_worker(index, queue)
+        logger.info(f"Restarted worker {index}, {moved} queued updates handed over")
+
+    def check_workers(self):
+        """Перезапустить упавшие воркеры; RuntimeError, если воркер падает слишком часто"""
+        for index, process in enumerate(self._processes):
+            if process.exitcode is None:
+                continue
+            self.restarts[index] += 1
+            if self.restarts[index] > self.max_restarts:
+                raise RuntimeError(
+                    f"Worker {index} exited with code {process.exitcode} "
+                    f"after {self.max_restarts} restarts, giving up"
+                )
+            logger.error(f"Worker {index} exited with code {process.exitcode}, restarting")
+            self._restart(index)
+
+    async def watch(self, interval: float = 1.0):
+        """Проверять воркеры раз в interval секунд, пока не отменят"""
+        while True:
+            await asyncio.sleep(interval)
+            # В цикле событий, как и route(): пока очередь перекладывается,
+            # новые апдейты не попадут в старую
+            self.check_workers()
+
+    def route(self, update: Dict[str, Any]):
+        self._queues[shard_for(update, self.workers)].put(json.dumps(update, ensure_ascii=False))
+
+    async def apply_control(self):
+        """Применять изменения напоминаний от воркеров, пока stop() не закроет очередь"""
+        from services.reminder_service import apply_command
+
+        loop = asyncio.get_running_loop()
+        while True:
+            command = await loop.run_in_executor(None, self.control.get)
+            if command is None:
+                return
+            try:
+                apply_command(*command)
+            except Exception as e:
+                logger.error(f"Error applying reminder command {command[0]}: {e}")
+
+    def stop(self, timeout: float = 30.0):
+        for queue in self._queues:
+            queue.put(None)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        # Воркеры остановлены, больше изменений не будет
+        self.control.put(None)
+
+
+async def _poll(bot: Bot, runner: ShardedRunner, allowed_updates: Optional[List[str]]):
+    offset = None
+    while True:
+        try:
+            updates = await bot(GetUpdates(offset=offset, timeout=30, allowed_updates=allowed_updates))
+        except Exception as e:
+            logger.error(f"Error fetching updates: {e}")
+            await asyncio.sleep(1)
+            continue
+        for update in updates:
+            runner.route(update.model_dump(mode="json", exclude_unset=True, by_alias=True))
+            offset = update.update_id + 1
+
+
+async def run_sharded(bot: Bot, factory: DispatcherFactory, workers: int,
+                      allowed_updates: Optional[List[str]] = None):
+    """Long polling во фронт-процессе с раздачей апдейтов воркерам"""
+    runner = ShardedRunner(factory, workers, token=bot.token)
+    runner.start()
+    control = asyncio.create_task(runner.apply_control())
+    tasks = [asyncio.create_task(_poll(bot, runner, allowed_updates)), asyncio.create_task(runner.watch())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            # Воркер падает снова и снова: останавливаем бота, а не копим его апдейты
+            task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.get_running_loop().run_in_executor(None, runner.stop)
+        await control
@@ -0,0 +1,16 @@
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from config import BOT_TOKEN, TELEGRAM_API_URL
+from services.edit_cache import EditCacheMiddleware, edit_cache
+
+
+def create_bot(token: str = BOT_TOKEN) -> Bot:
+    """Bot, который ходит на TELEGRAM_API_URL, если он задан, и пропускает правки без изменений"""
+    if not TELEGRAM_API_URL:
+        bot = Bot(token=token)
+    else:
+        bot = Bot(token=token, session=AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)))
+    bot.session.middleware(EditCacheMiddleware(edit_cache))
+    return bot
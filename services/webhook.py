@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import signal
+from contextlib import suppress
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from config import (
+    WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_HOST, WEBHOOK_PORT,
+    WEBHOOK_SECRET, WEBHOOK_MAX_IN_FLIGHT, METRICS_PATH
+)
+
+logger = logging.getLogger(__name__)
+
+
+class LimitedRequestHandler(SimpleRequestHandler):
+    """Обработчик webhook с ограничением числа одновременно обрабатываемых апдейтов.
+
+    Апдейт сразу подтверждается ответом 200 и обрабатывается в фоне.
+    Когда в работе уже max_in_flight апдейтов, ответ задерживается до
+    освобождения места — так Telegram сам притормаживает доставку.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, max_in_flight: int = WEBHOOK_MAX_IN_FLIGHT,
+                 **kwargs: Any):
+        super().__init__(dispatcher=dispatcher, bot=bot, handle_in_background=True, **kwargs)
+        self.max_in_flight = max_in_flight
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+
+    async def _background_feed_update(self, bot: Bot, update: dict) -> None:
+        try:
+            await super()._background_feed_update(bot=bot, update=update)
+            self.processed += 1
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Error processing webhook update {update.get('update_id')}: {e}")
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        update = await request.json(loads=bot.session.json_loads)
+        await self._semaphore.acquire()
+        self.in_flight += 1
+
+        task = asyncio.create_task(self._background_feed_update(bot=bot, update=update))
+        self._background_feed_update_tasks.add(task)
+        task.add_done_callback(self._background_feed_update_tasks.discard)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def close(self) -> None:
+        """Дождаться обработки принятых апдейтов и закрыть сессию бота"""
+        if self._background_feed_update_tasks:
+            await asyncio.gather(*self._background_feed_update_tasks, return_exceptions=True)
+        await super().close()
+
+
+async def metrics_view(request: web.Request) -> web.Response:
+    """Метрики в формате Prometheus для скрейпера"""
+    from services.metrics import metrics
+
+    return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8",
+                        headers={"X-Prometheus-Format": "0.0.4"})
+
+
+def build_webhook_app(dp: Dispatcher, bot: Bot, path: str = WEBHOOK_PATH,
+                      max_in_flight: int = WEBHOOK_MAX_IN_FLIGHT) -> web.Application:
+    """aiohttp-приложение с обработчиком webhook"""
+    app = web.Application()
+    handler = LimitedRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        max_in_flight=max_in_flight,
+        secret_token=WEBHOOK_SECRET or None,
+    )
+    handler.register(app, path=path)
+    app["webhook_handler"] = handler
+    if METRICS_PATH:
+        app.router.add_get(METRICS_PATH, metrics_view)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    """Запустить aiohttp-сервер и обрабатывать апдейты до SIGTERM/SIGINT.
+
+    Остановка, как и у start_polling, штатная: сервер перестает
+    принимать апдейты, дожидается уже принятых и вызывает shutdown
+    диспетчера (запись FSM и отложенных выполнений).
+    """
+    app = build_webhook_app(dp, bot)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=WEBHOOK_HOST, port=WEBHOOK_PORT)
+    await site.start()
+    logger.info(f"Webhook server listening on {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+
+    if WEBHOOK_URL:
+        await bot.set_webhook(
+            url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET or None,
+            max_connections=min(WEBHOOK_MAX_IN_FLIGHT, 100),
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+        logger.info("Webhook registered in Telegram")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    signals = (signal.SIGTERM, signal.SIGINT)
+    with suppress(NotImplementedError):  # на Windows сигналы в цикле событий не поддерживаются
+        for signum in signals:
+            loop.add_signal_handler(signum, stop.set)
+    try:
+        await stop.wait()
+        logger.info("Stopping webhook server...")
+    finally:
+        with suppress(NotImplementedError):
+            for signum in signals:
+                loop.remove_signal_handler(signum)
+        # on_shutdown приложения: дождаться апдейтов в работе, затем shutdown диспетчера
+        await runner.cleanup()
@@ -0,0 +1,83 @@
+"""Окружение тестов: временная БД и фиктивный токен задаются до импорта config"""
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_directory = tempfile.mkdtemp(prefix="habits-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_directory, 'habits.db')}"
+os.environ["BOT_TOKEN"] = "123456:fake"
+
+
+@pytest.fixture(scope="session")
+def _dispatcher():
+    """Диспетчер со всеми роутерами; роутер подключается только один раз за процесс"""
+    import bot
+    return bot.create_dispatcher()
+
+
+@pytest.fixture
+def dispatcher(_dispatcher):
+    """Тот же диспетчер со свежим хранилищем FSM: у каждого теста свой цикл событий"""
+    from database.fsm_storage import create_fsm_storage
+
+    _dispatcher.fsm.storage = create_fsm_storage()
+    return _dispatcher
+
+
+@pytest.fixture
+def run():
+    """Выполнить корутину на созданной БД; пул закрывается в том же цикле событий"""
+    def runner(coroutine):
+        async def scenario():
+            from database.database import db, habit_cache
+
+            habit_cache.clear()
+            await db.init_models()
+            try:
+                return await coroutine
+            finally:
+                await db.close()
+
+        return asyncio.run(scenario())
+
+    return runner
+
+
+class FakeApi:
+    """Bot API без сети: запоминает вызванные методы"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, make_request, bot, method):
+        from aiogram.methods import SendMessage
+        from aiogram.types import Chat, Message
+
+        self.calls.append(method)
+        if isinstance(method, SendMessage):
+            return Message(message_id=len(self.calls), date=datetime.now(), text=method.text,
+                           chat=Chat(id=method.chat_id, type="private"))
+        return True
+
+    def sent(self, kind):
+        return [method for method in self.calls if isinstance(method, kind)]
+
+
+@pytest.fixture
+def api():
+    return FakeApi()
+
+
+@pytest.fixture
+def bot(api):
+    from aiogram import Bot
+
+    bot = Bot("123456:fake")
+    bot.session.middleware(api)
+    return bot
@@ -0,0 +1,63 @@
+import asyncio
+
+from aiogram import Dispatcher
+from aiogram.methods import AnswerCallbackQuery, SendMessage
+from aiogram.types import CallbackQuery, Update
+
+from benchmarks.webhook_client import fake_callback_update, fake_message_update
+from services.antiflood import RATE_LIMITED, Antiflood, setup_antiflood
+
+
+def test_retry_after_rate_limit_is_not_coalesced(bot, api):
+    antiflood = Antiflood(window=10, rate=20, burst=1)
+    dp = Dispatcher()
+    setup_antiflood(dp, antiflood)
+    handled = []
+
+    @dp.callback_query()
+    async def on_press(callback: CallbackQuery):
+        handled.append(callback.data)
+
+    async def press(data: str):
+        await dp.feed_update(bot, Update.model_validate(fake_callback_update(6001, data)))
+
+    async def scenario():
+        await press("page:1")
+        await press("page:2")  # Токен уже потрачен
+        await asyncio.sleep(0.1)
+        await press("page:2")  # Повтор после отказа по лимиту должен дойти до хэндлера
+        await bot.session.close()
+
+    asyncio.run(scenario())
+    assert handled == ["page:1", "page:2"]
+    assert antiflood.dropped[RATE_LIMITED] == 1
+    assert antiflood.stats()["in_flight"] == 0
+    assert len(api.sent(AnswerCallbackQuery)) == 1
+
+
+def test_rate_limited_messages_are_answered_once_per_streak(bot, api):
+    antiflood = Antiflood(window=10, rate=20, burst=1)
+    dp = Dispatcher()
+    setup_antiflood(dp, antiflood)
+    handled = []
+
+    @dp.message()
+    async def on_text(message):
+        handled.append(message.text)
+
+    async def send(text: str):
+        await dp.feed_update(bot, Update.model_validate(fake_message_update(6002, text)))
+
+    async def scenario():
+        await send("Бегать")
+        await send("Читать")  # Сверх лимита: пользователь получает одно предупреждение
+        await send("Спать")
+        await asyncio.sleep(0.1)
+        await send("Спать")
+        await send("Гулять")  # Новый отказ после пропущенного сообщения — новое предупреждение
+        await bot.session.close()
+
+    asyncio.run(scenario())
+    assert handled == ["Бегать", "Спать"]
+    assert antiflood.dropped[RATE_LIMITED] == 3
+    assert len(api.sent(SendMessage)) == 2
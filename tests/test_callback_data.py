@@ -0,0 +1,80 @@
+from typing import Literal
+
+import pytest
+
+from utils.callback_data import MAX_CALLBACK_DATA, PackedCallback
+
+
+class Card(PackedCallback, code="X"):
+    habit_id: int
+    page: int = 0
+
+
+class Period(PackedCallback, code="Y"):
+    period: Literal["today", "week", "month"]
+    page: int = 0
+
+
+class Wide(PackedCallback, code="Z"):
+    a: int
+    b: int
+    c: int
+    d: int
+    e: int
+    f: int
+
+
+@pytest.mark.parametrize("button", [
+    Card(habit_id=0),
+    Card(habit_id=5, page=1),
+    Card(habit_id=2 ** 40, page=127),
+    Period(period="week", page=3),
+    Period(period="month"),
+])
+def test_round_trip(button):
+    data = button.pack()
+    assert data.startswith(button.prefix)
+    assert type(button).unpack(data) == button
+
+
+def test_pack_is_compact():
+    assert len(Card(habit_id=12345, page=2).pack()) <= 8
+
+
+def test_pack_rejects_data_over_the_telegram_limit():
+    assert len(Wide(*(2 ** 40,) * 5, 0).pack()) <= MAX_CALLBACK_DATA
+    with pytest.raises(ValueError):
+        Wide(*(2 ** 62,) * 6).pack()
+
+
+def test_pack_rejects_negative_values():
+    with pytest.raises(ValueError):
+        Card(habit_id=-1).pack()
+
+
+@pytest.mark.parametrize("data", [
+    Period(period="week").pack(),  # чужой префикс
+    "0" + Card(habit_id=5).pack()[1:],  # другая версия
+    "habit_5",  # старый формат
+    Card.prefix + "!!",  # не base64
+    Card.prefix + "gA",  # varint без последнего байта
+    Card.prefix + "BQEB",  # лишнее поле
+])
+def test_unpack_rejects_foreign_or_broken_data(data):
+    with pytest.raises(ValueError):
+        Card.unpack(data)
+
+
+def test_unpack_rejects_unknown_choice():
+    with pytest.raises(ValueError):
+        Period.unpack(Period.prefix + "BQA")
+
+
+def test_codes_are_unique_and_single_character():
+    with pytest.raises(ValueError):
+        class Duplicate(PackedCallback, code="X"):
+            habit_id: int
+
+    with pytest.raises(ValueError):
+        class Long(PackedCallback, code="XY"):
+            habit_id: int
@@ -0,0 +1,38 @@
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from database import database
+from database.database import db
+
+
+def test_digest_stream_pages_users_in_short_sessions(run, monkeypatch):
+    open_sessions = []
+    session = db.session
+
+    @asynccontextmanager
+    async def tracked_session():
+        open_sessions.append(True)
+        try:
+            async with session() as s:
+                yield s
+        finally:
+            open_sessions.pop()
+
+    monkeypatch.setattr(db, "session", tracked_session)
+
+    async def scenario():
+        today = datetime.utcnow().date()
+        users = range(5001, 5006)
+        for user_id in users:
+            for number in range(user_id - 5000):
+                await database.add_habit(user_id, f"Привычка {number}")
+        digests = []
+        async for digest in database.stream_daily_digests(today, fetch_size=2):
+            # Между порциями сессия закрыта: рассылка не держит транзакцию чтения
+            assert not open_sessions
+            digests.append(digest)
+        return [digest for digest in digests if digest["user_id"] in users]
+
+    digests = run(scenario())
+    assert [digest["user_id"] for digest in digests] == list(range(5001, 5006))
+    assert [len(digest["habits"]) for digest in digests] == [1, 2, 3, 4, 5]
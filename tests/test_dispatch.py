@@ -0,0 +1,98 @@
+import asyncio
+
+from aiogram import Dispatcher, F
+from aiogram.filters import Command
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import CallbackQuery, Message, Update
+
+from benchmarks.webhook_client import fake_callback_update, fake_message_update
+from utils.callback_data import PackedCallback
+from utils.dispatch import TableRouter
+
+
+class Open(PackedCallback, code="O"):
+    habit_id: int
+
+
+class Adding(StatesGroup):
+    name = State()
+
+
+def build_router(calls):
+    router = TableRouter()
+
+    @router.message(Adding.name)
+    async def name_entered(message: Message):
+        calls.append(("state", message.text))
+
+    @router.message(Command("start"))
+    async def start(message: Message):
+        calls.append(("command", message.text))
+
+    @router.callback_query(F.data.startswith("edit_"))
+    async def filtered_edit(callback: CallbackQuery):
+        calls.append(("filter", callback.data))
+
+    @router.text("📝 Мои привычки")
+    async def my_habits(message: Message, state):
+        calls.append(("table", message.text, await state.get_state()))
+
+    @router.data("back_to_menu")
+    async def back(callback: CallbackQuery):
+        calls.append(("data", callback.data))
+
+    @router.data_prefix("edit_")
+    async def edit(callback: CallbackQuery):
+        calls.append(("edit_", callback.data))
+
+    @router.data_prefix("edit_field_")
+    async def edit_field(callback: CallbackQuery):
+        calls.append(("edit_field_", callback.data))
+
+    @router.callback(Open)
+    async def open_habit(callback: CallbackQuery, callback_data: Open):
+        calls.append(("packed", callback_data.habit_id))
+
+    return router
+
+
+def test_table_lookup(bot):
+    calls = []
+    dp = Dispatcher()
+    dp.include_router(build_router(calls))
+
+    async def scenario():
+        for text in ("📝 Мои привычки", "/start"):
+            await dp.feed_update(bot, Update.model_validate(fake_message_update(9001, text)))
+        for data in ("back_to_menu", "edit_field_name_5", "edit_5", Open(habit_id=7).pack(), "1O!!"):
+            await dp.feed_update(bot, Update.model_validate(fake_callback_update(9001, data)))
+
+    asyncio.run(scenario())
+    assert calls == [
+        ("table", "📝 Мои привычки", None),
+        ("command", "/start"),
+        ("data", "back_to_menu"),
+        # Самый длинный префикс, хотя "edit_" зарегистрирован раньше
+        ("edit_field_", "edit_field_name_5"),
+        # Табличный хэндлер раньше хэндлера с фильтром на тот же префикс
+        ("edit_", "edit_5"),
+        ("packed", 7),
+        # Битая packed-кнопка не разбирается и не доходит ни до одного хэндлера
+    ]
+
+
+def test_table_runs_before_state_handlers(bot):
+    calls = []
+    dp = Dispatcher()
+    dp.include_router(build_router(calls))
+
+    async def scenario():
+        await dp.fsm.get_context(bot, chat_id=9002, user_id=9002).set_state(Adding.name)
+        for text in ("📝 Мои привычки", "Зарядка"):
+            await dp.feed_update(bot, Update.model_validate(fake_message_update(9002, text)))
+
+    asyncio.run(scenario())
+    assert calls == [
+        ("table", "📝 Мои привычки", Adding.name.state),
+        ("state", "Зарядка"),
+    ]
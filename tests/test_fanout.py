@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from services.fanout import FanoutDispatcher, OutgoingMessage
+
+
+class StuckBot:
+    """Бот, у которого отправка никогда не заканчивается"""
+
+    async def send_message(self, *args, **kwargs):
+        await asyncio.Event().wait()
+
+
+def _fanout() -> FanoutDispatcher:
+    return FanoutDispatcher(global_rate=1000, per_chat_rate=1000, concurrency=2, queue_size=2)
+
+
+def _messages(count: int):
+    return (OutgoingMessage(chat_id=chat_id, text="Привет") for chat_id in range(count))
+
+
+async def _assert_no_workers_left():
+    await asyncio.sleep(0)
+    assert asyncio.all_tasks() == {asyncio.current_task()}
+
+
+def test_cancelled_dispatch_stops_busy_workers():
+    async def scenario():
+        task = asyncio.create_task(_fanout().dispatch(StuckBot(), "test", _messages(10)))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(task, timeout=1)
+        await _assert_no_workers_left()
+
+    asyncio.run(scenario())
+
+
+def test_failing_source_keeps_its_error():
+    def broken_source():
+        yield from _messages(4)
+        raise RuntimeError("database is locked")
+
+    async def scenario():
+        with pytest.raises(RuntimeError, match="database is locked"):
+            await asyncio.wait_for(_fanout().dispatch(StuckBot(), "test", broken_source()), timeout=1)
+        await _assert_no_workers_left()
+
+    asyncio.run(scenario())
+
+
+def test_report_lags(bot, api):
+    async def scenario():
+        fanout = FanoutDispatcher(global_rate=1000, per_chat_rate=1000, concurrency=4, queue_size=8)
+        report = await fanout.dispatch(bot, "test", _messages(50))
+        await bot.session.close()
+        return report
+
+    report = asyncio.run(scenario())
+    assert report["sent"] == 50
+    assert report["lag_avg"] <= report["lag_p95"] <= report["lag_max"]
+
+
+def test_histogram_quantile():
+    from services.metrics import Histogram
+
+    lags = Histogram((1.0, 5.0, 10.0))
+    for value in (0.5,) * 90 + (3.0,) * 8 + (20.0,) * 2:
+        lags.observe(value)
+    assert lags.quantile(0.5) == 1.0
+    assert lags.quantile(0.95) == 5.0
+    assert lags.quantile(1.0) is None
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+
+from database.fsm_storage import SQLiteStorage
+
+KEY = StorageKey(bot_id=1, chat_id=5001, user_id=5001)
+
+
+def test_state_written_before_close_survives_restart(run):
+    async def scenario():
+        storage = SQLiteStorage(flush_interval=60, flush_batch=1)
+        await storage.set_data(KEY, {"name": "Бег"})
+        await storage.set_state(KEY, "Form:name")
+        # Остановка приходит, когда фоновая задача уже пишет пачку
+        while not storage._flush_lock.locked():
+            await asyncio.sleep(0)
+        await storage.close()
+
+        restarted = SQLiteStorage()
+        state, data = await restarted.get_state(KEY), await restarted.get_data(KEY)
+        await restarted.close()
+        return state, data
+
+    assert run(scenario()) == ("Form:name", {"name": "Бег"})
+
+
+def test_cancelled_flush_keeps_dirty_keys(run, monkeypatch):
+    async def scenario():
+        storage = SQLiteStorage(flush_interval=60)
+        await storage.set_state(KEY, "Form:cancelled")
+
+        def cancelled(rows):
+            raise asyncio.CancelledError
+
+        monkeypatch.setattr(storage, "_upsert_statement", cancelled)
+        with pytest.raises(asyncio.CancelledError):
+            await storage.flush()
+        dirty = set(storage._dirty)
+        monkeypatch.undo()
+        await storage.close()
+        return dirty
+
+    assert run(scenario()) == {SQLiteStorage._key(KEY)}
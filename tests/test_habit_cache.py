@@ -0,0 +1,70 @@
+from database import database
+from database.database import habit_cache
+
+
+def test_habits_page_is_cached_until_a_write(run):
+    async def scenario():
+        user_id = 2001
+        for number in range(7):
+            await database.add_habit(user_id, f"Привычка {number}")
+
+        first = await database.get_habits_page(user_id, page=1, per_page=5)
+        hits = habit_cache.hits
+        assert await database.get_habits_page(user_id, page=1, per_page=5) == first
+        assert habit_cache.hits == hits + 1
+
+        await database.update_habit(first["habits"][0]["id"], user_id, "name", "Новое имя")
+        second = await database.get_habits_page(user_id, page=1, per_page=5)
+        assert habit_cache.hits == hits + 1
+        assert second["habits"][0]["name"] == "Новое имя"
+        return first
+
+    first = run(scenario())
+    assert first["total"] == 7 and first["page"] == 1 and len(first["habits"]) == 2
+
+
+def test_single_page_fills_the_whole_list(run):
+    async def scenario():
+        user_id = 2002
+        for number in range(3):
+            await database.add_habit(user_id, f"Привычка {number}")
+        page = await database.get_habits_page(user_id, per_page=5)
+        return page, habit_cache.get_habits(user_id)
+
+    page, habits = run(scenario())
+    assert habits == page["habits"] and len(habits) == 3
+
+
+def test_invalidation_during_read_is_not_overwritten(run, monkeypatch):
+    user_id = 2003
+    habit_to_dict = database._habit_to_dict
+
+    def write_during_read(*args, **kwargs):
+        # Запись другого хэндлера успела пройти, пока шло чтение
+        habit_cache.invalidate(user_id)
+        return habit_to_dict(*args, **kwargs)
+
+    async def scenario():
+        await database.add_habit(user_id, "Старое имя")
+        monkeypatch.setattr(database, "_habit_to_dict", write_during_read)
+        stale = await database.get_user_habits(user_id)
+        monkeypatch.setattr(database, "_habit_to_dict", habit_to_dict)
+        return stale, habit_cache.get_habits(user_id), await database.get_user_habits(user_id)
+
+    stale, cached, fresh = run(scenario())
+    assert stale == fresh
+    assert cached is None
+    assert habit_cache.get_habits(user_id) == fresh
+
+
+def test_generation_survives_pruning():
+    from database.cache import HabitCache
+
+    cache = HabitCache(max_users=2)
+    generation = cache.generation(1)
+    for user_id in (1, 2, 3):
+        cache.invalidate(user_id)
+    cache.set_habits(1, [], generation)
+    assert cache.get_habits(1) is None
+    cache.set_habits(1, [], cache.generation(1))
+    assert cache.get_habits(1) == []
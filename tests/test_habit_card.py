@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from utils import habit_card
+from utils.habit_card import render_habit_card
+
+
+def _habit(habit_id: int, **fields):
+    return {
+        "id": habit_id, "name": "Зарядка", "emoji": "🎯", "description": None, "reminder_time": "09:00",
+        "streak": 0, "completed_today": False, "created_at": datetime(2026, 1, 1),
+        "updated_at": datetime(2026, 1, 1), **fields,
+    }
+
+
+def test_card_escapes_user_fields():
+    text = render_habit_card(_habit(1, name="<b", emoji="<i>", description="a & b", reminder_time="9 < 10"))
+    assert text.startswith("&lt;i&gt; <b>&lt;b</b>")
+    assert "a &amp; b" in text and "9 &lt; 10" in text
+
+
+def test_card_cache_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(habit_card, "CARD_CACHE_SIZE", 2)
+    monkeypatch.setattr(habit_card, "_cards", habit_card.OrderedDict())
+    first, second, third = _habit(11), _habit(12), _habit(13)
+    render_habit_card(first)
+    render_habit_card(second)
+    render_habit_card(first)  # Первую показали снова — вытеснять надо вторую
+    render_habit_card(third)
+    assert [key[0] for key in habit_card._cards] == [11, 13]
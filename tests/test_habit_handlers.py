@@ -0,0 +1,46 @@
+from aiogram.methods import EditMessageText, SendMessage
+from aiogram.types import Update
+
+from benchmarks.webhook_client import fake_callback_update, fake_message_update
+from database import database
+from keyboards import DeleteHabit, HabitStats
+
+
+def test_delete_confirmation_escapes_habit_name(run, dispatcher, bot, api):
+    async def scenario():
+        user_id = 3101
+        habit_id = await database.add_habit(user_id, "Спать <8 ч", emoji="<b>")
+        for data in (HabitStats(habit_id=habit_id).pack(), DeleteHabit(habit_id=habit_id).pack()):
+            await dispatcher.feed_update(bot, Update.model_validate(fake_callback_update(user_id, data)))
+
+    run(scenario())
+    [stats] = api.sent(EditMessageText)
+    [confirm] = api.sent(SendMessage)
+    assert 'привычки "Спать &lt;8 ч"' in stats.text
+    assert "<b>&lt;b&gt; Спать &lt;8 ч</b>" in confirm.text
+
+
+def test_add_confirmation_escapes_user_input(run, dispatcher, bot, api):
+    async def scenario():
+        user_id = 3102
+        for text in ("➕ Добавить привычку", "Читать <книги>", "Главы 1 & 2", "09:00", "📅 Ежедневно"):
+            await dispatcher.feed_update(bot, Update.model_validate(fake_message_update(user_id, text)))
+
+    run(scenario())
+    confirmation = api.sent(SendMessage)[-1]
+    assert "<b>Название:</b> Читать &lt;книги&gt;" in confirmation.text
+    assert "<b>Описание:</b> Главы 1 &amp; 2" in confirmation.text
+
+
+def test_delete_flow_removes_the_habit(run, dispatcher, bot, api):
+    async def scenario():
+        user_id = 3103
+        habit_id = await database.add_habit(user_id, "Лишняя")
+        await dispatcher.feed_update(
+            bot, Update.model_validate(fake_callback_update(user_id, DeleteHabit(habit_id=habit_id).pack()))
+        )
+        await dispatcher.feed_update(bot, Update.model_validate(fake_message_update(user_id, "✅ Подтвердить")))
+        return await database.get_habit_by_id(habit_id, user_id)
+
+    assert run(scenario()) is None
+    assert 'Привычка "Лишняя" удалена' in api.sent(SendMessage)[-1].text
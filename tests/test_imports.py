@@ -0,0 +1,35 @@
+import importlib
+import os
+import pkgutil
+import subprocess
+import sys
+
+import pytest
+
+PACKAGES = ("database", "handlers", "keyboards", "services", "utils")
+
+
+def _modules():
+    names = ["config", "bot"]
+    for package in PACKAGES:
+        path = importlib.import_module(package).__path__
+        names += [f"{package}.{info.name}" for info in pkgutil.iter_modules(path)]
+    return names
+
+
+@pytest.mark.parametrize("name", _modules())
+def test_module_imports(name):
+    importlib.import_module(name)
+
+
+def test_dispatcher_includes_all_routers(dispatcher):
+    from handlers import routers
+
+    assert dispatcher.sub_routers == routers
+
+
+def test_bot_import_does_not_load_sqlalchemy():
+    code = "import sys, bot; print('sqlalchemy' in sys.modules)"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "False"
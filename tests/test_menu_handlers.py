@@ -0,0 +1,49 @@
+from datetime import datetime
+
+from aiogram.methods import AnswerCallbackQuery, EditMessageText, SendMessage
+from aiogram.types import Update
+
+from benchmarks.webhook_client import fake_callback_update, fake_message_update
+from database import database
+from database.repository import repo
+from keyboards import StatsPeriod
+
+
+def test_period_stats_escape_best_habit(run, dispatcher, bot, api):
+    async def scenario():
+        user_id = 3001
+        habit_id = await database.add_habit(user_id, "Спать <8 ч & не спорить")
+        await database.mark_habits_completed_bulk([(habit_id, user_id, datetime.utcnow().date())])
+        update = fake_callback_update(user_id, StatsPeriod(period="all_time").pack())
+        await dispatcher.feed_update(bot, Update.model_validate(update))
+
+    run(scenario())
+    [edit] = api.sent(EditMessageText)
+    assert "Спать &lt;8 ч &amp; не спорить (1)" in edit.text
+
+
+def test_habit_list_escapes_user_text(run, dispatcher, bot, api):
+    async def scenario():
+        user_id = 3002
+        await database.add_habit(user_id, "<b", emoji="<i>", reminder_time="9 < 10")
+        await dispatcher.feed_update(bot, Update.model_validate(fake_message_update(user_id, "📝 Мои привычки")))
+
+    run(scenario())
+    [message] = api.sent(SendMessage)
+    assert "&lt;i&gt; <b>&lt;b</b>" in message.text
+    assert "9 &lt; 10" in message.text
+
+
+def test_period_stats_error_answers_once(run, dispatcher, bot, api, monkeypatch):
+    async def broken(user_id, period):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(repo, "get_period_stats", broken)
+
+    async def scenario():
+        update = fake_callback_update(3003, StatsPeriod(period="week").pack())
+        await dispatcher.feed_update(bot, Update.model_validate(update))
+
+    run(scenario())
+    [answer] = api.sent(AnswerCallbackQuery)
+    assert answer.text == "❌ Не удалось обновить статистику"
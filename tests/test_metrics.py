@@ -0,0 +1,13 @@
+from services.metrics import MetricsRegistry
+
+
+def test_render_exports_cache_and_buffer_counters():
+    report = MetricsRegistry().render()
+    for name in (
+        "bot_habit_cache_requests_total",
+        "bot_keyboard_cache_hits_total",
+        "bot_card_cache_requests_total",
+        "bot_completions_pending",
+        "bot_antiflood_dropped_total",
+    ):
+        assert f"# TYPE {name} " in report
@@ -0,0 +1,30 @@
+import asyncio
+
+from aiogram.types import Update
+
+from benchmarks.webhook_client import fake_message_update
+from services.metrics import BACKGROUND, MetricsRegistry, UpdateMetricsMiddleware
+
+
+def test_queries_after_update_count_as_background():
+    registry = MetricsRegistry()
+    middleware = UpdateMetricsMiddleware(registry)
+    started = []
+
+    async def late_query():
+        await asyncio.sleep(0.01)
+        registry.record_query(0.001)
+
+    async def handler(event, data):
+        registry.record_query(0.001)
+        # Задача наследует контекст апдейта и переживает его
+        started.append(asyncio.create_task(late_query()))
+
+    async def scenario():
+        update = Update.model_validate(fake_message_update(8001, "/start"))
+        await middleware(handler, update, {})
+        await started[0]
+
+    asyncio.run(scenario())
+    assert sum(registry.db_queries.values()) == 2
+    assert registry.db_queries[BACKGROUND] == 1
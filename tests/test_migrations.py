@@ -0,0 +1,49 @@
+import asyncio
+import sqlite3
+
+from database.database import Database
+from database.migrations import MIGRATIONS
+
+# Схема из исходного config.py, до репозитория и миграций
+BASELINE_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY, user_id BIGINT NOT NULL UNIQUE,
+    username VARCHAR(100), first_name VARCHAR(100), created_at DATETIME
+);
+CREATE TABLE user_habits (
+    id INTEGER PRIMARY KEY, user_id BIGINT NOT NULL, current_habit VARCHAR(100), habit_type VARCHAR(20),
+    current_streak INTEGER, best_streak INTEGER, total_days INTEGER, created_at DATETIME, updated_at DATETIME
+);
+CREATE TABLE habit_logs (
+    id INTEGER PRIMARY KEY, user_id BIGINT NOT NULL, habit_name VARCHAR(100), success BOOLEAN, log_date DATETIME
+);
+INSERT INTO users (user_id, username) VALUES (42, 'old');
+INSERT INTO user_habits (user_id, current_habit, habit_type, current_streak, best_streak, total_days)
+    VALUES (42, 'Бег', 'positive', 3, 5, 10);
+INSERT INTO habit_logs (user_id, habit_name, success, log_date) VALUES (42, 'Бег', 1, '2024-03-01 08:00:00');
+"""
+
+
+def test_migrations_upgrade_baseline_database(tmp_path):
+    path = tmp_path / "baseline.db"
+    with sqlite3.connect(path) as conn:
+        conn.executescript(BASELINE_SCHEMA)
+
+    async def upgrade():
+        database = Database(f"sqlite+aiosqlite:///{path}")
+        try:
+            await database.init_models()
+        finally:
+            await database.close()
+
+    asyncio.run(upgrade())
+    # Повторный запуск ничего не делает
+    asyncio.run(upgrade())
+
+    with sqlite3.connect(path) as conn:
+        versions = [row[0] for row in conn.execute("SELECT version FROM schema_migrations ORDER BY version")]
+        habit = conn.execute("SELECT current_habit, description, emoji, current_streak FROM user_habits").fetchone()
+        log = conn.execute("SELECT habit_id, log_day FROM habit_logs").fetchone()
+    assert versions == [version for version, _ in MIGRATIONS]
+    assert habit == ("Бег", None, None, 3)
+    assert log == (None, "2024-03-01")
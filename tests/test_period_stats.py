@@ -0,0 +1,26 @@
+from datetime import datetime, timedelta
+
+from database import database
+
+
+def test_deleted_habit_leaves_period_stats(run):
+    async def scenario():
+        user_id = 4001
+        today = datetime.utcnow().date()
+        kept = await database.add_habit(user_id, "Остается")
+        deleted = await database.add_habit(user_id, "Удаляется")
+        await database.mark_habits_completed_bulk([
+            (kept, user_id, today),
+            (deleted, user_id, today),
+            (deleted, user_id, today - timedelta(days=1)),
+        ])
+        await database.delete_habit(deleted, user_id)
+        # SQLite может выдать id удаленной привычки новой, она начинает с чистого листа
+        fresh = await database.add_habit(user_id, "Новая")
+        return await database.get_period_stats(user_id, "week"), await database.get_habit_by_id(fresh, user_id)
+
+    stats, fresh = run(scenario())
+    assert stats["completions"] == 1
+    assert stats["active_days"] == 1
+    assert stats["best_habit"].endswith("Остается")
+    assert not fresh["completed_today"] and fresh["total_days"] == 0
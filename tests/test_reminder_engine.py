@@ -0,0 +1,33 @@
+import asyncio
+from datetime import datetime, timezone
+
+from services.reminder_service import ReminderEngine
+
+
+def fired_labels(ticks):
+    engine = ReminderEngine()
+    for habit_id, slot in enumerate(("08:00", "08:01", "08:02", "08:30"), start=1):
+        engine.add(habit_id, slot, 701)
+    labels = []
+
+    async def fire_slot(label, habit_ids):
+        labels.append(label)
+
+    engine._fire_slot = fire_slot
+
+    async def scenario():
+        for hour, minute, second in ticks:
+            await engine._tick(datetime(2026, 3, 2, hour, minute, second, tzinfo=timezone.utc))
+        await asyncio.gather(*engine._tasks)
+
+    asyncio.run(scenario())
+    return labels
+
+
+def test_late_tick_fires_missed_minutes():
+    # Тик 08:01 опоздал до 08:02:05, а тик 08:02 сработал сразу за ним
+    assert fired_labels([(8, 0, 0), (8, 2, 5), (8, 2, 6)]) == ["08:00 UTC", "08:01 UTC", "08:02 UTC"]
+
+
+def test_catch_up_is_bounded():
+    assert fired_labels([(7, 0, 0), (8, 32, 0)]) == ["08:30 UTC"]
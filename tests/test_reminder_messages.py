@@ -0,0 +1,23 @@
+from services.reminder_service import build_digest_message, build_hourly_message, build_reminder_message
+
+HABIT = {"id": 7, "user_id": 42, "name": "Спать <8 ч & не спорить", "emoji": "😴", "streak": 2}
+
+
+def test_reminder_escapes_habit_name():
+    message = build_reminder_message(HABIT)
+    assert "Спать &lt;8 ч &amp; не спорить" in message.text
+    assert "<8" not in message.text
+
+
+def test_hourly_reminder_escapes_habit_names():
+    message = build_hourly_message([HABIT, {**HABIT, "id": 8, "name": "Читать"}])
+    assert "Спать &lt;8 ч &amp; не спорить" in message.text
+
+
+def test_digest_escapes_habit_names():
+    digest = {
+        "user_id": 42,
+        "completed": 1,
+        "habits": [{"emoji": "😴", "name": HABIT["name"], "completed": True, "streak": 2}],
+    }
+    assert "Спать &lt;8 ч &amp; не спорить" in build_digest_message(digest).text
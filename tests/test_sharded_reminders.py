@@ -0,0 +1,37 @@
+import asyncio
+import queue
+
+from services import reminder_service
+from services.reminder_service import engine
+from services.sharding import ShardedRunner
+
+
+def test_worker_forwards_reminder_changes(monkeypatch):
+    control = queue.Queue()
+    monkeypatch.setattr(reminder_service, "_control_queue", control)
+
+    async def scenario():
+        await reminder_service.schedule_habit_reminder(6001, "08:30", 601)
+        await reminder_service.update_timezone(601, "Europe/Moscow")
+        await reminder_service.cancel_habit_reminder(6001)
+
+    asyncio.run(scenario())
+    assert [control.get_nowait() for _ in range(3)] == [
+        ("add", 6001, "08:30", 601),
+        ("set_timezone", 601, "Europe/Moscow"),
+        ("remove", 6001),
+    ]
+    assert 6001 not in engine._habits
+
+
+def test_front_process_applies_worker_changes():
+    runner = ShardedRunner("bot:create_dispatcher", workers=1)
+    for command in (("add", 6002, "08:30", 602), ("add", 6003, "09:00", 602), ("remove", 6003), None):
+        runner.control.put(command)
+
+    asyncio.run(runner.apply_control())
+    try:
+        assert engine._habits[6002] == (602, 8 * 60 + 30)
+        assert 6003 not in engine._habits
+    finally:
+        engine.remove(6002)
@@ -0,0 +1,57 @@
+import os
+import time
+
+import pytest
+from aiogram import Dispatcher
+from aiogram.types import Message
+
+from benchmarks.webhook_client import fake_message_update
+from services.sharding import ShardedRunner
+
+
+def crashing_dispatcher() -> Dispatcher:
+    """Диспетчер воркера: "crash" роняет процесс, число — уходит в очередь control"""
+    dp = Dispatcher()
+
+    @dp.message()
+    async def on_message(message: Message):
+        if message.text == "crash":
+            os._exit(3)
+        from services.reminder_service import cancel_habit_reminder
+        await cancel_habit_reminder(int(message.text))
+
+    return dp
+
+
+def _wait_exit(runner: ShardedRunner, index: int = 0):
+    deadline = time.monotonic() + 60
+    while runner._processes[index].exitcode is None:
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+
+def test_dead_worker_is_restarted_with_its_queue():
+    runner = ShardedRunner("tests.test_sharding:crashing_dispatcher", workers=1)
+    runner.start()
+    try:
+        runner.route(fake_message_update(1, "crash"))
+        _wait_exit(runner)
+        # Апдейт пришел, пока воркер лежал
+        runner.route(fake_message_update(1, "42"))
+        runner.check_workers()
+        assert runner.restarts == [1]
+        assert runner.control.get(timeout=60) == ("remove", 42)
+    finally:
+        runner.stop()
+
+
+def test_worker_crashing_too_often_fails_loudly():
+    runner = ShardedRunner("tests.test_sharding:crashing_dispatcher", workers=1, max_restarts=0)
+    runner.start()
+    try:
+        runner.route(fake_message_update(1, "crash"))
+        _wait_exit(runner)
+        with pytest.raises(RuntimeError, match="giving up"):
+            runner.check_workers()
+    finally:
+        runner.stop()
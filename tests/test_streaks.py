@@ -0,0 +1,61 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from utils.streaks import (
+    DUE_WEEKDAYS, WEEKLY_TARGETS, days_to_bits, habit_stats, naive_habit_stats, pack_year, unpack_year,
+    year_offset, years_to_bits
+)
+
+FREQUENCIES = [*DUE_WEEKDAYS, *WEEKLY_TARGETS, None]
+
+# Периоды через границу года, високосный февраль и длинная история
+PERIODS = [
+    (date(2023, 12, 20), date(2024, 1, 10)),
+    (date(2024, 2, 20), date(2024, 3, 5)),
+    (date(2023, 2, 20), date(2023, 3, 5)),
+    (date(2019, 6, 1), date(2025, 1, 1)),
+    (date(2024, 12, 31), date(2024, 12, 31)),
+]
+
+
+def _year_blocks(days, start):
+    """История так, как она лежит в habit_year_bits"""
+    blocks = {}
+    for day in days:
+        year, offset = year_offset(day)
+        blocks[year] = blocks.get(year, 0) | 1 << offset
+    return years_to_bits([(year, pack_year(bits)) for year, bits in blocks.items()], start)
+
+
+@pytest.mark.parametrize("start, today", PERIODS)
+@pytest.mark.parametrize("frequency", FREQUENCIES)
+def test_bitmap_kernel_matches_day_loop(start, today, frequency):
+    generator = random.Random(f"{start}:{today}:{frequency}")
+    length = (today - start).days + 1
+    for _ in range(40):
+        density = generator.random()
+        days = [start + timedelta(days=offset) for offset in range(length) if generator.random() < density]
+        # Выполнено сегодня, вчера или ни то ни другое — разная текущая цепочка
+        tail = generator.choice(("today", "yesterday", "none", "random"))
+        if tail == "today":
+            days.append(today)
+        elif tail == "yesterday" and length > 1:
+            days = [day for day in days if day != today] + [today - timedelta(days=1)]
+        elif tail == "none":
+            days = [day for day in days if day < today - timedelta(days=1)]
+
+        expected = naive_habit_stats(days, start, today, frequency)
+        assert habit_stats(days_to_bits(days, start), start, today, frequency) == expected
+        assert habit_stats(_year_blocks(days, start), start, today, frequency) == expected
+
+
+def test_year_block_round_trip():
+    days = [date(2024, 1, 1), date(2024, 2, 29), date(2024, 12, 31)]
+    bits = 0
+    for day in days:
+        bits |= 1 << year_offset(day)[1]
+    assert unpack_year(pack_year(bits)) == bits
+    assert year_offset(date(2024, 12, 31)) == (2024, 365)
+    assert _year_blocks(days, date(2023, 12, 31)) == days_to_bits(days, date(2023, 12, 31))
@@ -0,0 +1,49 @@
+import asyncio
+import os
+import signal
+import socket
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import AnswerCallbackQuery
+from aiogram.types import Update
+
+from benchmarks.webhook_client import fake_callback_update, fake_callbacks
+from services import webhook
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_sigterm_stops_webhook_and_runs_shutdown(monkeypatch):
+    monkeypatch.setattr(webhook, "WEBHOOK_HOST", "127.0.0.1")
+    monkeypatch.setattr(webhook, "WEBHOOK_PORT", _free_port())
+    monkeypatch.setattr(webhook, "WEBHOOK_URL", "")
+    dp = Dispatcher()
+    stopped = []
+
+    async def on_shutdown():
+        stopped.append(True)
+
+    dp.shutdown.register(on_shutdown)
+
+    async def scenario():
+        server = asyncio.create_task(webhook.run_webhook(dp, Bot("123456:fake")))
+        await asyncio.sleep(0.2)
+        os.kill(os.getpid(), signal.SIGTERM)
+        await asyncio.wait_for(server, timeout=5)
+
+    asyncio.run(scenario())
+    assert stopped == [True]
+
+
+def test_client_callbacks_reach_handlers(run, dispatcher, bot, api):
+    async def scenario():
+        for data in fake_callbacks():
+            await dispatcher.feed_update(bot, Update.model_validate(fake_callback_update(8001, data)))
+
+    run(scenario())
+    # Ни одно нажатие не ушло в обработчик устаревших кнопок
+    assert not [answer for answer in api.sent(AnswerCallbackQuery) if "устарела" in (answer.text or "")]
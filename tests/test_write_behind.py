@@ -0,0 +1,74 @@
+import asyncio
+
+from database import database
+from database.database import habit_cache, unflushed_completions
+from database.write_behind import CompletionBuffer
+
+
+def test_unflushed_completion_survives_cache_miss(run):
+    async def scenario():
+        user_id = 7001
+        habit_id = await database.add_habit(user_id, "Зарядка")
+        buffer = CompletionBuffer(flush_interval=60)
+        assert (await buffer.submit(habit_id, user_id))["completed_today"]
+
+        # Кэш сброшен (TTL, вытеснение), выполнение еще не записано
+        habit_cache.clear()
+        page = await database.get_habits_page(user_id)
+        habit = await database.get_habit_by_id(habit_id, user_id)
+        repeated = await buffer.submit(habit_id, user_id)
+
+        await buffer.close()
+        habit_cache.clear()
+        written = await database.get_habit_by_id(habit_id, user_id)
+        return page["habits"][0], habit, repeated, written
+
+    listed, habit, repeated, written = run(scenario())
+    assert listed["completed_today"] and listed["streak"] == 1
+    assert habit["completed_today"] and habit["total_days"] == 1
+    assert repeated is None
+    assert written["completed_today"] and written["streak"] == 1 and written["total_days"] == 1
+    assert not unflushed_completions
+
+
+def test_submit_after_close_writes_immediately(run):
+    async def scenario():
+        user_id = 7002
+        habit_id = await database.add_habit(user_id, "Чтение")
+        buffer = CompletionBuffer(flush_interval=60)
+        await buffer.close()
+        habit = await buffer.submit(habit_id, user_id)
+        habit_cache.clear()
+        return habit, await database.get_habit_by_id(habit_id, user_id), buffer.stats()
+
+    habit, written, stats = run(scenario())
+    assert habit["completed_today"]
+    assert written["completed_today"] and written["total_days"] == 1
+    assert stats["pending"] == 0 and stats["written"] == 1
+
+
+def test_failing_flush_backs_off_and_drops(run, monkeypatch):
+    from database import write_behind
+
+    attempts = []
+
+    async def failing_write(events):
+        attempts.append(asyncio.get_running_loop().time())
+        raise RuntimeError("database is locked")
+
+    async def scenario():
+        user_id = 7003
+        habit_id = await database.add_habit(user_id, "Бег")
+        monkeypatch.setattr(write_behind, "mark_habits_completed_bulk", failing_write)
+        buffer = CompletionBuffer(flush_interval=0.01, max_delay=0.04, max_retries=3)
+        await buffer.submit(habit_id, user_id)
+        await asyncio.sleep(0.4)
+        await buffer.close()
+        habit_cache.clear()
+        return buffer.stats(), await database.get_habit_by_id(habit_id, user_id)
+
+    stats, habit = run(scenario())
+    assert stats["failures"] == 4 and stats["dropped"] == 1 and stats["pending"] == 0
+    assert not unflushed_completions and not habit["completed_today"]
+    pauses = [later - earlier for earlier, later in zip(attempts, attempts[1:])]
+    assert pauses[0] < pauses[-1]
@@ -0,0 +1,121 @@
+"""Компактная callback_data с версией и упакованными полями.
+
+Формат: версия (1 символ), код действия (1 символ) и поля — числа
+varint подряд, закодированные base64url без "=". Поле Literal[...]
+хранится как номер значения в списке. Например, карточка привычки
+12345 со страницы 2 — "1huWAC" (6 байт) вместо "habit_12345".
+
+Кнопки описываются классами, как CallbackData в aiogram:
+
+    class HabitCard(PackedCallback, code="h"):
+        habit_id: int
+        page: int = 0
+
+    HabitCard(habit_id=5, page=1).pack()   # "1hBQE"
+    HabitCard.unpack("1hBQE")              # HabitCard(habit_id=5, page=1)
+
+При смене формата полей меняется CALLBACK_VERSION: кнопки в старых
+сообщениях перестают разбираться и попадают в хэндлер устаревших кнопок.
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from dataclasses import dataclass, fields
+from typing import Any, ClassVar, Dict, List, Literal, Tuple, get_args, get_origin
+
+CALLBACK_VERSION = "1"
+
+# Версия + код действия; по нему TableRouter находит хэндлер
+PREFIX_LENGTH = 2
+
+# Ограничение Telegram на callback_data, байты
+MAX_CALLBACK_DATA = 64
+
+_factories: Dict[str, type] = {}
+
+
+def _pack_varints(values: List[int]) -> bytes:
+    """Неотрицательные числа в varint (7 бит на байт, старший бит — продолжение)"""
+    packed = bytearray()
+    for value in values:
+        if value < 0:
+            raise ValueError(f"Negative value in callback data: {value}")
+        while value > 0x7F:
+            packed.append(value & 0x7F | 0x80)
+            value >>= 7
+        packed.append(value)
+    return bytes(packed)
+
+
+def _unpack_varints(packed: bytes, count: int) -> List[int]:
+    """Ровно count чисел varint; лишние или недостающие байты — ValueError"""
+    values = []
+    value = shift = 0
+    for byte in packed:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        values.append(value)
+        value = shift = 0
+    if shift or len(values) != count:
+        raise ValueError("Malformed callback data")
+    return values
+
+
+class PackedCallback:
+    """Базовый класс кнопок; поля — int или Literal[...]"""
+
+    code: ClassVar[str]
+    prefix: ClassVar[str]
+    _choices: ClassVar[Tuple[Tuple[Any, ...], ...]]
+    _indexes: ClassVar[Tuple[Dict[Any, int], ...]]
+    _plain: ClassVar[bool]
+
+    def __init_subclass__(cls, code: str, **kwargs: Any):
+        super().__init_subclass__(**kwargs)
+        if len(code) != PREFIX_LENGTH - len(CALLBACK_VERSION):
+            raise ValueError(f"Callback code must be one character: {code!r}")
+        prefix = CALLBACK_VERSION + code
+        if prefix in _factories:
+            raise ValueError(f"Callback code {code!r} is already used by {_factories[prefix].__name__}")
+
+        dataclass(frozen=True)(cls)
+        cls.code = code
+        cls.prefix = prefix
+        # Для Literal — список значений, для int — пустой кортеж
+        cls._choices = tuple(
+            get_args(field.type) if get_origin(field.type) is Literal else ()
+            for field in fields(cls)
+        )
+        cls._indexes = tuple({value: index for index, value in enumerate(choices)} for choices in cls._choices)
+        cls._plain = not any(cls._choices)
+        _factories[prefix] = cls
+
+    def pack(self) -> str:
+        """Строка для callback_data кнопки"""
+        values = [
+            indexes[value] if indexes else value
+            for value, indexes in zip(vars(self).values(), self._indexes)
+        ]
+        data = self.prefix + urlsafe_b64encode(_pack_varints(values)).rstrip(b"=").decode()
+        if len(data) > MAX_CALLBACK_DATA:
+            raise ValueError(f"Callback data is longer than {MAX_CALLBACK_DATA} bytes: {data}")
+        return data
+
+    @classmethod
+    def unpack(cls, data: str) -> "PackedCallback":
+        """Разобрать callback_data; чужой префикс или битые поля — ValueError"""
+        if not data.startswith(cls.prefix):
+            raise ValueError(f"Not a {cls.__name__} callback: {data}")
+        payload = data[PREFIX_LENGTH:]
+        try:
+            packed = urlsafe_b64decode(payload + "=" * (-len(payload) % 4))
+        except (Base64Error, ValueError):
+            raise ValueError(f"Malformed callback data: {data}")
+        values = _unpack_varints(packed, len(cls._choices))
+        if cls._plain:
+            return cls(*values)
+        try:
+            return cls(*(choices[value] if choices else value for value, choices in zip(values, cls._choices)))
+        except IndexError:
+            raise ValueError(f"Unknown choice in callback data: {data}")
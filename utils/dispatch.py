@@ -0,0 +1,122 @@
+"""Роутер с таблицами точных текстов и префиксов callback_data.
+
+Обычный Router проверяет фильтры хэндлеров по очереди: кнопка, которая
+зарегистрирована последней, проходит через все F.text == "..." и
+F.data.startswith("...") перед ней. TableRouter собирает кнопки
+в словари и вешает на message и callback_query по одному хэндлеру,
+который находит нужную функцию одним поиском:
+
+- текст кнопки и точная callback_data — ключ словаря;
+- префикс callback_data — самый длинный из совпавших: перебираются
+  только разные длины префиксов (их единицы), на каждую — одно
+  обращение к словарю. Поэтому "edit_field_" срабатывает раньше
+  "edit_" независимо от порядка регистрации;
+- кнопка из utils.callback_data — по версии и коду действия (первые
+  PREFIX_LENGTH символов), поля разбираются фабрикой и приходят
+  в хэндлер аргументом callback_data.
+
+Табличные хэндлеры идут раньше остальных хэндлеров роутера (команд,
+состояний FSM). Найденная функция вызывается через HandlerObject,
+поэтому получает те же аргументы (state, bot, ...), что и обычный
+хэндлер, а data["handler"] указывает на нее, а не на общий хэндлер —
+метрики видят настоящее имя.
+"""
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+from aiogram import Router
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.types import CallbackQuery, Message
+
+from utils.callback_data import PREFIX_LENGTH, PackedCallback
+
+
+class TableRouter(Router):
+    """Router с поиском кнопок и callback_data по таблицам"""
+
+    def __init__(self, *, name: Optional[str] = None):
+        super().__init__(name=name)
+        self._texts: Dict[str, HandlerObject] = {}
+        self._data: Dict[str, HandlerObject] = {}
+        self._prefixes: Dict[str, HandlerObject] = {}
+        self._prefix_lengths: Tuple[int, ...] = ()
+        self._packed: Dict[str, Tuple[HandlerObject, Type[PackedCallback]]] = {}
+
+        # Общие хэндлеры регистрируются первыми, до декораторов модуля
+        self.message.register(self._dispatch, self._match_text)
+        self.callback_query.register(self._dispatch, self._match_callback)
+
+    # ---------- Регистрация ----------
+    def text(self, *texts: str) -> Callable:
+        """Декоратор: хэндлер для кнопок с точным текстом"""
+        return self._register(self._texts, texts)
+
+    def data(self, *values: str) -> Callable:
+        """Декоратор: хэндлер для точной callback_data"""
+        return self._register(self._data, values)
+
+    def data_prefix(self, *prefixes: str) -> Callable:
+        """Декоратор: хэндлер для callback_data с префиксом"""
+        def decorator(callback: Callable) -> Callable:
+            self._register(self._prefixes, prefixes)(callback)
+            self._prefix_lengths = tuple(sorted({len(prefix) for prefix in self._prefixes}, reverse=True))
+            return callback
+        return decorator
+
+    def callback(self, *factories: Type[PackedCallback]) -> Callable:
+        """Декоратор: хэндлер для кнопок PackedCallback"""
+        def decorator(callback: Callable) -> Callable:
+            handler = HandlerObject(callback=callback)
+            for factory in factories:
+                if factory.prefix in self._packed:
+                    raise ValueError(f"{factory.__name__} is already handled by "
+                                     f"{self._packed[factory.prefix][0].callback.__name__}")
+                self._packed[factory.prefix] = (handler, factory)
+            return callback
+        return decorator
+
+    def _register(self, table: Dict[str, HandlerObject], keys: Tuple[str, ...]) -> Callable:
+        def decorator(callback: Callable) -> Callable:
+            handler = HandlerObject(callback=callback)
+            for key in keys:
+                if key in table:
+                    raise ValueError(f"{key!r} is already handled by {table[key].callback.__name__}")
+                table[key] = handler
+            return callback
+        return decorator
+
+    # ---------- Поиск ----------
+    def resolve_callback(self, data: Optional[str]) -> Optional[HandlerObject]:
+        """Хэндлер для callback_data: точное совпадение, затем самый длинный префикс"""
+        if data is None:
+            return None
+        handler = self._data.get(data)
+        if handler is not None:
+            return handler
+        prefixes = self._prefixes
+        for length in self._prefix_lengths:
+            handler = prefixes.get(data[:length])
+            if handler is not None:
+                return handler
+        return None
+
+    # Асинхронные: синхронный фильтр aiogram запускает в пуле потоков
+    async def _match_text(self, message: Message) -> Any:
+        handler = self._texts.get(message.text)
+        return {"handler": handler} if handler is not None else False
+
+    async def _match_callback(self, callback: CallbackQuery) -> Any:
+        data = callback.data
+        route = self._packed.get(data[:PREFIX_LENGTH]) if data is not None else None
+        if route is not None:
+            handler, factory = route
+            try:
+                return {"handler": handler, "callback_data": factory.unpack(data)}
+            except ValueError:
+                return False
+        handler = self.resolve_callback(data)
+        return {"handler": handler} if handler is not None else False
+
+    @staticmethod
+    async def _dispatch(event: Any, handler: HandlerObject, **kwargs: Any) -> Any:
+        # handler — найденный фильтром табличный хэндлер
+        return await handler.call(event, handler=handler, **kwargs)
@@ -0,0 +1,83 @@
+"""Карточка привычки в HTML: один шаблон для всех экранов.
+
+Шаблоны собираются при импорте, все поля, которые вводит
+пользователь, экранируются при первой отрисовке версии привычки.
+Готовый текст запоминается по (id, updated_at, статус, цепочка,
+вариант): любое изменение полей меняет updated_at, а выполнение —
+статус и цепочку. Повторный показ неизмененной привычки — поиск
+в словаре; при переполнении вытесняются карточки, которые дольше
+всех не показывались (LRU).
+"""
+from collections import OrderedDict
+from html import escape
+from typing import Any, Dict, Optional, Tuple
+
+from config import CARD_CACHE_SIZE
+
+_CARD = (
+    "{emoji} <b>{name}</b>\n"
+    "{description}\n"
+    "<b>Статус:</b> {status}\n"
+    "<b>Цепочка:</b> 🔥 {streak} дней\n"
+    "<b>Время напоминания:</b> {reminder_time}\n"
+    "<b>Создана:</b> {created}"
+)
+
+# Вариант карточки -> строка после основного текста
+_FOOTERS = {
+    None: "",
+    "completed": "\n\n🎉 <b>Поздравляем! Вы поддерживаете цепочку {streak} дней!</b>",
+    "saved": "\n\n✅ <i>Изменения сохранены!</i>",
+}
+
+_TEMPLATES = {variant: _CARD + footer for variant, footer in _FOOTERS.items()}
+
+_STATUSES = {True: "✅ Выполнено сегодня", False: "⏳ Ожидает выполнения"}
+
+_cards: "OrderedDict[Tuple[Any, ...], str]" = OrderedDict()
+_stats = {"hits": 0, "misses": 0}
+
+
+def _render(habit: Dict[str, Any], completed: bool, streak: int, variant: Optional[str]) -> str:
+    description = habit.get('description')
+    created_at = habit.get('created_at')
+    return _TEMPLATES[variant].format(
+        emoji=escape(habit.get('emoji') or '🎯', quote=False),
+        name=escape(habit['name'], quote=False),
+        description=f"\n{escape(description, quote=False)}\n" if description else "",
+        status=_STATUSES[completed],
+        streak=streak,
+        reminder_time=escape(str(habit.get('reminder_time') or 'нет'), quote=False),
+        created=str(created_at)[:10] if created_at else 'Неизвестно',
+    )
+
+
+def render_habit_card(habit: Dict[str, Any], variant: Optional[str] = None) -> str:
+    """Текст карточки привычки (parse_mode="HTML").
+
+    variant: None — просмотр, "completed" — после отметки выполнения,
+    "saved" — после редактирования.
+    """
+    completed = bool(habit.get('completed_today'))
+    streak = habit.get('streak', 0)
+    version = habit.get('updated_at')
+    if version is None:
+        return _render(habit, completed, streak, variant)
+
+    key = (habit['id'], version, completed, streak, variant)
+    text = _cards.get(key)
+    if text is not None:
+        _cards.move_to_end(key)
+        _stats["hits"] += 1
+        return text
+
+    _stats["misses"] += 1
+    text = _cards[key] = _render(habit, completed, streak, variant)
+    if len(_cards) > CARD_CACHE_SIZE:
+        _cards.popitem(last=False)
+    return text
+
+
+def get_card_cache_stats() -> Dict[str, Any]:
+    """Счетчики кэша карточек"""
+    return {"size": len(_cards), **_stats}
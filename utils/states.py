@@ -0,0 +1,21 @@
+from aiogram.fsm.state import State, StatesGroup
+
+
+class HabitStates(StatesGroup):
+    """Добавление привычки"""
+    waiting_for_habit_name = State()
+    waiting_for_habit_description = State()
+    waiting_for_habit_time = State()
+    waiting_for_habit_frequency = State()
+    waiting_for_habit_confirmation = State()
+
+
+class EditHabitStates(StatesGroup):
+    """Редактирование привычки"""
+    waiting_for_edit_field = State()
+    waiting_for_new_value = State()
+
+
+class DeleteHabitStates(StatesGroup):
+    """Удаление привычки"""
+    waiting_for_confirmation = State()
@@ -0,0 +1,234 @@
+"""Расчет цепочек и успешности привычек по битовой карте дней.
+
+История привычки — целое число, где бит i означает выполнение в день
+start + i. Все метрики считаются операциями над целыми числами и
+байтовыми строками (format/split/count/срезы работают на стороне C),
+без цикла по дням на Python.
+
+Частота задает единицу цепочки:
+- daily, weekdays, weekends — дни, в которые привычку нужно выполнять;
+- weekly, custom — недели (пн-вс), в которые набрано нужное число выполнений.
+"""
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# "Несколько раз в неделю": сколько выполнений засчитывают неделю
+CUSTOM_WEEKLY_TARGET = 3
+
+DUE_WEEKDAYS = {
+    "daily": (0, 1, 2, 3, 4, 5, 6),
+    "weekdays": (0, 1, 2, 3, 4),
+    "weekends": (5, 6),
+}
+
+WEEKLY_TARGETS = {
+    "weekly": 1,
+    "custom": CUSTOM_WEEKLY_TARGET,
+}
+
+
+def days_to_bits(days: Iterable[date], start: date) -> int:
+    """Собрать битовую карту из дней выполнения"""
+    bits = 0
+    for day in days:
+        offset = (day - start).days
+        if offset >= 0:
+            bits |= 1 << offset
+    return bits
+
+
+# ---------- Годовые блоки ----------
+# На диске история хранится блоками по году: 366 бит, little-endian
+YEAR_BYTES = 46
+
+
+def year_offset(day: date) -> Tuple[int, int]:
+    """Год и номер бита дня внутри годового блока"""
+    return day.year, day.toordinal() - date(day.year, 1, 1).toordinal()
+
+
+def pack_year(bits: int) -> bytes:
+    return bits.to_bytes(YEAR_BYTES, "little")
+
+
+def unpack_year(blob: Optional[bytes]) -> int:
+    return int.from_bytes(blob, "little") if blob else 0
+
+
+def year_has_day(blob: Optional[bytes], day: date) -> bool:
+    """Отмечен ли день в годовом блоке"""
+    _, offset = year_offset(day)
+    return bool(blob) and bool(blob[offset >> 3] >> (offset & 7) & 1)
+
+
+def years_to_bits(years: Iterable[Tuple[int, bytes]], start: date) -> int:
+    """Склеить годовые блоки в одну битовую карту, бит 0 — день start"""
+    bits = 0
+    for year, blob in years:
+        shift = date(year, 1, 1).toordinal() - start.toordinal()
+        value = unpack_year(blob)
+        bits |= value << shift if shift >= 0 else value >> -shift
+    return bits
+
+
+def _day_string(bits: int, length: int) -> bytes:
+    """b'0'/b'1' на каждый день, индекс i — день start + i"""
+    return format(bits, f"0{length}b").encode()[::-1] if length > 0 else b""
+
+
+def _week_aligned(days: bytes, start: date) -> Tuple[bytes, int, int]:
+    """Дополнить строку дней нулями до целых недель с понедельника"""
+    head = start.weekday()
+    tail = -(head + len(days)) % 7
+    return b"0" * head + days + b"0" * tail, head, tail
+
+
+def _due_units(days: bytes, start: date, weekdays: Tuple[int, ...]) -> bytes:
+    """Оставить только дни, в которые привычку нужно выполнять"""
+    if len(weekdays) == 7:
+        return days
+
+    aligned, head, tail = _week_aligned(days, start)
+    weeks = len(aligned) // 7
+    per_week = len(weekdays)
+    units = bytearray(per_week * weeks)
+    for position, weekday in enumerate(weekdays):
+        units[position::per_week] = aligned[weekday::7]
+
+    # Срезать дни дополнения в начале первой и в конце последней недели
+    skip_head = sum(1 for weekday in weekdays if weekday < head)
+    skip_tail = sum(1 for weekday in weekdays if weekday >= 7 - tail) if tail else 0
+    return bytes(units[skip_head:len(units) - skip_tail])
+
+
+def _at_least(planes: List[int], target: int, width: int) -> int:
+    """Побитово сравнить счетчики (битовые плоскости, младшая первой) с target"""
+    mask = (1 << width) - 1
+    greater = 0
+    equal = mask
+    for level in range(len(planes) - 1, -1, -1):
+        plane = planes[level]
+        if (target >> level) & 1:
+            equal &= plane
+        else:
+            greater |= equal & plane
+            equal &= ~plane & mask
+    return greater | equal
+
+
+def _week_units(days: bytes, start: date, target: int) -> bytes:
+    """Недели, в которых набрано не меньше target выполнений"""
+    aligned, _, _ = _week_aligned(days, start)
+    weeks = len(aligned) // 7
+    if weeks == 0:
+        return b""
+
+    # Побитовый сумматор: семь векторов "выполнено в i-й день недели"
+    # складываются в трехбитные счетчики сразу для всех недель
+    planes = [0, 0, 0]
+    for weekday in range(7):
+        carry = int(aligned[weekday::7][::-1], 2)
+        for level in range(3):
+            planes[level], carry = planes[level] ^ carry, planes[level] & carry
+
+    return _day_string(_at_least(planes, target, weeks), weeks)
+
+
+def _run_stats(units: bytes, in_progress: bool) -> Dict[str, int]:
+    # Текущая единица (сегодня или эта неделя) еще не закончилась:
+    # пока она не выполнена, цепочку не рвем и в успешности не учитываем
+    if in_progress and units[-1:] == b"0":
+        units = units[:-1]
+
+    due = len(units)
+    done = units.count(b"1")
+    return {
+        "due_units": due,
+        "done_units": done,
+        "longest_streak": max(map(len, units.split(b"0"))) if units else 0,
+        "current_streak": due - 1 - units.rfind(b"0"),
+        "success_rate": round(done / due * 100) if due else 0,
+    }
+
+
+def habit_stats(bits: int, start: date, today: date, frequency: Optional[str] = "daily") -> Dict[str, Any]:
+    """Все метрики одной привычки за период [start, today]"""
+    length = (today - start).days + 1
+    if length <= 0:
+        return {
+            "total_completions": 0, "completions_last_7_days": 0, "due_units": 0, "done_units": 0,
+            "longest_streak": 0, "current_streak": 0, "success_rate": 0,
+        }
+
+    bits &= (1 << length) - 1
+    days = _day_string(bits, length)
+
+    if frequency in WEEKLY_TARGETS:
+        units = _week_units(days, start, WEEKLY_TARGETS[frequency])
+        in_progress = True
+    else:
+        weekdays = DUE_WEEKDAYS.get(frequency or "daily", DUE_WEEKDAYS["daily"])
+        units = _due_units(days, start, weekdays)
+        in_progress = today.weekday() in weekdays
+
+    stats = _run_stats(units, in_progress)
+    stats["total_completions"] = bits.bit_count()
+    stats["completions_last_7_days"] = (bits >> max(length - 7, 0)).bit_count()
+    return stats
+
+
+def batch_habit_stats(histories: Iterable[Tuple[int, str, date, int]], today: date) -> Dict[int, Dict[str, Any]]:
+    """Метрики для набора привычек: (habit_id, frequency, start, bits) -> stats.
+
+    Привычки считаются по одной через habit_stats; выигрыш у вызывающего
+    кода — в одном чтении истории из БД на весь набор, а не в расчете.
+    """
+    return {
+        habit_id: habit_stats(bits, start, today, frequency)
+        for habit_id, frequency, start, bits in histories
+    }
+
+
+def naive_habit_stats(completed: Iterable[date], start: date, today: date,
+                      frequency: Optional[str] = "daily") -> Dict[str, Any]:
+    """Эталонный расчет циклом по дням (для проверки и бенчмарков)"""
+    completed = {day for day in completed if start <= day <= today}
+    units: List[bool] = []
+    in_progress = False
+
+    if frequency in WEEKLY_TARGETS:
+        target = WEEKLY_TARGETS[frequency]
+        week = start - timedelta(days=start.weekday())
+        while week <= today:
+            done = sum(1 for offset in range(7) if week + timedelta(days=offset) in completed)
+            units.append(done >= target)
+            week += timedelta(days=7)
+        in_progress = True
+    else:
+        weekdays = DUE_WEEKDAYS.get(frequency or "daily", DUE_WEEKDAYS["daily"])
+        day = start
+        while day <= today:
+            if day.weekday() in weekdays:
+                units.append(day in completed)
+            day += timedelta(days=1)
+        in_progress = today.weekday() in weekdays
+
+    if in_progress and units and not units[-1]:
+        units.pop()
+
+    longest = run = 0
+    for unit in units:
+        run = run + 1 if unit else 0
+        longest = max(longest, run)
+
+    due = len(units)
+    done = sum(units)
+    return {
+        "due_units": due,
+        "done_units": done,
+        "longest_streak": longest,
+        "current_streak": run,
+        "success_rate": round(done / due * 100) if due else 0,
+        "total_completions": len(completed),
+        "completions_last_7_days": sum(1 for day in completed if day > today - timedelta(days=7)),
+    }
@@ -0,0 +1,58 @@
+import re
+from datetime import datetime, timedelta, timezone, tzinfo
+from functools import lru_cache
+from typing import Dict, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError, available_timezones
+
+DEFAULT_TIMEZONE = "UTC"
+
+# "+3", "UTC+3", "GMT-04:30", "utc+0530"
+OFFSET_PATTERN = re.compile(r"^(?:UTC|GMT)?\s*([+-])(\d{1,2})(?::?(\d{2}))?$", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1)
+def _zone_names() -> Dict[str, str]:
+    """Имена зон IANA без учета регистра"""
+    return {name.lower(): name for name in available_timezones()}
+
+
+def parse_timezone(value: Optional[str]) -> Optional[str]:
+    """Каноническое имя часового пояса из ввода пользователя или None.
+
+    Принимает имена IANA ("Europe/Moscow") и смещения от UTC ("+3",
+    "UTC-04:30"); смещения хранятся как "UTC+03:00" и не переходят на
+    летнее время.
+    """
+    value = (value or "").strip()
+    if value.upper() in ("UTC", "GMT", "Z"):
+        return DEFAULT_TIMEZONE
+
+    match = OFFSET_PATTERN.match(value)
+    if match:
+        sign, hours, minutes = match.group(1), int(match.group(2)), int(match.group(3) or 0)
+        if hours > 14 or minutes > 59 or hours * 60 + minutes > 14 * 60:
+            return None
+        if hours == minutes == 0:
+            return DEFAULT_TIMEZONE
+        return f"UTC{sign}{hours:02d}:{minutes:02d}"
+
+    return _zone_names().get(value.lower())
+
+
+@lru_cache(maxsize=1024)
+def get_timezone(name: str) -> tzinfo:
+    """tzinfo по каноническому имени; неизвестные имена считаются UTC"""
+    match = OFFSET_PATTERN.match(name) if name != DEFAULT_TIMEZONE else None
+    if match:
+        offset = timedelta(hours=int(match.group(2)), minutes=int(match.group(3) or 0))
+        return timezone(-offset if match.group(1) == "-" else offset)
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.utc
+
+
+def utc_offset_minutes(name: str, now: datetime) -> int:
+    """Смещение зоны от UTC в минутах в момент now (aware, UTC)"""
+    offset = now.astimezone(get_timezone(name)).utcoffset()
+    return int(offset.total_seconds()) // 60 if offset else 0